@@ -8,7 +8,7 @@ import streamlit as st
 from web3 import Web3
 
 
-from mainnet_launch.data_fetching.tokemak_subgraph import run_query_with_paginate
+from mainnet_launch.data_fetching.tokemak_subgraph import run_query_with_keyset_paginate
 from mainnet_launch.constants import *
 from mainnet_launch.data_fetching.get_state_by_block import get_raw_state_by_blocks, safe_normalize_6_with_bool_success
 
@@ -21,13 +21,14 @@ autopool_address_to_name = {a.autopool_eth_addr: a.name for a in ALL_AUTOPOOLS}
 
 def get_rebalance_volumne_raw_data(chain: ChainData):
     query = """
-    query getAutopoolRebalances($first: Int!, $skip: Int!) {
+    query getAutopoolRebalances($first: Int!, $cursor: ID!) {
       autopoolRebalances(
         first: $first,
-        skip: $skip,
-        orderBy: timestamp,
+        orderBy: id,
         orderDirection: asc,
+        where: { id_gt: $cursor }
       ) {
+        id
         autopool
         destinationInName
         destinationOutName
@@ -40,7 +41,7 @@ def get_rebalance_volumne_raw_data(chain: ChainData):
     }
     """
 
-    df = run_query_with_paginate(chain.tokemak_subgraph_url, query, {}, "autopoolRebalances")
+    df = run_query_with_keyset_paginate(chain.tokemak_subgraph_url, query, {}, "autopoolRebalances")
     found_autopools = set(df["autopool"].apply(lambda x: Web3.toChecksumAddress(x)))
     valid_autopools = set(autopool_address_to_name.keys())
     if not found_autopools.issubset(valid_autopools):
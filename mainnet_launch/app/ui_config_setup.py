@@ -4,6 +4,8 @@ import streamlit as st
 import plotly.io as pio
 import plotly.express as px
 
+from mainnet_launch.database.query_result_cache import QUERY_RESULT_CACHE
+
 
 STREAMLIT_MARKDOWN_HTML = """
         <style>
@@ -56,3 +58,6 @@ def config_plotly_and_streamlit():
     pio.templates["dark_24_color_template"] = pio.templates["plotly"]
     pio.templates["dark_24_color_template"]["layout"]["colorway"] = px.colors.qualitative.Dark24
     pio.templates.default = "dark_24_color_template"
+
+    # the apps only read, so query results are shared across sessions until the tables they read change
+    QUERY_RESULT_CACHE.enable()
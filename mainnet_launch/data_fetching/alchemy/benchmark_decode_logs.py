@@ -0,0 +1,93 @@
+"""
+Benchmark decode_logs on a synthetic ERC20 Transfer history
+
+web3: _decode_logs_with_web3, get_event_data per log, a 4 process pool over 5000 logs
+compiled: _CompiledEventDecoder, whole column int(hex, 16) and one checksum per unique address
+
+Both are timed through the same DataFrame build, rename and sort in decode_logs, and checked to give the same frame.
+
+poetry run python -m mainnet_launch.data_fetching.alchemy.benchmark_decode_logs
+"""
+
+import copy
+import json
+import random
+import time
+
+import pandas as pd
+from web3 import Web3
+
+from mainnet_launch.abis import ERC_20_ABI
+from mainnet_launch.data_fetching.alchemy import process_raw_event_logs
+from mainnet_launch.data_fetching.alchemy.process_raw_event_logs import decode_logs
+
+TRANSFER_TOPIC0 = Web3.keccak(text="Transfer(address,address,uint256)").hex()
+
+
+def _make_synthetic_transfer_logs(num_logs: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    holders = ["0x" + rng.randbytes(20).hex() for _ in range(5_000)]
+    token = "0x" + rng.randbytes(20).hex()
+
+    raw_logs = []
+    for i in range(num_logs):
+        raw_logs.append(
+            {
+                "address": token,
+                "topics": [
+                    TRANSFER_TOPIC0,
+                    "0x" + "0" * 24 + rng.choice(holders)[2:],
+                    "0x" + "0" * 24 + rng.choice(holders)[2:],
+                ],
+                "data": "0x" + rng.getrandbits(96).to_bytes(32, "big").hex(),
+                "blockNumber": hex(18_000_000 + i // 20),
+                "transactionHash": "0x" + rng.randbytes(32).hex(),
+                "transactionIndex": hex(i % 20),
+                "blockHash": "0x" + "00" * 32,
+                "logIndex": hex(i % 200),
+                "removed": False,
+            }
+        )
+    return raw_logs
+
+
+def _time_decode(event, raw_logs: list[dict], use_compiled_decoder: bool) -> tuple[float, pd.DataFrame]:
+    compile_event_decoder = process_raw_event_logs._compile_event_decoder
+    if not use_compiled_decoder:
+        process_raw_event_logs._compile_event_decoder = lambda event_abi_json: None
+    try:
+        start = time.perf_counter()
+        df = decode_logs(event, raw_logs)
+        return time.perf_counter() - start, df
+    finally:
+        process_raw_event_logs._compile_event_decoder = compile_event_decoder
+
+
+def benchmark_decode_logs(num_logs_options: tuple[int] = (10_000, 100_000, 500_000)) -> pd.DataFrame:
+    event = Web3().eth.contract(address="0x2e9d63788249371f1DFC918a52f8d799F4a38C94", abi=ERC_20_ABI).events.Transfer
+    # make sure the compile is not timed
+    process_raw_event_logs._compile_event_decoder(json.dumps(event._get_event_abi(), sort_keys=True))
+
+    records = []
+    for num_logs in num_logs_options:
+        raw_logs = _make_synthetic_transfer_logs(num_logs)
+
+        # _worker_decode_chunk replaces log["topics"] in place
+        web3_seconds, web3_df = _time_decode(event, copy.deepcopy(raw_logs), use_compiled_decoder=False)
+        compiled_seconds, compiled_df = _time_decode(event, raw_logs, use_compiled_decoder=True)
+        pd.testing.assert_frame_equal(web3_df, compiled_df)
+
+        records.append(
+            {
+                "num_logs": num_logs,
+                "web3_seconds": round(web3_seconds, 2),
+                "compiled_seconds": round(compiled_seconds, 2),
+                "speedup": round(web3_seconds / compiled_seconds, 1),
+            }
+        )
+
+    return pd.DataFrame.from_records(records)
+
+
+if __name__ == "__main__":
+    print(benchmark_decode_logs().to_markdown(index=False))
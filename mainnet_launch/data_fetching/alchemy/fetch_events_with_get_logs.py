@@ -1,12 +1,19 @@
 from enum import Enum
 import datetime
 import concurrent.futures
+import threading
+import pandas as pd
 import requests
+from sqlalchemy import text
 from web3 import Web3
 from web3.contract import ContractEvent
 from web3._utils.filters import construct_event_filter_params
 
 from mainnet_launch.constants import ChainData, SONIC_CHAIN, PLASMA_CHAIN, LINEA_CHAIN, ALL_CHAINS
+from mainnet_launch.data_fetching.rate_limits import get_rate_limiter_for_url, retry_after_seconds
+from mainnet_launch.data_fetching.alchemy.raw_log_archive import RAW_LOG_ARCHIVE, merge_block_ranges
+from mainnet_launch.database.postgres_operations import get_full_table_as_df
+from mainnet_launch.database.schema.full import GetLogsChunkSize, Session
 import random
 import time
 
@@ -19,12 +26,12 @@ import time
 # Other chains (e.g., Base, Mainnet): 100M blocks (DEFAULT_CHUNK_SIZE), minimal restrictions
 # https://www.alchemy.com/docs/chains/ethereum/ethereum-api-endpoints/eth-get-logs
 
-NUM_THREADS_FOR_PRE_SPLIT_FETCH = 10
 DEFAULT_CHUNK_SIZE = 100_000_000
 
 # only 10k ranges are garanteed to work, but we need to get more than that becaues there are millions of blocks
 # so the 503 failures are retried at least once before splitting and trying again
-# these are finger in the wind values
+# these are finger in the wind values, only used as the starting chunk size for a (chain, event)
+# the first time we see it, after that the size learned by CHUNK_SIZE_LEARNER is used
 
 PRE_SPLIT_BLOCK_CHUNK_SIZE = {
     PLASMA_CHAIN: 10_000,  # need a better solve for this
@@ -37,6 +44,7 @@ PRE_SPLIT_BLOCK_CHUNK_SIZE = {
 class AchemyRequestStatus(Enum):
     SUCCESS = 1
     SPLIT_RANGE_AND_TRY_AGAIN = 2
+    RATE_LIMITED = 3
 
 
 class AlchemyError(Enum):
@@ -53,7 +61,14 @@ class AlchemyFetchEventsError(Exception):
 def _rpc_post(url: str, payload: dict) -> tuple[dict, AchemyRequestStatus]:
     headers = {"Content-Type": "application/json"}
 
+    rate_limiter = get_rate_limiter_for_url(url)
+    rate_limiter.acquire()
     r = requests.post(url, json=payload, headers=headers, timeout=30)
+    if r.status_code == 429:
+        rate_limiter.record_throttle(retry_after_seconds(r.headers))
+        return [], AchemyRequestStatus.RATE_LIMITED
+    rate_limiter.record_success()
+
     out = r.json()
     try:
         r.raise_for_status()
@@ -139,10 +154,12 @@ def _eth_getlogs_once(
                     f"Max retries exceeded for eth_getLogs with params: {params}. Last status: {status}"
                 )
 
-            # Exponential backoff with jitter
-            delay = base_delay * (2**attempt) + random.uniform(0, 1)
-            print(f"Retry attempt {attempt + 1}/{max_retries} after {delay:.2f}s delay")
-            time.sleep(delay)
+            # the rate limiter already pauses every caller on this chain, no need to sleep here as well
+            if status != AchemyRequestStatus.RATE_LIMITED:
+                # Exponential backoff with jitter
+                delay = base_delay * (2**attempt) + random.uniform(0, 1)
+                print(f"Retry attempt {attempt + 1}/{max_retries} after {delay:.2f}s delay")
+                time.sleep(delay)
 
     return raw_logs, status
 
@@ -165,125 +182,254 @@ def _build_address_and_topics_for_event(
     return filter_params
 
 
-def _recursive_make_web3_getLogs_call(
-    event: ContractEvent,
+class _ChunkSizeLearner:
+    """
+    Remembers a getLogs block range per (chain_id, topic0) that is known to work, persisted between runs
+    in the get_logs_chunk_size table.
+
+    A full size range that succeeds grows the size by CHUNK_SIZE_GROWTH, but never past halfway to the
+    smallest range that had to be split. A range that has to be split shrinks the size to half of it.
+    The smallest failed range is forgotten after FAILED_RANGE_TTL_SECONDS so the size can creep back up
+    if the provider limits loosen. Nightly runs start at the size the last run ended at.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: dict[tuple[int, str], dict] | None = None
+        self._changed_keys: set[tuple[int, str]] = set()
+
+    def _load(self) -> dict[tuple[int, str], dict]:
+        if self._state is None:
+            df = get_full_table_as_df(GetLogsChunkSize)
+            self._state = {
+                (int(row["chain_id"]), row["topic0"]): {
+                    "size": int(row["size"]),
+                    "min_failed": None if pd.isna(row["min_failed"]) else int(row["min_failed"]),
+                    "min_failed_at": None if pd.isna(row["min_failed_at"]) else float(row["min_failed_at"]),
+                }
+                for row in df.to_dict("records")
+            }
+        return self._state
+
+    def _entry(self, key: tuple[int, str], prior: int) -> dict:
+        entry = self._load().setdefault(key, {"size": prior, "min_failed": None, "min_failed_at": None})
+        self._changed_keys.add(key)
+        if entry["min_failed_at"] is not None and time.time() - entry["min_failed_at"] > FAILED_RANGE_TTL_SECONDS:
+            entry["min_failed"] = None
+            entry["min_failed_at"] = None
+        return entry
+
+    def get(self, key: tuple[int, str], prior: int) -> int:
+        with self._lock:
+            return int(self._entry(key, prior)["size"])
+
+    def record_success(self, key: tuple[int, str], block_range: int, prior: int) -> None:
+        with self._lock:
+            entry = self._entry(key, prior)
+            if block_range < entry["size"]:
+                return  # says nothing about larger ranges
+            new_size = int(entry["size"] * CHUNK_SIZE_GROWTH) + 1
+            if entry["min_failed"] is not None:
+                new_size = min(new_size, (entry["size"] + entry["min_failed"]) // 2)
+            entry["size"] = max(entry["size"], min(DEFAULT_CHUNK_SIZE, new_size))
+
+    def record_failure(self, key: tuple[int, str], block_range: int, prior: int) -> None:
+        with self._lock:
+            entry = self._entry(key, prior)
+            if entry["min_failed"] is None or block_range < entry["min_failed"]:
+                entry["min_failed"] = block_range
+            entry["min_failed_at"] = time.time()
+            entry["size"] = max(MIN_CHUNK_SIZE, min(entry["size"], block_range // 2))
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._changed_keys:
+                return
+            rows = [
+                {"chain_id": chain_id, "topic0": topic0, **self._state[(chain_id, topic0)]}
+                for chain_id, topic0 in self._changed_keys
+            ]
+            query = """
+                INSERT INTO get_logs_chunk_size (chain_id, topic0, size, min_failed, min_failed_at)
+                VALUES (:chain_id, :topic0, :size, :min_failed, :min_failed_at)
+                ON CONFLICT (chain_id, topic0) DO UPDATE
+                SET size = EXCLUDED.size, min_failed = EXCLUDED.min_failed, min_failed_at = EXCLUDED.min_failed_at
+            """
+            with Session() as session:
+                session.execute(text(query), rows)
+                session.commit()
+            self._changed_keys.clear()
+
+
+NUM_GET_LOGS_WORKERS = 10
+MIN_CHUNK_SIZE = 100
+CHUNK_SIZE_GROWTH = 1.25
+FAILED_RANGE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+CHUNK_SIZE_LEARNER = _ChunkSizeLearner()
+
+
+def _split_block_range(start_block: int, end_block: int, chunk_size: int) -> list[tuple[int, int]]:
+    """Inclusive [start, end] ranges of at most chunk_size blocks"""
+    return [
+        (chunk_start, min(chunk_start + chunk_size - 1, end_block))
+        for chunk_start in range(start_block, end_block + 1, chunk_size)
+    ]
+
+
+def _fetch_logs_with_work_queue(
     chain: ChainData,
+    addresses: list[str],
+    topics: list | None,
     start_block: int,
     end_block: int,
-    argument_filters: dict | None = None,
-    global_raw_logs: list[dict] | None = None,
-    addresses: list[str] | None = None,
-) -> None:
+    chunk_size_key: tuple[int, str],
+) -> list[dict]:
     """
-    Collect every `event` between start_block and end_block into a DataFrame.
-    Recusivly splits the range into smaller chunks on timeout or large response issues.
+    N workers pull block ranges off one queue. A range that is too big is put back as two halves,
+    which any free worker picks up, instead of being recursively split on the thread that found it.
     """
+    rpc_url = chain.client.provider.endpoint_uri
+    prior = PRE_SPLIT_BLOCK_CHUNK_SIZE[chain]
+    chunk_size = CHUNK_SIZE_LEARNER.get(chunk_size_key, prior)
+
+    raw_logs: list[dict] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_GET_LOGS_WORKERS) as thread_pool_executor:
+
+        def _submit(range_start: int, range_end: int) -> None:
+            future = thread_pool_executor.submit(
+                _eth_getlogs_once, rpc_url, addresses, topics, hex(range_start), hex(range_end)
+            )
+            pending[future] = (range_start, range_end)
+
+        pending: dict[concurrent.futures.Future, tuple[int, int]] = {}
+        for range_start, range_end in _split_block_range(start_block, end_block, chunk_size):
+            _submit(range_start, range_end)
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                range_start, range_end = pending.pop(future)
+                logs, status = future.result()
+                block_range = range_end - range_start + 1
+
+                if status == AchemyRequestStatus.SUCCESS:
+                    raw_logs.extend(logs)
+                    CHUNK_SIZE_LEARNER.record_success(chunk_size_key, block_range, prior)
+                    continue
+
+                CHUNK_SIZE_LEARNER.record_failure(chunk_size_key, block_range, prior)
+                if range_start == range_end:
+                    raise AlchemyFetchEventsError(
+                        f"Retryable failure when fetching logs for {chunk_size_key} at block {range_start:,} that cannot be split"
+                    )
+                mid_block = (range_start + range_end) // 2
+                _submit(range_start, mid_block)
+                _submit(mid_block + 1, range_end)
+
+    CHUNK_SIZE_LEARNER.save()
+    return raw_logs
+
+
+def _resolve_block_range(chain: ChainData, start_block: int | None, end_block: int | None) -> tuple[int, int]:
+    start_block = chain.block_autopool_first_deployed if start_block is None else start_block
+    end_block = chain.get_block_near_top() if end_block is None else end_block
+
+    try:
+        return int(start_block), int(end_block)
+    except Exception as e:
+        raise AlchemyFetchEventsError(
+            f"start_block and end_block must be castable to integers, got {start_block}, {end_block}"
+        ) from e
+
+
+def fetch_raw_event_logs(
+    event: ContractEvent,
+    chain: ChainData,
+    start_block: int | None = None,
+    end_block: int | None = None,
+    argument_filters: dict | None = None,
+    addresses: list[str] | None = None,
+) -> list[dict]:
+    start_block, end_block = _resolve_block_range(chain, start_block, end_block)
+
     if end_block <= start_block:
         # not certain here on if this is the desired behavior
         raise AlchemyFetchEventsError(f"{end_block:,} must be greater than {start_block:,}")
 
     filter_params = _build_address_and_topics_for_event(event, argument_filters, hex(start_block), hex(end_block))
-    # del filter_params["address"] # we don't care about the address here, we are passing it in separately, just for clarity
-
-    raw_logs, status = _eth_getlogs_once(
-        rpc_url=chain.client.provider.endpoint_uri,
-        addresses=addresses,
-        topics=filter_params["topics"],
-        from_block_hex=filter_params["fromBlock"],
-        to_block_hex=filter_params["toBlock"],
-    )
-
-    if status == AchemyRequestStatus.SUCCESS:
-        global_raw_logs.extend(raw_logs)
-        return
+    topics = filter_params["topics"]
 
-    elif status == AchemyRequestStatus.SPLIT_RANGE_AND_TRY_AGAIN:
-        if start_block == end_block:
-            raise AlchemyFetchEventsError(
-                f"Retryable failure when fetching logs for {event} where end block and start block are both {start_block:,}"
-            )
-        else:
-            mid_block = (start_block + end_block) // 2
-            _recursive_make_web3_getLogs_call(
-                event, chain, start_block, mid_block, argument_filters, global_raw_logs, addresses=addresses
-            )
-            _recursive_make_web3_getLogs_call(
-                event, chain, mid_block + 1, end_block, argument_filters, global_raw_logs, addresses=addresses
-            )
-            return
+    # topic0 is the event signature
+    chunk_size_key = (chain.chain_id, topics[0] if topics else event.event_name)
+    if argument_filters:
+        # the archive only knows about topic0, filtered scans always go to the RPC
+        return _fetch_logs_with_work_queue(chain, addresses, topics, start_block, end_block, chunk_size_key)
+    return _fetch_logs_through_archive(chain, addresses, [topics[0].lower()], start_block, end_block, chunk_size_key)
 
 
-def _fetch_events_with_pre_split(
-    event: ContractEvent,
+def _fetch_logs_through_archive(
     chain: ChainData,
+    addresses: list[str],
+    topic0s: list[str],
     start_block: int,
     end_block: int,
-    argument_filters: dict,
-    split_size: int,
-    addresses: list[str],
-) -> bool:
-    """we want to pre split the sonic large block, because it fails (sporadically at larger ranges)"""
-
-    new_start_and_end_blocks = []
-
-    for mid_point in range(start_block, end_block, split_size):
-        new_start_and_end_blocks.append([mid_point, mid_point + split_size - 1])
-
-    new_start_and_end_blocks[-1][1] = end_block
-
-    def _fetch_chunk(chunk_start_block: int, chunk_end_block: int) -> list[dict]:
-        local_raw_logs: list[dict] = []
-        _recursive_make_web3_getLogs_call(
-            event=event,
-            chain=chain,
-            start_block=chunk_start_block,
-            end_block=chunk_end_block,
-            argument_filters=argument_filters,
-            global_raw_logs=local_raw_logs,
-            addresses=addresses,
+    chunk_size_key: tuple[int, str],
+) -> list[dict]:
+    """
+    Serve the finalized part of [start_block, end_block] from RAW_LOG_ARCHIVE and only scan the gaps,
+    plus the blocks too close to the top to archive, with getLogs. Newly scanned finalized gaps are archived.
+    """
+    last_archivable_block = min(end_block, RAW_LOG_ARCHIVE.last_archivable_block(chain))
+    if last_archivable_block < start_block:
+        return _fetch_logs_with_work_queue(chain, addresses, [topic0s], start_block, end_block, chunk_size_key)
+
+    keys = [(address.lower(), topic0) for address in addresses for topic0 in topic0s]
+    archived_logs, gaps_by_key = RAW_LOG_ARCHIVE.read(chain.chain_id, keys, start_block, last_archivable_block)
+
+    # every address and topic0 is fetched together, so one scan over the union of the gaps fills all of them
+    block_ranges_to_fetch = [gap for gaps in gaps_by_key.values() for gap in gaps]
+    if last_archivable_block < end_block:
+        block_ranges_to_fetch.append((last_archivable_block + 1, end_block))
+    block_ranges_to_fetch = merge_block_ranges(block_ranges_to_fetch)
+
+    fetched_logs = []
+    for range_start, range_end in block_ranges_to_fetch:
+        fetched_logs.extend(
+            _fetch_logs_with_work_queue(chain, addresses, [topic0s], range_start, range_end, chunk_size_key)
         )
-        return local_raw_logs
+    RAW_LOG_ARCHIVE.write(chain.chain_id, gaps_by_key, fetched_logs)
 
-    global_raw_logs: list[dict] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_THREADS_FOR_PRE_SPLIT_FETCH) as thread_pool_executor:
-        future_to_block_range = {
-            thread_pool_executor.submit(_fetch_chunk, start_block, end_block): (start_block, end_block)
-            for (start_block, end_block) in new_start_and_end_blocks
-        }
-        for future in concurrent.futures.as_completed(future_to_block_range):
-            chunk_logs = future.result()
-            if chunk_logs:
-                global_raw_logs.extend(chunk_logs)
+    # drop archived logs that were scanned again because another key had a gap over the same blocks
+    archived_logs = [
+        log for log in archived_logs if not any(s <= int(log["blockNumber"], 16) <= e for s, e in block_ranges_to_fetch)
+    ]
+    return archived_logs + fetched_logs
 
-    return global_raw_logs
 
+def get_event_topic0(event: ContractEvent) -> str:
+    """lowercase 0x hex keccak of the event signature, the same form as topics[0] of a raw log"""
+    filter_params = _build_address_and_topics_for_event(event, None, hex(0), hex(0))
+    return filter_params["topics"][0].lower()
 
-def fetch_raw_event_logs(
-    event: ContractEvent,
+
+def fetch_raw_event_logs_for_many_events(
+    events: list[ContractEvent],
     chain: ChainData,
     start_block: int | None = None,
     end_block: int | None = None,
-    argument_filters: dict | None = None,
     addresses: list[str] | None = None,
 ) -> list[dict]:
-    # todo this should be a queue with jobs and retires,
-
-    # do up to 10 calls at once,
-    # try full split, (thne try those that fail again with half splits at the same time via the queue)
-    # continue
-    # that ought to be faster than recursuve splitting on a single thread for the large cases
-    start_block = chain.block_autopool_first_deployed if start_block is None else start_block
-    end_block = chain.get_block_near_top() if end_block is None else end_block
+    """
+    One getLogs scan for every log emitted by any of `addresses` whose topic0 is one of `events`.
 
-    try:
-        start_block, end_block = int(start_block), int(end_block)
-    except Exception as e:
-        raise AlchemyFetchEventsError(
-            f"start_block and end_block must be castable to integers, got {start_block}, {end_block}"
-        ) from e
+    eth_getLogs ORs the values inside a topic position, so this costs the same number of requests as
+    fetching a single event. The caller is expected to split the logs back apart by topics[0].
+    """
+    start_block, end_block = _resolve_block_range(chain, start_block, end_block)
+    if end_block < start_block:
+        raise AlchemyFetchEventsError(f"{end_block:,} must be at least {start_block:,}")
 
-    split_size = PRE_SPLIT_BLOCK_CHUNK_SIZE[chain]
-    raw_logs = _fetch_events_with_pre_split(
-        event, chain, start_block, end_block, argument_filters, split_size, addresses
-    )
-    return raw_logs
+    topic0s = sorted({get_event_topic0(event) for event in events})
+    chunk_size_key = (chain.chain_id, ",".join(topic0s))
+    return _fetch_logs_through_archive(chain, addresses, topic0s, start_block, end_block, chunk_size_key)
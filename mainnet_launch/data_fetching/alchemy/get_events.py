@@ -2,7 +2,11 @@ import pandas as pd
 
 from web3.contract import Contract, ContractEvent
 
-from mainnet_launch.data_fetching.alchemy.fetch_events_with_get_logs import fetch_raw_event_logs
+from mainnet_launch.data_fetching.alchemy.fetch_events_with_get_logs import (
+    fetch_raw_event_logs,
+    fetch_raw_event_logs_for_many_events,
+    get_event_topic0,
+)
 from mainnet_launch.data_fetching.alchemy.process_raw_event_logs import decode_logs
 from mainnet_launch.constants import ChainData, PLASMA_CHAIN
 
@@ -38,6 +42,37 @@ def fetch_events(
     return df
 
 
+def fetch_many_events(
+    events: list[ContractEvent],
+    chain: ChainData,
+    start_block: int = None,
+    end_block: int = None,
+    addresses: list[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Fetch every event in `events` emitted by any of `addresses` with a single getLogs scan.
+
+    Returns event_name -> DataFrame in the same shape as `fetch_events`, with an empty DataFrame for
+    events that had no logs. addresses defaults to the address of the first event.
+    """
+    if addresses is None:
+        addresses = [events[0].address]
+
+    raw_logs = fetch_raw_event_logs_for_many_events(
+        events=events,
+        chain=chain,
+        start_block=start_block,
+        end_block=end_block,
+        addresses=addresses,
+    )
+
+    topic0_to_raw_logs = {get_event_topic0(event): [] for event in events}
+    for log in raw_logs:
+        topic0_to_raw_logs[log["topics"][0].lower()].append(log)
+
+    return {event.event_name: decode_logs(event, topic0_to_raw_logs[get_event_topic0(event)]) for event in events}
+
+
 def get_each_event_in_contract(
     contract: Contract, chain: ChainData, start_block: int = None, end_block: int = None
 ) -> dict[str, pd.DataFrame]:
@@ -1,6 +1,11 @@
-# the dominating time cost is in the log decoding, not certain on the way to speed it up.
+# the dominating time cost is in the log decoding, events with only static inputs use _CompiledEventDecoder
+# everything else goes through web3 get_event_data
 
 from concurrent.futures import ProcessPoolExecutor
+import functools
+import json
+import re
+from typing import Callable
 
 import numpy as np
 import pandas as pd
@@ -30,6 +35,111 @@ def _flatten_args(args: dict) -> dict:
     return out
 
 
+_STATIC_TYPE_PATTERN = re.compile(r"^(?:(uint|int)(\d*)|(address)|(bool)|bytes(\d+))$")
+_WORD_HEX_CHARS = 64
+
+
+def _word_to_uint(word: str) -> int:
+    return int(word, 16)
+
+
+def _make_word_decoder(abi_type: str) -> Callable[[list[str]], list] | None:
+    """Decoder for a column of 64 hex char words of a single static abi type, None if the type is not static"""
+    match = _STATIC_TYPE_PATTERN.match(abi_type)
+    if match is None:
+        return None
+    int_kind, int_bits, is_address, is_bool, bytes_size = match.groups()
+
+    if int_kind == "uint":
+        return lambda words: [int(w, 16) for w in words]
+
+    if int_kind == "int":
+        # abi encoding sign extends every intN to 256 bits
+        return lambda words: [v - (1 << 256) if v >> 255 else v for v in map(_word_to_uint, words)]
+
+    if is_address:
+
+        def _decode_addresses(words: list[str]) -> list[str]:
+            lower_addresses = ["0x" + w[24:] for w in words]
+            checksummed = {a: Web3.toChecksumAddress(a) for a in set(lower_addresses)}
+            return [checksummed[a] for a in lower_addresses]
+
+        return _decode_addresses
+
+    if is_bool:
+        return lambda words: [int(w, 16) != 0 for w in words]
+
+    size = int(bytes_size)
+    if not 1 <= size <= 32:
+        return None
+    return lambda words: [bytes.fromhex(w[: 2 * size]) for w in words]
+
+
+class _CompiledEventDecoder:
+    """
+    Fixed layout decoder for an event whose inputs are all static types.
+
+    Each indexed input is one topic and each other input is one 32 byte word of data at a known offset,
+    so every argument is decoded as a whole column at once with one int(hex, 16) per value,
+    instead of running web3's generic get_event_data once per log.
+    """
+
+    def __init__(
+        self, event_name: str, topic_decoders: list[tuple[str, Callable]], data_decoders: list[tuple[str, Callable]]
+    ):
+        self.event_name = event_name
+        self.topic_decoders = topic_decoders
+        self.data_decoders = data_decoders
+        self.num_topics = 1 + len(topic_decoders)
+        self.data_hex_length = 2 + _WORD_HEX_CHARS * len(data_decoders)
+
+    def decode(self, raw_logs: list[dict]) -> dict[str, list] | None:
+        """Columns in the same shape as _worker_decode_chunk, or None if any log does not fit the layout"""
+        topics = [log["topics"] for log in raw_logs]
+        datas = [log["data"] for log in raw_logs]
+        if any(len(t) != self.num_topics for t in topics) or any(len(d) != self.data_hex_length for d in datas):
+            return None
+
+        lower_emitters = [log["address"].lower() for log in raw_logs]
+        checksummed_emitters = {a: Web3.toChecksumAddress(a) for a in set(lower_emitters)}
+
+        columns = {
+            "event": [self.event_name] * len(raw_logs),
+            "address": [checksummed_emitters[a] for a in lower_emitters],
+            "blockNumber": [int(log["blockNumber"], 16) for log in raw_logs],
+            "transactionIndex": [int(log["transactionIndex"], 16) for log in raw_logs],
+            "logIndex": [int(log["logIndex"], 16) for log in raw_logs],
+            "transactionHash": [log["transactionHash"] for log in raw_logs],
+        }
+
+        # web3 puts the indexed arguments first, keep the same column order
+        for i, (name, word_decoder) in enumerate(self.topic_decoders, start=1):
+            columns[name] = word_decoder([t[i][2:] for t in topics])
+
+        for i, (name, word_decoder) in enumerate(self.data_decoders):
+            start = 2 + i * _WORD_HEX_CHARS
+            columns[name] = word_decoder([d[start : start + _WORD_HEX_CHARS] for d in datas])
+
+        return columns
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_event_decoder(event_abi_json: str) -> _CompiledEventDecoder | None:
+    """None when the event has a dynamic, array or tuple input, or is anonymous, those go through web3"""
+    event_abi = json.loads(event_abi_json)
+    if event_abi.get("anonymous", False):
+        return None
+
+    topic_decoders, data_decoders = [], []
+    for event_input in event_abi["inputs"]:
+        word_decoder = _make_word_decoder(event_input["type"])
+        if word_decoder is None:
+            return None
+        (topic_decoders if event_input["indexed"] else data_decoders).append((event_input["name"], word_decoder))
+
+    return _CompiledEventDecoder(event_abi["name"], topic_decoders, data_decoders)
+
+
 def _worker_decode_chunk(args) -> list[dict]:
     abi, logs_chunk = args
     codec = Web3().codec
@@ -56,24 +166,31 @@ def _worker_decode_chunk(args) -> list[dict]:
     return decoded
 
 
+def _decode_logs_with_web3(abi: dict, raw_logs: list[dict]) -> list[dict]:
+    if len(raw_logs) < 5000:
+        # don't split if no too many logs
+        return _worker_decode_chunk((abi, raw_logs))
+
+    max_workers = 4
+    chunks = np.array_split(np.array(raw_logs), max_workers)
+    chunks = [(abi, list(chunk)) for chunk in chunks]
+    results: list[dict] = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        for decoded_chunk in ex.map(_worker_decode_chunk, chunks):
+            results.extend(decoded_chunk)
+    return results
+
+
 def decode_logs(event: ContractEvent, raw_logs: list[dict]) -> pd.DataFrame:
+    results = []
     if len(raw_logs) > 0:
         abi = event._get_event_abi()
-
-        if len(raw_logs) < 5000:
-            # don't split if no too many logs
-            results = _worker_decode_chunk((abi, raw_logs))
-        else:
-            max_workers = 4
-            chunks = np.array_split(np.array(raw_logs), max_workers)
-            chunks = [(abi, list(chunk)) for chunk in chunks]
-            results: list[dict] = []
-
-            with ProcessPoolExecutor(max_workers=max_workers) as ex:
-                for decoded_chunk in ex.map(_worker_decode_chunk, chunks):
-                    results.extend(decoded_chunk)
-    else:
-        results = []
+        decoder = _compile_event_decoder(json.dumps(abi, sort_keys=True))
+        columns = decoder.decode(raw_logs) if decoder is not None else None
+        # logs that don't fit the compiled layout (eg an ERC721 Transfer in an ERC20 Transfer scan)
+        # go through web3 so they fail or decode exactly as before
+        results = columns if columns is not None else _decode_logs_with_web3(abi, raw_logs)
 
     df = pd.DataFrame(results)
 
@@ -0,0 +1,190 @@
+"""
+Append-only local archive of raw eth_getLogs results, keyed by (chain_id, address, topic0, block range).
+
+Every row in log_segments says "these are all the logs `address` emitted with `topic0` between start_block and
+end_block", stored as zlib compressed json. Segments with no logs are kept too, they are what records the coverage.
+The (chain_id, address, topic0, end_block) index is the coverage index, the blocks of a request not covered by any
+segment are the gaps that still have to come from the RPC.
+
+Only ranges older than ETH_CALL_CACHE_FINALITY_DEPTH blocks from the top are archived, so a reorg can't leave stale
+logs behind. Rebuilding an event table after a decoder fix then reads from disk instead of re-scanning the chain.
+"""
+
+from os import environ
+import json
+import sqlite3
+import threading
+import zlib
+
+from mainnet_launch.constants import ChainData, WORKING_DATA_DIR
+from mainnet_launch.data_fetching.eth_call_cache import ETH_CALL_CACHE_FINALITY_DEPTH, DEFAULT_FINALITY_DEPTH
+
+RAW_LOG_ARCHIVE_ENABLED = environ.get("RAW_LOG_ARCHIVE_ENABLED", "true").lower() == "true"
+RAW_LOG_ARCHIVE_PATH = WORKING_DATA_DIR / "raw_log_archive.sqlite"
+
+ArchiveKey = tuple[str, str]  # (lowercase address, lowercase topic0)
+
+
+def merge_block_ranges(block_ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sorted, non overlapping inclusive ranges, touching ranges are joined"""
+    merged: list[tuple[int, int]] = []
+    for range_start, range_end in sorted(block_ranges):
+        if merged and range_start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+def subtract_block_ranges(start_block: int, end_block: int, covered: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """The parts of [start_block, end_block] not in any of `covered`"""
+    gaps = []
+    next_uncovered_block = start_block
+    for range_start, range_end in merge_block_ranges(covered):
+        if range_end < next_uncovered_block:
+            continue
+        if range_start > end_block:
+            break
+        if range_start > next_uncovered_block:
+            gaps.append((next_uncovered_block, range_start - 1))
+        next_uncovered_block = range_end + 1
+    if next_uncovered_block <= end_block:
+        gaps.append((next_uncovered_block, end_block))
+    return gaps
+
+
+def archive_key_of_log(log: dict) -> ArchiveKey:
+    return log["address"].lower(), log["topics"][0].lower()
+
+
+class RawLogArchive:
+    def __init__(self, path=RAW_LOG_ARCHIVE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.segments_read = 0
+        self.logs_served = 0
+        self.segments_written = 0
+        self.logs_written = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, sqlite connections can't be shared across threads"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS log_segments (
+                    chain_id INTEGER NOT NULL,
+                    address TEXT NOT NULL,
+                    topic0 TEXT NOT NULL,
+                    start_block INTEGER NOT NULL,
+                    end_block INTEGER NOT NULL,
+                    num_logs INTEGER NOT NULL,
+                    logs BLOB NOT NULL,
+                    PRIMARY KEY (chain_id, address, topic0, start_block)
+                ) WITHOUT ROWID
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS log_segments_coverage ON log_segments (chain_id, address, topic0, end_block)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def last_archivable_block(self, chain: ChainData) -> int:
+        """Blocks after this are too close to the top to archive, -1 when the archive is off"""
+        if not RAW_LOG_ARCHIVE_ENABLED:
+            return -1
+        return chain.get_block_near_top() - ETH_CALL_CACHE_FINALITY_DEPTH.get(chain, DEFAULT_FINALITY_DEPTH)
+
+    def read(
+        self, chain_id: int, keys: list[ArchiveKey], start_block: int, end_block: int
+    ) -> tuple[list[dict], dict[ArchiveKey, list[tuple[int, int]]]]:
+        """
+        The archived logs for each key between start_block and end_block, and the gaps for each key
+        (block ranges with no segment) that still need to be fetched. Keys with no gaps are left out.
+        """
+        connection = self._connection()
+        logs: list[dict] = []
+        gaps_by_key: dict[ArchiveKey, list[tuple[int, int]]] = {}
+        num_segments = 0
+
+        for address, topic0 in keys:
+            rows = connection.execute(
+                """
+                SELECT start_block, end_block, num_logs, logs FROM log_segments
+                WHERE chain_id = ? AND address = ? AND topic0 = ? AND end_block >= ? AND start_block <= ?
+                """,
+                (chain_id, address, topic0, start_block, end_block),
+            ).fetchall()
+
+            covered = []
+            for segment_start, segment_end, num_logs, compressed_logs in rows:
+                covered.append((segment_start, segment_end))
+                num_segments += 1
+                if num_logs == 0:
+                    continue
+                for log in json.loads(zlib.decompress(compressed_logs)):
+                    if start_block <= int(log["blockNumber"], 16) <= end_block:
+                        logs.append(log)
+
+            gaps = subtract_block_ranges(start_block, end_block, covered)
+            if gaps:
+                gaps_by_key[(address, topic0)] = gaps
+
+        with self._lock:
+            self.segments_read += num_segments
+            self.logs_served += len(logs)
+        return logs, gaps_by_key
+
+    def write(self, chain_id: int, gaps_by_key: dict[ArchiveKey, list[tuple[int, int]]], fetched_logs: list[dict]):
+        """
+        Archive one segment per (key, gap). Every gap must be inside a block range that `fetched_logs`
+        fully covers for all the keys, otherwise the archive would claim coverage it doesn't have.
+        """
+        if not gaps_by_key:
+            return
+
+        logs_by_key: dict[ArchiveKey, list[dict]] = {key: [] for key in gaps_by_key}
+        for log in fetched_logs:
+            key = archive_key_of_log(log)
+            if key in logs_by_key:
+                logs_by_key[key].append(log)
+
+        rows = []
+        for (address, topic0), gaps in gaps_by_key.items():
+            for gap_start, gap_end in gaps:
+                segment_logs = [
+                    log for log in logs_by_key[(address, topic0)] if gap_start <= int(log["blockNumber"], 16) <= gap_end
+                ]
+                compressed_logs = zlib.compress(json.dumps(segment_logs, separators=(",", ":")).encode())
+                rows.append((chain_id, address, topic0, gap_start, gap_end, len(segment_logs), compressed_logs))
+
+        connection = self._connection()
+        connection.executemany(
+            "INSERT OR IGNORE INTO log_segments (chain_id, address, topic0, start_block, end_block, num_logs, logs) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        connection.commit()
+
+        with self._lock:
+            self.segments_written += len(rows)
+            self.logs_written += sum(row[5] for row in rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments_read": self.segments_read,
+                "logs_served": self.logs_served,
+                "segments_written": self.segments_written,
+                "logs_written": self.logs_written,
+            }
+
+
+RAW_LOG_ARCHIVE = RawLogArchive()
@@ -41,6 +41,7 @@ def fetch_blocks_by_unix_timestamps_defillama(
     chain: ChainData,
     rate_limit_max_rate: int = 5,
     rate_limit_time_period: int = 2,
+    return_timestamp_to_block: bool = False,
 ):
     """
     Fetch blocks for a list of unix timestamps on a given chain via DeFiLlama,
@@ -50,6 +51,9 @@ def fetch_blocks_by_unix_timestamps_defillama(
         blocks_to_add: set[int]
         failures: list[dict]  (each contains timestamp + response for inspection)
 
+    if return_timestamp_to_block, returns {requested unix timestamp: block} instead, timestamps
+    DeFiLlama failed to resolve are left out
+
 
     gets the closest block before AND after the timestamp
     """
@@ -76,8 +80,12 @@ def fetch_blocks_by_unix_timestamps_defillama(
     request_df = pd.json_normalize(requests_kwargs)
 
     joined_df = pd.concat([request_df, response_df], axis=1)
+    joined_df["requested_timestamp"] = [int(ts) for ts in unix_timestamps]
     joined_df["pdtimestamp"] = pd.to_datetime(joined_df["timestamp"], unit="s", utc=True)
     joined_df = joined_df.dropna(subset=["height"])
 
+    if return_timestamp_to_block:
+        return dict(zip(joined_df["requested_timestamp"], joined_df["height"].astype(int)))
+
     blocks_add = list(joined_df["height"].astype(int))
     return blocks_add
@@ -0,0 +1,209 @@
+"""
+Local sqlite cache of raw eth_call results, keyed by (chain_id, block, target, calldata).
+
+State at a finalized block never changes, so once a call has succeeded at a block older than
+ETH_CALL_CACHE_FINALITY_DEPTH blocks from the top of the chain we never need to ask Alchemy again.
+This sits under the multicall layer in get_state_by_block, so backfills, retried steps and notebooks
+re-running the same blocks only hit the network for the calls we have not seen.
+
+Only successful calls are stored, reverts are always refetched. Least recently used rows are evicted
+once the file is over ETH_CALL_CACHE_MAX_BYTES.
+
+The cache is only an optimization, so a sqlite error (locked, corrupt or full file) is printed and the cache
+is turned off for the rest of the process, every call then goes to the network as if it were a miss.
+"""
+
+from os import environ
+import sqlite3
+import threading
+import time
+
+from mainnet_launch.constants import (
+    ChainData,
+    WORKING_DATA_DIR,
+    ETH_CHAIN,
+    BASE_CHAIN,
+    SONIC_CHAIN,
+    ARBITRUM_CHAIN,
+    PLASMA_CHAIN,
+    LINEA_CHAIN,
+)
+
+ETH_CALL_CACHE_ENABLED = environ.get("ETH_CALL_CACHE_ENABLED", "true").lower() == "true"
+ETH_CALL_CACHE_PATH = WORKING_DATA_DIR / "eth_call_cache.sqlite"
+ETH_CALL_CACHE_MAX_BYTES = int(environ.get("ETH_CALL_CACHE_MAX_BYTES", 5 * 1024**3))
+
+# roughly an hour of blocks on each chain, far past any reorg we would see
+ETH_CALL_CACHE_FINALITY_DEPTH = {
+    ETH_CHAIN: 300,
+    BASE_CHAIN: 1_800,
+    SONIC_CHAIN: 10_000,
+    ARBITRUM_CHAIN: 15_000,
+    PLASMA_CHAIN: 3_600,
+    LINEA_CHAIN: 1_800,
+}
+DEFAULT_FINALITY_DEPTH = 15_000
+
+# only check the file size every this many writes
+EVICTION_CHECK_EVERY_N_PUTS = 50
+EVICTION_TARGET_FRACTION = 0.9
+
+
+class EthCallCache:
+    def __init__(self, path=ETH_CALL_CACHE_PATH, max_bytes: int = ETH_CALL_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts_since_eviction_check = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self.disabled = False
+
+    def _disable(self, e: Exception) -> None:
+        with self._lock:
+            if self.disabled:
+                return
+            self.disabled = True
+        print(f"Disabling eth_call cache at {self.path} for the rest of this run: {type(e).__name__}: {e}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, sqlite connections can't be shared across threads"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS eth_calls (
+                    chain_id INTEGER NOT NULL,
+                    block INTEGER NOT NULL,
+                    target TEXT NOT NULL,
+                    calldata BLOB NOT NULL,
+                    output BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (chain_id, block, target, calldata)
+                ) WITHOUT ROWID
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS eth_calls_last_used ON eth_calls (last_used)")
+            self._local.connection = connection
+        return connection
+
+    def is_cacheable(self, chain: ChainData, block: int) -> bool:
+        if not ETH_CALL_CACHE_ENABLED or self.disabled:
+            return False
+        finality_depth = ETH_CALL_CACHE_FINALITY_DEPTH.get(chain, DEFAULT_FINALITY_DEPTH)
+        return int(block) <= chain.get_block_near_top() - finality_depth
+
+    def get_many(self, chain_id: int, block: int, keys: list[tuple[str, bytes]]) -> dict[tuple[str, bytes], bytes]:
+        """(target, calldata) -> raw output for every key we have"""
+        if not keys:
+            return {}
+        found = {}
+        if not self.disabled:
+            try:
+                found = self._get_many(chain_id, block, keys)
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+        num_hits = sum(key in found for key in keys)
+        with self._lock:
+            self.hits += num_hits
+            self.misses += len(keys) - num_hits
+        return found
+
+    def _get_many(self, chain_id: int, block: int, keys: list[tuple[str, bytes]]) -> dict[tuple[str, bytes], bytes]:
+        connection = self._connection()
+        found = {}
+        for target, calldata in keys:
+            row = connection.execute(
+                "SELECT output FROM eth_calls WHERE chain_id = ? AND block = ? AND target = ? AND calldata = ?",
+                (chain_id, int(block), target, calldata),
+            ).fetchone()
+            if row is not None:
+                found[(target, calldata)] = row[0]
+
+        if found:
+            now = time.time()
+            connection.executemany(
+                "UPDATE eth_calls SET last_used = ? WHERE chain_id = ? AND block = ? AND target = ? AND calldata = ?",
+                [(now, chain_id, int(block), target, calldata) for target, calldata in found],
+            )
+            connection.commit()
+        return found
+
+    def put_many(self, chain_id: int, block: int, rows: list[tuple[str, bytes, bytes]]) -> None:
+        """rows are (target, calldata, output) of successful calls"""
+        if not rows or self.disabled:
+            return
+        try:
+            self._put_many(chain_id, block, rows)
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+
+    def _put_many(self, chain_id: int, block: int, rows: list[tuple[str, bytes, bytes]]) -> None:
+        connection = self._connection()
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO eth_calls (chain_id, block, target, calldata, output, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(chain_id, int(block), target, calldata, output, now) for target, calldata, output in rows],
+        )
+        connection.commit()
+
+        with self._lock:
+            self.writes += len(rows)
+            self._puts_since_eviction_check += 1
+            should_check_size = self._puts_since_eviction_check >= EVICTION_CHECK_EVERY_N_PUTS
+            if should_check_size:
+                self._puts_since_eviction_check = 0
+
+        if should_check_size:
+            self._evict_if_over_budget(connection)
+
+    def _size_bytes(self, connection: sqlite3.Connection) -> int:
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def _evict_if_over_budget(self, connection: sqlite3.Connection) -> None:
+        size_bytes = self._size_bytes(connection)
+        if size_bytes <= self.max_bytes:
+            return
+
+        # rows are roughly the same size, so drop the matching fraction of the least recently used rows
+        row_count = connection.execute("SELECT COUNT(*) FROM eth_calls").fetchone()[0]
+        rows_to_drop = int(row_count * (1 - (self.max_bytes * EVICTION_TARGET_FRACTION) / size_bytes)) + 1
+        cursor = connection.execute(
+            """
+            DELETE FROM eth_calls WHERE (chain_id, block, target, calldata) IN (
+                SELECT chain_id, block, target, calldata FROM eth_calls ORDER BY last_used LIMIT ?
+            )
+            """,
+            (rows_to_drop,),
+        )
+        connection.commit()
+        with self._lock:
+            self.evicted += cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "writes": self.writes,
+                "evicted": self.evicted,
+                "disabled": self.disabled,
+            }
+
+
+ETH_CALL_CACHE = EthCallCache()
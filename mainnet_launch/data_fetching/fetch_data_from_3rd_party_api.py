@@ -14,6 +14,8 @@ from tqdm import tqdm
 import pandas as pd
 import requests
 
+from mainnet_launch.data_fetching.rate_limits import get_rate_limiter_for_url, retry_after_seconds
+
 THIRD_PARTY_SUCCESS_KEY = "3rd_party_response_success"
 
 
@@ -49,16 +51,22 @@ async def _get_json_with_retry(
     request_kwargs: dict,
     custom_failure_function=None,
 ):
+    provider_rate_limiter = get_rate_limiter_for_url(request_kwargs["url"])
     while True:
         async with rate_limiter:
+            await provider_rate_limiter.acquire_async()
             try:
                 try:
                     async with session.request(**request_kwargs, timeout=120) as resp:
                         if resp.status == 429:
-                            print("Rate limit exceeded, retrying...")
-                            await asyncio.sleep(60)
+                            # every request to this provider waits out the pause on its next acquire
+                            seconds_to_wait = provider_rate_limiter.record_throttle(retry_after_seconds(resp.headers))
+                            print(
+                                f"Rate limit exceeded by {provider_rate_limiter.name}, retrying in {seconds_to_wait:.1f}s"
+                            )
                             continue
 
+                        provider_rate_limiter.record_success()
                         try:
                             resp.raise_for_status()
                             data = await resp.json()
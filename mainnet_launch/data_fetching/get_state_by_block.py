@@ -1,11 +1,14 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
 from multicall import Multicall, Call
+from multicall.multicall import get_args
 from web3 import Web3
 
 import nest_asyncio
 import asyncio
+import threading
 
 from mainnet_launch.constants import (
     ChainData,
@@ -16,6 +19,8 @@ from mainnet_launch.constants import (
     SEMAPHORE_LIMITS_FOR_MULTICALL,
 )
 from mainnet_launch.database.postgres_operations import _exec_sql_and_cache
+from mainnet_launch.data_fetching.rate_limits import ALCHEMY, get_rate_limiter, is_throttle_exception
+from mainnet_launch.data_fetching.eth_call_cache import ETH_CALL_CACHE
 
 # todo, refactor into a mulicall folder
 # needed to run these functions in a jupyter notebook
@@ -61,10 +66,55 @@ async def safe_get_raw_state_by_block_one_block(calls: list[Call], block: int, c
     multicall.w3 = chain.client
     multicall.chainid = chain.chain_id
     multicall.multicall_address = MULTICALL_V3(chain)
+    await get_rate_limiter(ALCHEMY, chain).acquire_async()
+    if ETH_CALL_CACHE.is_cacheable(chain, block):
+        response = {}
+        for d in await _fetch_outputs_with_eth_call_cache(multicall, chain):
+            response.update(d)
+        return response
+
     response = await multicall.coroutine()
     return response
 
 
+async def _fetch_outputs_with_eth_call_cache(
+    multicall: Multicall, chain: ChainData, calls: list[Call] | None = None
+) -> list[dict]:
+    """
+    Like multicall.fetch_outputs(calls) but reads and writes the local eth_call cache.
+
+    Only the calls missing from the cache go over the network, the decoded outputs are in the same order as the calls.
+    Only use this for blocks where ETH_CALL_CACHE.is_cacheable(chain, block)
+    """
+    calls = multicall.calls if calls is None else calls
+    keys = [(call.target, call.data) for call in calls]
+    cached = ETH_CALL_CACHE.get_many(chain.chain_id, multicall.block_id, keys)
+
+    # the same call can show up more than once, only send it once
+    missing_key_to_call = {key: call for call, key in zip(calls, keys) if key not in cached}
+    missing_keys = list(missing_key_to_call)
+    key_to_result = {key: (True, output) for key, output in cached.items()}
+
+    if missing_keys:
+        args = get_args(list(missing_key_to_call.values()), require_success=False)
+        _, _, outputs = await multicall.aggregate.coroutine(args)
+        key_to_result.update(zip(missing_keys, outputs))
+        ETH_CALL_CACHE.put_many(
+            chain.chain_id,
+            multicall.block_id,
+            [
+                (target, calldata, output)
+                for (target, calldata), (success, output) in zip(missing_keys, outputs)
+                if success
+            ],
+        )
+
+    return [
+        Call.decode_output(key_to_result[key][1], call.signature, call.returns, key_to_result[key][0])
+        for call, key in zip(calls, keys)
+    ]
+
+
 def build_get_address_eth_balance_call(name: str, addr: str, chain: ChainData) -> Call:
     """Use the multicallV3 contract to get the normalized eth balance of an address"""
     return Call(
@@ -97,6 +147,7 @@ def get_raw_state_by_blocks(
     chain: ChainData,
     semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL,
     include_block_number: bool = False,
+    typed_columns: bool = False,
 ) -> pd.DataFrame:
     return asyncio.run(
         async_safe_get_raw_state_by_block(
@@ -105,10 +156,42 @@ def get_raw_state_by_blocks(
             chain,
             semaphore_limits,
             include_block_number=include_block_number,
+            typed_columns=typed_columns,
         )
     )
 
 
+# retries of the whole call list for one block before it is split in half,
+# and of each half (down to single calls) after that
+MULTICALL_ATTEMPTS_BEFORE_SPLIT = 3
+MULTICALL_ATTEMPTS_AFTER_SPLIT = 2
+
+_FAILED_CALL_RECORDS: list[dict] = []
+_FAILED_CALL_RECORDS_LOCK = threading.Lock()
+
+
+def _record_failed_call(chain: ChainData, block: int, call: Call, e: Exception) -> None:
+    record = {
+        "chain": chain.name,
+        "block": int(block),
+        "target": call.target,
+        "signature": call.signature.signature,
+        "names": [name for name, _ in call.returns],
+        "reason": f"{type(e).__name__}: {e}"[:500],
+    }
+    with _FAILED_CALL_RECORDS_LOCK:
+        _FAILED_CALL_RECORDS.append(record)
+    print(f"multicall: returning None for {record['names']} on {chain.name} at {block=}, {record['reason'][:200]}")
+
+
+def get_failed_call_records() -> pd.DataFrame:
+    """Every call in this process that still failed on its own, after bisecting its block's call list"""
+    with _FAILED_CALL_RECORDS_LOCK:
+        return pd.DataFrame.from_records(
+            _FAILED_CALL_RECORDS, columns=["chain", "block", "target", "signature", "names", "reason"]
+        )
+
+
 async def async_safe_get_raw_state_by_block(
     calls: list[Call],
     blocks: list[int],
@@ -116,6 +199,8 @@ async def async_safe_get_raw_state_by_block(
     semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL,
     include_block_number: bool = False,
     print_latency: bool = False,
+    typed_columns: bool = False,
+    semaphore: asyncio.Semaphore | None = None,
 ) -> pd.DataFrame:
     """
     Fetch a DataFame of each call in calls for each block in blocks on chain
@@ -126,6 +211,15 @@ async def async_safe_get_raw_state_by_block(
     block 5022 (Jun-15-2023) on Base
     mostly a non issue but keep in mind that this only works on recent (within last 3 years) data
 
+    If a block's multicall keeps failing its calls are split in half, recursively, down to single calls.
+    A call that fails on its own comes back as None and is recorded in get_failed_call_records().
+    The block timestamp call is fetched on its own instead of being split, and raises if it fails.
+
+    typed_columns=True returns int64 / float64 columns (NaN where a call failed) instead of object columns,
+    tuple and dict results are split into one column per element, eg (destination, "lp_token_spot_and_safe", 0)
+
+    Pass a semaphore shared by several concurrent calls to keep their multicalls in flight under one limit,
+    otherwise each call makes its own with a limit of semaphore_limits[0].
     """
 
     if not isinstance(calls, list):
@@ -157,55 +251,250 @@ async def async_safe_get_raw_state_by_block(
         m.chainid = chain.chain_id
         m.multicall_address = MULTICALL_V3(chain)
 
-    semaphore = asyncio.Semaphore(semaphore_limits[0])
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(semaphore_limits[0])
+    rate_limiter = get_rate_limiter(ALCHEMY, chain)
 
     latency_records = []
 
-    async def _fetch_data(multicall: Multicall):
-        async with semaphore:
-            for attempt in range(5):
-                start = datetime.now()
-                try:
-                    response = await multicall.fetch_outputs(multicall.calls)
-                    response.append({"block": multicall.block_id})
-                    merged = {}
-                    for d in response:
-                        merged.update(d)
-                    seconds_latency = (datetime.now() - start).microseconds / 1e6
-                    latency_records.append(
-                        {
-                            "seconds_latency": seconds_latency,
-                            "block": multicall.block_id,
-                            "num_calls": len(multicall.calls),
-                            "attempt": attempt,
-                        }
-                    )
-
-                    return merged
-                except Exception as e:
-                    pass
-                    # sleeping
+    async def _fetch_calls(multicall: Multicall, calls: list[Call], attempts: int) -> list[dict]:
+        for attempt in range(attempts):
+            await rate_limiter.acquire_async()
+            try:
+                if ETH_CALL_CACHE.is_cacheable(chain, multicall.block_id):
+                    response = await _fetch_outputs_with_eth_call_cache(multicall, chain, calls)
+                else:
+                    response = await multicall.fetch_outputs(calls)
+                rate_limiter.record_success()
+                return response
+            except Exception as e:
+                if is_throttle_exception(e):
+                    rate_limiter.record_throttle()  # the next acquire waits out the pause
+                    if attempt == attempts - 1:
+                        # being rate limited says nothing about the calls, don't split on it
+                        raise
+                else:
                     await asyncio.sleep((attempt**2) * 0.1)
+                    if attempt == attempts - 1:
+                        raise
 
-            pass
-            raise ValueError("failed to fetch data")
+    async def _fetch_calls_by_bisecting(multicall: Multicall, calls: list[Call], attempts: int) -> list[dict]:
+        """Split calls in half until every half succeeds, a single call that still fails comes back as None"""
+        try:
+            return await _fetch_calls(multicall, calls, attempts)
+        except Exception as e:
+            if is_throttle_exception(e):
+                raise
+
+            if any(call is get_timestamp_call for call in calls):
+                # the block is useless without its timestamp, so that call is never bisected and raises if it fails
+                other_calls = [call for call in calls if call is not get_timestamp_call]
+                timestamp_response = await _fetch_calls(multicall, [get_timestamp_call], MULTICALL_ATTEMPTS_AFTER_SPLIT)
+                if not other_calls:
+                    return timestamp_response
+                other_responses = await _fetch_calls_by_bisecting(
+                    multicall, other_calls, MULTICALL_ATTEMPTS_AFTER_SPLIT
+                )
+                return [*other_responses, *timestamp_response]
+
+            if len(calls) == 1:
+                _record_failed_call(chain, multicall.block_id, calls[0], e)
+                return [{name: None for name, _ in calls[0].returns}]
+
+            middle = len(calls) // 2
+            first_half, second_half = await asyncio.gather(
+                _fetch_calls_by_bisecting(multicall, calls[:middle], MULTICALL_ATTEMPTS_AFTER_SPLIT),
+                _fetch_calls_by_bisecting(multicall, calls[middle:], MULTICALL_ATTEMPTS_AFTER_SPLIT),
+            )
+            return [*first_half, *second_half]
 
-            # maybe the rate limiting on there end?
-            # if (e.args[0]["code"] == -32000) | (e.args[0]["code"] == 502): bad historical call, rate limited
+    async def _fetch_data(multicall: Multicall):
+        async with semaphore:
+            start = datetime.now()
+            response = await _fetch_calls_by_bisecting(multicall, multicall.calls, MULTICALL_ATTEMPTS_BEFORE_SPLIT)
+            response.append({"block": multicall.block_id})
+            merged = {}
+            for d in response:
+                merged.update(d)
+            seconds_latency = (datetime.now() - start).microseconds / 1e6
+            latency_records.append(
+                {
+                    "seconds_latency": seconds_latency,
+                    "block": multicall.block_id,
+                    "num_calls": len(multicall.calls),
+                }
+            )
+            return merged
 
     responses = await asyncio.gather(*[_fetch_data(m) for m in all_multicalls])
 
     if print_latency:
         print(pd.DataFrame(latency_records)["seconds_latency"].describe())
-        print(pd.DataFrame(latency_records)["attempt"].describe())
 
     if len(responses) != len(blocks):
         raise ValueError(f"Unexpected length difference between multicall responses and blocks")
 
+    if typed_columns:
+        return _convert_multicall_responses_to_typed_df(responses, include_block_number)
+
     df = _convert_multicall_responeses_to_df(responses, include_block_number)
     return df
 
 
+def get_raw_state_by_block_with_calls_per_block(
+    calls_by_block: dict[int, list[Call]],
+    chain: ChainData,
+    semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL,
+) -> pd.DataFrame:
+    return asyncio.run(async_safe_get_raw_state_by_block_with_calls_per_block(calls_by_block, chain, semaphore_limits))
+
+
+async def async_safe_get_raw_state_by_block_with_calls_per_block(
+    calls_by_block: dict[int, list[Call]],
+    chain: ChainData,
+    semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL,
+) -> pd.DataFrame:
+    """
+    Like async_safe_get_raw_state_by_block but each block gets its own list of calls.
+
+    Runs one multicall per block and returns a single DataFrame indexed by block. Columns are the union
+    of every call name, cells are NaN where that call was not made at that block.
+    """
+    if len(calls_by_block) == 0:
+        raise ValueError("calls_by_block cannot be empty")
+
+    semaphore = asyncio.Semaphore(semaphore_limits[0])
+
+    async def _fetch_one_block(block: int, calls: list[Call]) -> dict:
+        async with semaphore:
+            df = await async_safe_get_raw_state_by_block(
+                calls, [int(block)], chain, semaphore_limits, include_block_number=True
+            )
+            return df.iloc[0].to_dict()
+
+    records = await asyncio.gather(*[_fetch_one_block(block, calls) for block, calls in calls_by_block.items()])
+    df = pd.DataFrame.from_records(records)
+    df["block"] = df["block"].astype(int)
+    df.set_index("block", inplace=True)
+    df.sort_index(inplace=True)
+    return df
+
+
+# the eth_call gas cap we send with each multicall, and a soft cap on the size of its response
+MULTICALL_GAS_BUDGET = 550_000_000
+MULTICALL_RESPONSE_BYTES_BUDGET = 2_000_000
+DEFAULT_GAS_PER_CALL = 1_000_000
+DYNAMIC_RETURN_BYTES_ESTIMATE = 1_024
+
+
+def _estimate_response_bytes(call: Call) -> int:
+    output_types = ",".join(call.signature.output_types)
+    if any(dynamic in output_types for dynamic in ("string", "bytes", "[]")):
+        return DYNAMIC_RETURN_BYTES_ESTIMATE
+    # each static value is one 32 byte word, plus the (success, bytes) wrapper around each call
+    return 32 * (output_types.count(",") + 1) + 96
+
+
+class MulticallPlan:
+    """
+    Collects named groups of calls over the same blocks and fetches them together.
+
+    Every call for a block is packed into as few multicalls as fit under MULTICALL_GAS_BUDGET and
+    MULTICALL_RESPONSE_BYTES_BUDGET, instead of one multicall per group per block.
+
+        plan = MulticallPlan(chain, blocks)
+        plan.add_group("total_supply", total_supply_calls)
+        plan.add_group("summary_stats", summary_stats_calls, gas_per_call=5_000_000)
+        group_to_df = plan.execute()
+
+    Each frame in group_to_df looks like `get_raw_state_by_blocks(group_calls, blocks, chain, include_block_number=True)`
+    """
+
+    def __init__(self, chain: ChainData, blocks: list[int]):
+        if len(blocks) == 0:
+            raise ValueError("Blocks cannot be empty")
+        self.chain = chain
+        self.blocks = sorted({int(b) for b in blocks})
+        self.group_to_call_names: dict[str, list] = {}
+        self._calls_with_gas: list[tuple[Call, int]] = []
+        self._call_names = set()
+
+    def add_group(self, group_name: str, calls: list[Call], gas_per_call: int = DEFAULT_GAS_PER_CALL) -> None:
+        if group_name in self.group_to_call_names:
+            raise ValueError(f"{group_name=} is already in this plan")
+
+        # like a single multicall, a repeated name inside one group keeps the last value
+        call_names = list(dict.fromkeys(name for call in calls for name, _ in call.returns))
+        already_used = self._call_names.intersection(call_names)
+        if already_used:
+            raise ValueError(f"{group_name=} reuses call names from another group {list(already_used)[:5]}")
+
+        self._call_names.update(call_names)
+        self._calls_with_gas.extend((call, gas_per_call) for call in calls)
+        self.group_to_call_names[group_name] = call_names
+
+    def _pack_calls(self) -> list[list[Call]]:
+        chunks = [[]]
+        chunk_gas = 0
+        chunk_bytes = 0
+        for call, gas in self._calls_with_gas:
+            response_bytes = _estimate_response_bytes(call)
+            over_budget = (chunk_gas + gas > MULTICALL_GAS_BUDGET) or (
+                chunk_bytes + response_bytes > MULTICALL_RESPONSE_BYTES_BUDGET
+            )
+            if chunks[-1] and over_budget:
+                chunks.append([])
+                chunk_gas = 0
+                chunk_bytes = 0
+            chunks[-1].append(call)
+            chunk_gas += gas
+            chunk_bytes += response_bytes
+        return chunks
+
+    async def _fetch_wide_df(self, semaphore_limits: tuple[int], typed_columns: bool) -> pd.DataFrame:
+        # one limit on in flight multicalls across every chunk, not one per chunk
+        semaphore = asyncio.Semaphore(semaphore_limits[0])
+        chunk_dfs = await asyncio.gather(
+            *[
+                async_safe_get_raw_state_by_block(
+                    chunk,
+                    self.blocks,
+                    self.chain,
+                    semaphore_limits,
+                    include_block_number=True,
+                    typed_columns=typed_columns,
+                    semaphore=semaphore,
+                )
+                for chunk in self._pack_calls()
+            ]
+        )
+        # every chunk covers the same blocks, line them up on block (timestamps can repeat on L2s)
+        wide_df = chunk_dfs[0].reset_index().set_index("block")
+        for chunk_df in chunk_dfs[1:]:
+            chunk_df = chunk_df.reset_index(drop=True).set_index("block")
+            # a name repeated inside a group can land in two chunks, the later call wins like in one multicall
+            wide_df = wide_df.drop(columns=wide_df.columns.intersection(chunk_df.columns)).join(chunk_df)
+        return wide_df.reset_index().set_index("timestamp")
+
+    def execute_wide(
+        self, semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL, typed_columns: bool = False
+    ) -> pd.DataFrame:
+        """Every group in one frame, indexed by timestamp with a block column"""
+        return asyncio.run(self._fetch_wide_df(semaphore_limits, typed_columns))
+
+    def execute(
+        self, semaphore_limits: tuple[int] = SEMAPHORE_LIMITS_FOR_MULTICALL, typed_columns: bool = False
+    ) -> dict[str, pd.DataFrame]:
+        wide_df = self.execute_wide(semaphore_limits, typed_columns)
+        group_to_df = {}
+        for group_name, call_names in self.group_to_call_names.items():
+            if typed_columns:
+                # a tuple or dict result is split over several columns that all start with its name
+                call_names = [c for c in wide_df.columns if _typed_column_belongs_to(c, set(call_names))]
+            group_to_df[group_name] = wide_df[[*call_names, "block"]].copy()
+        return group_to_df
+
+
 def _convert_multicall_responeses_to_df(responses: list[dict], include_block_number: int):
 
     df = pd.DataFrame.from_records(responses)
@@ -219,6 +508,74 @@ def _convert_multicall_responeses_to_df(responses: list[dict], include_block_num
     return df
 
 
+def _to_typed_array(values: list) -> np.ndarray | None:
+    """int64 if every value is an int, float64 with NaN for the failed calls otherwise, None when not numeric"""
+    present = [v for v in values if v is not None]
+    if not all(isinstance(v, (int, float, np.number)) for v in present):
+        return None
+
+    if len(present) == len(values) and all(isinstance(v, (int, np.integer)) for v in present):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass  # raw uint256 values
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def _split_into_typed_columns(name, values: list) -> dict:
+    """One column per element of tuple results and per key of dict results, one column for everything else"""
+    name_as_tuple = name if isinstance(name, tuple) else (name,)
+    first = next((v for v in values if v is not None), None)
+
+    if isinstance(first, dict):
+        fields = dict.fromkeys(field for v in values if isinstance(v, dict) for field in v)
+        parts = {
+            (*name_as_tuple, field): [v.get(field) if isinstance(v, dict) else None for v in values] for field in fields
+        }
+    elif isinstance(first, (tuple, list)):
+        width = max(len(v) for v in values if isinstance(v, (tuple, list)))
+        parts = {
+            (*name_as_tuple, i): [v[i] if isinstance(v, (tuple, list)) and i < len(v) else None for v in values]
+            for i in range(width)
+        }
+    else:
+        parts = {name: values}
+
+    typed_columns = {}
+    for column, column_values in parts.items():
+        typed_array = _to_typed_array(column_values)
+        # addresses and strings stay as objects
+        typed_columns[column] = typed_array if typed_array is not None else np.array(column_values, dtype=object)
+    return typed_columns
+
+
+def _typed_column_belongs_to(column, call_names: set) -> bool:
+    """If column is a call name or one of the split out columns of a call name, eg (destination, "lp_token_spot_and_safe", 0)"""
+    if column in call_names:
+        return True
+    if isinstance(column, tuple):
+        return column[0] in call_names or any(column[:k] in call_names for k in range(2, len(column)))
+    return False
+
+
+def _convert_multicall_responses_to_typed_df(responses: list[dict], include_block_number: int) -> pd.DataFrame:
+    """Like _convert_multicall_responeses_to_df but built column by column into numpy arrays"""
+    names = dict.fromkeys(name for response in responses for name in response)
+    columns = {}
+    for name in names:
+        columns.update(_split_into_typed_columns(name, [response.get(name) for response in responses]))
+
+    df = pd.DataFrame(columns, index=pd.RangeIndex(len(responses)))
+    df.set_index("timestamp", inplace=True)
+    df.index = pd.to_datetime(df.index, unit="s", utc=True)
+    df.sort_index(inplace=True)
+    df["block"] = df["block"].astype(int)
+    if not include_block_number:
+        df.drop(columns="block", inplace=True)
+
+    return df
+
+
 def safe_normalize_with_bool_success(success: int, value: int):
     if success:
         return int(value) / 1e18
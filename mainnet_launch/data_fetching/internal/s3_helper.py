@@ -14,10 +14,18 @@ AUTO_ETH2 After Jan 2, 2026
 
 There is one rebalance plan that overlaps the dates
 
+Plans never change once written, so every plan we download is kept in a local gzip cache
+under WORKING_DATA_DIR / "rebalance_plan_cache", addressed by sha256(bucket/key).
+Least recently read plans are evicted once the cache is over REBALANCE_PLAN_CACHE_MAX_BYTES.
+
 """
 
 from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
 import json
+import os
+import threading
 import time
 
 import boto3
@@ -26,12 +34,24 @@ from botocore.config import Config
 
 from mainnet_launch.constants import AutopoolConstants, WORKING_DATA_DIR, S3_BUCKETS, AUTO_ETH, ALL_AUTOPOOLS, AUTO_USD
 
-from mainnet_launch.database.postgres_operations import get_subset_of_table_as_df
+from sqlalchemy import text
+
+from mainnet_launch.database.postgres_operations import get_full_table_as_df, get_subset_of_table_as_df
 
-from mainnet_launch.database.schema.full import RebalancePlans, RebalanceEvents
+from mainnet_launch.database.schema.full import (
+    Base,
+    RebalancePlans,
+    RebalanceEvents,
+    S3ListingHighWaterMark,
+    Session,
+)
 
 
-LOCAL_REBALANCE_ROOT = WORKING_DATA_DIR / "local_rebalance_plans"
+REBALANCE_PLAN_CACHE_DIR = WORKING_DATA_DIR / "rebalance_plan_cache"
+REBALANCE_PLAN_CACHE_OBJECTS_DIR = REBALANCE_PLAN_CACHE_DIR / "objects"
+# one `key\tbucket` line per plan, so we don't have to try both autoETH / autoUSD buckets on a miss
+REBALANCE_PLAN_BUCKET_INDEX_PATH = REBALANCE_PLAN_CACHE_DIR / "bucket_index.tsv"
+REBALANCE_PLAN_CACHE_MAX_BYTES = int(os.environ.get("REBALANCE_PLAN_CACHE_MAX_BYTES", 2 * 1024**3))
 
 # only autoETH has 2 buckets (as of Jan 9, 2026)
 AUTOPOOL_TO_S3_BUCKETS = {a: (a.solver_rebalance_plans_bucket,) for a in ALL_AUTOPOOLS if a not in (AUTO_ETH, AUTO_USD)}
@@ -43,92 +63,311 @@ def make_s3_client() -> boto3.client:
     return boto3.client("s3", config=Config(signature_version=UNSIGNED))
 
 
-def fetch_all_solver_rebalance_plan_file_names(autopool: AutopoolConstants, s3_client: boto3.client) -> list[str]:
+def _list_bucket_keys(s3_client: boto3.client, bucket: str, start_after: str | None = None) -> list[str]:
     """Required for when the solver bucket has more than 1k objects"""
     keys = []
     continuation_token = None
-    for bucket in AUTOPOOL_TO_S3_BUCKETS[autopool]:
-        while True:
-            kwargs = {"Bucket": bucket}
-            if continuation_token:
-                kwargs["ContinuationToken"] = continuation_token
+    while True:
+        kwargs = {"Bucket": bucket}
+        if start_after:
+            kwargs["StartAfter"] = start_after
+        if continuation_token:
+            kwargs["ContinuationToken"] = continuation_token
+
+        resp = s3_client.list_objects_v2(**kwargs)
+
+        for obj in resp.get("Contents", []):
+            keys.append(obj["Key"])
+
+        # Check if more results exist
+        if resp.get("IsTruncated"):  # True means there’s another page
+            continuation_token = resp["NextContinuationToken"]
+        else:
+            break
+
+    return keys
+
+
+def _list_buckets_in_parallel(
+    s3_client: boto3.client, bucket_to_start_after: dict[str, str | None]
+) -> dict[str, list[str]]:
+    with ThreadPoolExecutor(max_workers=max(len(bucket_to_start_after), 1)) as executor:
+        futures = {
+            bucket: executor.submit(_list_bucket_keys, s3_client, bucket, start_after)
+            for bucket, start_after in bucket_to_start_after.items()
+        }
+        return {bucket: future.result() for bucket, future in futures.items()}
+
+
+def fetch_all_solver_rebalance_plan_file_names(autopool: AutopoolConstants, s3_client: boto3.client) -> list[str]:
+    bucket_to_keys = _list_buckets_in_parallel(s3_client, {b: None for b in AUTOPOOL_TO_S3_BUCKETS[autopool]})
+    return [key for b in AUTOPOOL_TO_S3_BUCKETS[autopool] for key in bucket_to_keys[b]]
+
+
+def _read_listing_high_water_marks(table: type[Base]) -> dict[str, str]:
+    df = get_full_table_as_df(
+        S3ListingHighWaterMark, where_clause=S3ListingHighWaterMark.table_name == table.__tablename__
+    )
+    return df.set_index("bucket")["last_listed_key"].to_dict()
+
+
+def write_rebalance_plan_listing_high_water_marks(table: type[Base], bucket_to_high_water_mark: dict[str, str]) -> None:
+    """Only call once every key up to the high water mark is in table, the next listing starts after it"""
+    if not bucket_to_high_water_mark:
+        return
+
+    query = """
+        INSERT INTO s3_listing_high_water_mark (table_name, bucket, last_listed_key)
+        VALUES (:table_name, :bucket, :last_listed_key)
+        ON CONFLICT (table_name, bucket) DO UPDATE
+        SET last_listed_key = GREATEST(s3_listing_high_water_mark.last_listed_key, EXCLUDED.last_listed_key)
+    """
+    with Session() as session:
+        session.execute(
+            text(query),
+            [
+                {"table_name": table.__tablename__, "bucket": bucket, "last_listed_key": key}
+                for bucket, key in bucket_to_high_water_mark.items()
+            ],
+        )
+        session.commit()
+
+
+def fetch_new_solver_rebalance_plan_file_names(
+    autopool: AutopoolConstants, s3_client: boto3.client, table: type[Base]
+) -> tuple[list[str], dict[str, list[str]]]:
+    """
+    Lists only the keys after what we have already saved in table, keys are timestamp ordered so this is a prefix scan
+
+    Each bucket starts after its high water mark in S3ListingHighWaterMark, a bucket without one yet is listed in full.
+    Returns the new keys and the keys listed from each bucket, pass the latter to
+    `listing_high_water_marks` and then `write_rebalance_plan_listing_high_water_marks` once the keys are saved.
+    """
+    high_water_marks = _read_listing_high_water_marks(table)
+    bucket_to_keys = _list_buckets_in_parallel(
+        s3_client, {b: high_water_marks.get(b) for b in AUTOPOOL_TO_S3_BUCKETS[autopool]}
+    )
 
-            resp = s3_client.list_objects_v2(**kwargs)
+    keys = [key for b in AUTOPOOL_TO_S3_BUCKETS[autopool] for key in bucket_to_keys[b]]
+    return keys, bucket_to_keys
 
-            for obj in resp.get("Contents", []):
-                keys.append(obj["Key"])
 
-            # Check if more results exist
-            if resp.get("IsTruncated"):  # True means there’s another page
-                continuation_token = resp["NextContinuationToken"]
+def listing_high_water_marks(bucket_to_keys: dict[str, list[str]], failed_keys: set[str]) -> dict[str, str]:
+    """
+    The newest listed key of each bucket the next listing can start after. A bucket with a failed key stops
+    strictly below its earliest failed key, so that key and everything after it are listed again next run.
+    """
+    bucket_to_high_water_mark = {}
+    for bucket, bucket_keys in bucket_to_keys.items():
+        failed_bucket_keys = [k for k in bucket_keys if k in failed_keys]
+        if failed_bucket_keys:
+            earliest_failed_key = min(failed_bucket_keys)
+            bucket_keys = [k for k in bucket_keys if k < earliest_failed_key]
+        if bucket_keys:
+            bucket_to_high_water_mark[bucket] = max(bucket_keys)
+    return bucket_to_high_water_mark
+
+
+class _RebalancePlanCache:
+    """On disk (bucket, key) -> gzipped plan json, with a size bounded LRU and a key -> bucket memo"""
+
+    def __init__(self, max_bytes: int = REBALANCE_PLAN_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_to_bucket: dict[str, str] | None = None
+        self._size_bytes: int | None = None
+
+    def _path(self, bucket: str, key: str):
+        digest = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+        return REBALANCE_PLAN_CACHE_OBJECTS_DIR / digest[:2] / f"{digest}.json.gz"
+
+    def _load_bucket_index(self) -> dict[str, str]:
+        if self._key_to_bucket is None:
+            self._key_to_bucket = {}
+            if REBALANCE_PLAN_BUCKET_INDEX_PATH.exists():
+                with REBALANCE_PLAN_BUCKET_INDEX_PATH.open("r", encoding="utf-8") as f:
+                    for line in f:
+                        key, _, bucket = line.rstrip("\n").partition("\t")
+                        if bucket:
+                            self._key_to_bucket[key] = bucket
+        return self._key_to_bucket
+
+    def known_bucket(self, key: str) -> str | None:
+        with self._lock:
+            return self._load_bucket_index().get(key)
+
+    def remember_bucket(self, key: str, bucket: str) -> None:
+        with self._lock:
+            key_to_bucket = self._load_bucket_index()
+            if key_to_bucket.get(key) == bucket:
+                return
+            key_to_bucket[key] = bucket
+            try:
+                REBALANCE_PLAN_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                with REBALANCE_PLAN_BUCKET_INDEX_PATH.open("a", encoding="utf-8") as f:
+                    f.write(f"{key}\t{bucket}\n")
+            except OSError:
+                pass  # the memo is only an optimization
+
+    def get(self, bucket: str, key: str) -> bytes | None:
+        path = self._path(bucket, key)
+        try:
+            with gzip.open(path, "rb") as f:
+                raw = f.read()
+        except (OSError, EOFError):
+            return None
+        try:
+            os.utime(path)  # mtime is the LRU clock
+        except OSError:
+            pass
+        return raw
+
+    def put(self, bucket: str, key: str, raw: bytes) -> None:
+        path = self._path(bucket, key)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+            written = path.stat().st_size
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return  # caching is best effort, eg a read only file system
+
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = sum(p.stat().st_size for p in REBALANCE_PLAN_CACHE_OBJECTS_DIR.rglob("*.json.gz"))
             else:
+                self._size_bytes += written
+
+            if self._size_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop the least recently read plans until the cache is at 90% of max_bytes"""
+        files = []
+        for p in REBALANCE_PLAN_CACHE_OBJECTS_DIR.rglob("*.json.gz"):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, p))
+
+        files.sort(key=lambda f: f[0])
+        size_bytes = sum(size for _, size, _ in files)
+        target_bytes = int(self.max_bytes * 0.9)
+        for _, size, p in files:
+            if size_bytes <= target_bytes:
                 break
+            p.unlink(missing_ok=True)
+            size_bytes -= size
 
-    return keys
+        self._size_bytes = size_bytes
+
+    def contains(self, bucket: str, key: str) -> bool:
+        return self._path(bucket, key).exists()
+
+    def keys_by_bucket(self, buckets: set[str]) -> dict[str, str]:
+        """key -> bucket for every remembered key in buckets"""
+        with self._lock:
+            return {k: b for k, b in self._load_bucket_index().items() if b in buckets}
+
+
+REBALANCE_PLAN_CACHE = _RebalancePlanCache()
+
+
+def _candidate_buckets(plan_path: str, autopool: AutopoolConstants) -> list[str]:
+    """This autopool's buckets, with the bucket we last found plan_path in first"""
+    buckets = list(AUTOPOOL_TO_S3_BUCKETS[autopool])
+    known_bucket = REBALANCE_PLAN_CACHE.known_bucket(plan_path)
+    if known_bucket in buckets:
+        buckets.remove(known_bucket)
+        buckets.insert(0, known_bucket)
+    return buckets
 
 
-def fetch_rebalance_plan_json_from_s3_bucket(plan_path: str, s3_client, autopool: AutopoolConstants):
+def _plan_from_raw(raw: bytes, plan_path: str, autopool: AutopoolConstants) -> dict:
+    plan = json.loads(raw)
+    plan["rebalance_plan_json_key"] = plan_path
+    plan["autopool_vault_address"] = autopool.autopool_eth_addr
+    return plan
+
+
+def fetch_rebalance_plan_json_from_s3_bucket(
+    plan_path: str, s3_client, autopool: AutopoolConstants, use_cache: bool = True
+):
+    buckets = _candidate_buckets(plan_path, autopool)
+
+    if use_cache:
+        for b in buckets:
+            raw = REBALANCE_PLAN_CACHE.get(b, plan_path)
+            if raw is not None:
+                REBALANCE_PLAN_CACHE.remember_bucket(plan_path, b)
+                return _plan_from_raw(raw, plan_path, autopool)
+
     last = None
-    for b in AUTOPOOL_TO_S3_BUCKETS[autopool]:
+    for b in buckets:
         try:
-            plan = json.loads(s3_client.get_object(Bucket=b, Key=plan_path)["Body"].read())
-            plan["rebalance_plan_json_key"] = plan_path
-            plan["autopool_vault_address"] = autopool.autopool_eth_addr
-            return plan
+            raw = s3_client.get_object(Bucket=b, Key=plan_path)["Body"].read()
+            plan = _plan_from_raw(raw, plan_path, autopool)
         except Exception as e:
             last = e
+            continue
+
+        REBALANCE_PLAN_CACHE.remember_bucket(plan_path, b)
+        if use_cache:
+            REBALANCE_PLAN_CACHE.put(b, plan_path, raw)
+        return plan
+
     raise RuntimeError(f"failed to download {plan_path} for autopool {autopool.name}") from last
 
 
-def download_local_rebalance_plans():
+def download_local_rebalance_plans(autopools: list[AutopoolConstants] = ALL_AUTOPOOLS) -> None:
     """
-    iterates through each autopool, lists its s3 bucket of rebalance-plan jsons,
-    creates a local subfolder, and downloads any missing json files in parallel.
+    Warms the local rebalance plan cache with every plan in each autopool's s3 buckets.
 
-    not used in production, but for adhoc analysis.
+    not used in production, but for adhoc analysis, read them back with `read_local_rebalance_plans`
     """
-    LOCAL_REBALANCE_ROOT.mkdir(parents=True, exist_ok=True)
     s3_client = make_s3_client()
 
-    for autopool in ALL_AUTOPOOLS:
-        for bucket_name in AUTOPOOL_TO_S3_BUCKETS[autopool]:
-            subfolder = LOCAL_REBALANCE_ROOT / autopool.name
-            subfolder.mkdir(parents=True, exist_ok=True)
-
-            response = s3_client.list_objects_v2(Bucket=bucket_name)
-            contents = response.get("Contents") or []
-            all_keys = [obj["Key"] for obj in contents]
-
-            existing_files = {p.name for p in subfolder.glob("*.json")}
-            keys_to_fetch = [key for key in all_keys if key not in existing_files]
-
-            if not keys_to_fetch:
-                continue
-
-            def download(key: str):
-                attempts = 3
-                for attempt in range(attempts):
-                    try:
-                        target_path = subfolder / key
-                        s3_client.download_file(bucket_name, key, str(target_path))
+    for autopool in autopools:
+        all_keys = fetch_all_solver_rebalance_plan_file_names(autopool, s3_client)
+        keys_to_fetch = [
+            key
+            for key in all_keys
+            if not any(REBALANCE_PLAN_CACHE.contains(b, key) for b in AUTOPOOL_TO_S3_BUCKETS[autopool])
+        ]
+
+        if not keys_to_fetch:
+            continue
+
+        def download(key: str):
+            attempts = 3
+            for attempt in range(attempts):
+                try:
+                    fetch_rebalance_plan_json_from_s3_bucket(key, s3_client, autopool)
+                    return
+                except Exception as e:
+                    if attempt == attempts - 1:
                         return
-                    except Exception as e:
-                        if attempt == attempts - 1:
-                            return
-                        time.sleep((2**attempt) / 2)
+                    time.sleep((2**attempt) / 2)
 
-            with ThreadPoolExecutor(max_workers=50) as executor:
-                executor.map(download, keys_to_fetch)
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            list(executor.map(download, keys_to_fetch))
 
 
 def read_local_rebalance_plans(
     autopool: AutopoolConstants,
 ) -> list[dict]:
-    subfolder = LOCAL_REBALANCE_ROOT / autopool.name
+    """All of this autopool's plans in the local cache, sorted by key. Only as complete as the cache is."""
+    key_to_bucket = REBALANCE_PLAN_CACHE.keys_by_bucket(set(AUTOPOOL_TO_S3_BUCKETS[autopool]))
+
     plans = []
-    for path in sorted(subfolder.glob("*.json")):
-        with path.open("r", encoding="utf-8") as f:
-            plans.append(json.load(f))
+    for key in sorted(key_to_bucket):
+        raw = REBALANCE_PLAN_CACHE.get(key_to_bucket[key], key)
+        if raw is not None:
+            plans.append(_plan_from_raw(raw, key, autopool))
 
     return plans
 
@@ -0,0 +1,218 @@
+"""
+Process wide token buckets, one per provider (and one per chain for Alchemy).
+
+Every HTTP entry point (3rd party requests, multicall, eth_getLogs, the subgraph) takes a token from
+the bucket for the provider it is about to hit, so steps running in parallel share one quota instead
+of each assuming it has the whole thing.
+
+On a 429 the bucket halves its rate and pauses for Retry-After (or an exponential backoff),
+then creeps back up to the configured rate on each success (AIMD).
+
+    limiter = get_rate_limiter(ALCHEMY, chain)
+    limiter.acquire()  # or await limiter.acquire_async()
+    ...
+    limiter.record_throttle(retry_after)  # on 429
+    limiter.record_success()
+
+"""
+
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+
+import pandas as pd
+
+from mainnet_launch.constants import ChainData, ALL_CHAINS
+
+
+ALCHEMY = "alchemy"
+DEFILLAMA = "defillama"
+SUBGRAPH = "subgraph"
+ETHERSCAN = "etherscan"
+ODOS = "odos"
+COINGECKO = "coingecko"
+DEX_SCREENER = "dex_screener"
+TOKEMAK_API = "tokemak_api"
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    requests_per_second: float
+    burst: int  # bucket capacity
+
+
+# requests per second, these are the values each fetcher used to hard code
+PROVIDER_RATE_LIMITS = {
+    ALCHEMY: RateLimitConfig(  # per chain
+        requests_per_second=float(os.environ.get("ALCHEMY_REQUESTS_PER_SECOND", 50)), burst=100
+    ),
+    DEFILLAMA: RateLimitConfig(requests_per_second=2.5, burst=5),
+    SUBGRAPH: RateLimitConfig(requests_per_second=10, burst=10),
+    ETHERSCAN: RateLimitConfig(requests_per_second=4, burst=1),
+    ODOS: RateLimitConfig(requests_per_second=0.8, burst=8),
+    COINGECKO: RateLimitConfig(requests_per_second=0.5, burst=1),
+    DEX_SCREENER: RateLimitConfig(requests_per_second=4, burst=4),
+    TOKEMAK_API: RateLimitConfig(requests_per_second=5, burst=5),
+}
+
+# anything we don't know about
+DEFAULT_RATE_LIMIT = RateLimitConfig(requests_per_second=5, burst=5)
+
+PROVIDER_HOSTS = {
+    "llama.fi": DEFILLAMA,
+    "etherscan.io": ETHERSCAN,
+    "odos.xyz": ODOS,
+    "coingecko.com": COINGECKO,
+    "dexscreener.com": DEX_SCREENER,
+    "subgraph.tokemaklabs.com": SUBGRAPH,
+    "tokemak.workers.dev": TOKEMAK_API,
+    "alchemy.com": ALCHEMY,  # the prices api, the rpc urls are matched to their chain first
+}
+
+# never slow down below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.05
+MAX_THROTTLE_BACKOFF_SECONDS = 60
+
+
+class TokenBucket:
+    """Thread safe token bucket usable from both sync code and any event loop"""
+
+    def __init__(self, name: str, config: RateLimitConfig):
+        self.name = name
+        self.config = config
+        self.rate = config.requests_per_second
+        self.tokens = float(config.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.throttles = 0
+        self.seconds_waited = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token (going into debt if needed), returns how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.config.burst, self.tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self.tokens -= 1
+            self.requests += 1
+
+            seconds_to_wait = max(0.0, -self.tokens / self.rate, self._paused_until - now)
+            self.seconds_waited += seconds_to_wait
+            return seconds_to_wait
+
+    def acquire(self) -> None:
+        seconds_to_wait = self._reserve()
+        if seconds_to_wait > 0:
+            time.sleep(seconds_to_wait)
+
+    async def acquire_async(self) -> None:
+        seconds_to_wait = self._reserve()
+        if seconds_to_wait > 0:
+            await asyncio.sleep(seconds_to_wait)
+
+    def record_throttle(self, retry_after: float | None = None) -> float:
+        """Halve the rate and pause everyone, returns the pause in seconds"""
+        with self._lock:
+            self.throttles += 1
+            self._consecutive_throttles += 1
+            self.rate = max(self.rate / 2, self.config.requests_per_second * MIN_RATE_FRACTION)
+
+            if retry_after is None:
+                retry_after = min(2**self._consecutive_throttles, MAX_THROTTLE_BACKOFF_SECONDS) + random.random()
+
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_throttles = 0
+            if self.rate < self.config.requests_per_second:
+                self.rate = min(self.config.requests_per_second, self.rate + self.config.requests_per_second * 0.05)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "requests": self.requests,
+                "throttles": self.throttles,
+                "seconds_waited": round(self.seconds_waited, 3),
+                "current_rate": round(self.rate, 3),
+                "configured_rate": self.config.requests_per_second,
+            }
+
+
+_REGISTRY: dict[str, TokenBucket] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_rate_limiter(provider: str, chain: ChainData | None = None) -> TokenBucket:
+    """The one bucket for this provider in this process, Alchemy gets one per chain"""
+    name = provider if chain is None else f"{provider}:{chain.name}"
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = TokenBucket(name, PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT))
+        return _REGISTRY[name]
+
+
+def _alchemy_host_to_chain() -> dict[str, ChainData]:
+    return {urlparse(chain.client.provider.endpoint_uri).hostname: chain for chain in ALL_CHAINS}
+
+
+def get_rate_limiter_for_url(url: str) -> TokenBucket:
+    host = urlparse(url).hostname or ""
+
+    chain = _alchemy_host_to_chain().get(host)
+    if chain is not None:
+        return get_rate_limiter(ALCHEMY, chain)
+
+    for host_suffix, provider in PROVIDER_HOSTS.items():
+        if host.endswith(host_suffix):
+            return get_rate_limiter(provider)
+
+    return get_rate_limiter(host)
+
+
+def is_throttle_exception(e: Exception) -> bool:
+    """Best effort, web3 / multicall / aiohttp all surface a 429 differently"""
+    return getattr(e, "status", None) == 429 or "429" in str(e) or "Too Many Requests" in str(e)
+
+
+def retry_after_seconds(headers) -> float | None:
+    """
+    Seconds to wait from a Retry-After header, either delta-seconds (possibly fractional) or an HTTP-date.
+    None when it is missing or can't be parsed, record_throttle() then falls back to its own backoff.
+    """
+    retry_after = headers.get("Retry-After") if headers is not None else None
+    if not retry_after:
+        return None
+
+    try:
+        seconds = float(retry_after)
+    except (TypeError, ValueError):
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            return None
+        seconds = retry_at.timestamp() - time.time()
+
+    if not math.isfinite(seconds):
+        return None
+    return max(seconds, 0.0)
+
+
+def get_rate_limit_stats() -> pd.DataFrame:
+    with _REGISTRY_LOCK:
+        buckets = list(_REGISTRY.values())
+    return pd.DataFrame.from_records([b.stats() for b in buckets])
@@ -1,23 +1,55 @@
 """Helper methods to fetch data from the tokemak subgraph"""
 
+from dataclasses import dataclass
+import asyncio
 import requests
-import random
-import time
 
 
+import aiohttp
 import pandas as pd
 from web3 import Web3
 
 
 from mainnet_launch.constants import AutopoolConstants
-from mainnet_launch.database.postgres_operations import _exec_sql_and_cache
+from mainnet_launch.data_fetching.fetch_data_from_3rd_party_api import _run_async_safely
+from mainnet_launch.data_fetching.rate_limits import SUBGRAPH, TokenBucket, get_rate_limiter, retry_after_seconds
 from mainnet_launch.database.schema.full import RebalanceEvents
+from mainnet_launch.database.schema.track_last_processed_block_helper import (
+    get_last_processed_block_by_name,
+    write_last_processed_block_by_name,
+)
 
 
 class TokemakSubgraphError(Exception):
     pass
 
 
+# status codes the subgraph server uses to ask us to slow down
+SUBGRAPH_THROTTLE_STATUS_CODES = (429, 502, 503, 504)
+SUBGRAPH_MAX_THROTTLE_RETRIES = 8
+
+# Origin, https/reblance-dashboard as an outgoing request header
+SUBGRAPH_HEADERS = {"Origin": "https://autopool-dashboard-data-fetching.com"}
+
+
+def _post_subgraph_query(api_url: str, payload: dict) -> dict:
+    """POST one page, the shared subgraph rate limiter backs off (for every caller) when the server signals throttling"""
+    rate_limiter = get_rate_limiter(SUBGRAPH)
+    for attempt in range(SUBGRAPH_MAX_THROTTLE_RETRIES):
+        rate_limiter.acquire()
+        resp = requests.post(api_url, json=payload)
+
+        if resp.status_code in SUBGRAPH_THROTTLE_STATUS_CODES:
+            rate_limiter.record_throttle(retry_after_seconds(resp.headers))
+            continue
+
+        rate_limiter.record_success()
+        resp.raise_for_status()
+        return resp.json()
+
+    raise TokemakSubgraphError(f"Still throttled by {api_url} after {SUBGRAPH_MAX_THROTTLE_RETRIES} attempts")
+
+
 def run_query_with_paginate(
     api_url: str, query: str, variables: dict, data_col: str, batch_size: int = 500, first_n_records: int | None = None
 ) -> pd.DataFrame:
@@ -32,16 +64,12 @@ def run_query_with_paginate(
 
     while True:
         vars_with_pagination = {**variables, "first": batch_size, "skip": skip}
-        time.sleep(5 + random.choice([_ for _ in range(5)]))
-        # Origin, https/reblance-dashboard as an outgoing request header
-        headers = {"Origin": "https://autopool-dashboard-data-fetching.com"}
-
-        resp = requests.post(api_url, json={"query": query, "variables": vars_with_pagination, "headers": headers})
-        resp.raise_for_status()
 
-        response_json = resp.json()
+        response_json = _post_subgraph_query(
+            api_url, {"query": query, "variables": vars_with_pagination, "headers": SUBGRAPH_HEADERS}
+        )
         if "errors" in response_json:
-            raise TokemakSubgraphError("Query must contain `first` and `skip` variables" + "\n" + query)
+            raise TokemakSubgraphError(f"{response_json['errors']=}" + "\n" + query)
         batch = response_json["data"][data_col]
 
         if not batch:
@@ -56,73 +84,165 @@ def run_query_with_paginate(
     return df
 
 
-def _get_highest_block_of_rebalance_events_already_saved_in_database(autopool: AutopoolConstants) -> int:
-    query = f"""
-        SELECT MAX(transactions.block) AS block
-        FROM rebalance_events
-        JOIN transactions 
-        ON rebalance_events.tx_hash = transactions.tx_hash
-        WHERE rebalance_events.autopool_vault_address = '{autopool.autopool_eth_addr}'
+@dataclass
+class KeysetQuery:
     """
+    A GraphQL query that pages on `<cursor_field>_gt: $cursor` instead of `skip`.
 
-    df = _exec_sql_and_cache(query)
-    if not df.empty and df["block"].iloc[0] is not None:
-        return int(df["block"].iloc[0])
-    else:
-        return autopool.block_deployed
-
-
-def _fetch_raw_rebalance_events_from_subgraph(autopool: AutopoolConstants) -> pd.DataFrame:
-    highest_block_already_seen = _get_highest_block_of_rebalance_events_already_saved_in_database(autopool)
-    highest_block_already_seen = 0
-    query = """
-    query(
-      $autoEthAddress: String!
-      $first: Int!
-      $skip: Int!
-      $minBlock: BigInt!
-    ) {
-      autopoolRebalances(
-        first: $first
-        skip: $skip
-        orderBy: id
-        orderDirection: desc
-        where: {
-          autopool: $autoEthAddress
-          blockNumber_gt: $minBlock
-        }
-      ) {
-        transactionHash
-        timestamp
-        blockNumber
-        tokenIn {
-          id
-          decimals
-        }
-        destinationInAddress
-        tokenInAmount
-        tokenOut {
-          id
-          decimals
-        }
-        destinationOutAddress
-        tokenOutAmount
-      }
-    }
+    The query must take `$first` and `$cursor`, filter on `<cursor_field>_gt: $cursor` and `orderBy: <cursor_field>`
+    ascending, and select `cursor_field`. Because the filter is on an indexed, unique field, each page costs the same
+    no matter how deep into the results it is, unlike `skip`.
     """
 
-    df = run_query_with_paginate(
-        autopool.chain.tokemak_subgraph_url,
-        query,
+    api_url: str
+    query: str
+    variables: dict
+    data_col: str
+    cursor_field: str = "id"
+    cursor_start: str = ""
+
+    def __post_init__(self):
+        if ("$first" not in self.query) or ("$cursor" not in self.query):
+            raise TokemakSubgraphError("Query must contain `first` and `cursor` variables" + "\n" + self.query)
+
+
+async def _async_post_subgraph_query(
+    session: aiohttp.ClientSession, rate_limiter: TokenBucket, api_url: str, payload: dict
+) -> dict:
+    for attempt in range(SUBGRAPH_MAX_THROTTLE_RETRIES):
+        await rate_limiter.acquire_async()
+        async with session.post(api_url, json=payload, timeout=120) as resp:
+            if resp.status not in SUBGRAPH_THROTTLE_STATUS_CODES:
+                rate_limiter.record_success()
+                resp.raise_for_status()
+                return await resp.json()
+            # the next acquire waits out the pause
+            rate_limiter.record_throttle(retry_after_seconds(resp.headers))
+
+    raise TokemakSubgraphError(f"Still throttled by {api_url} after {SUBGRAPH_MAX_THROTTLE_RETRIES} attempts")
+
+
+async def _async_run_query_with_keyset_paginate(
+    session: aiohttp.ClientSession, rate_limiter: TokenBucket, keyset_query: KeysetQuery, batch_size: int
+) -> pd.DataFrame:
+    batch_dfs = []
+    cursor = keyset_query.cursor_start
+
+    while True:
+        vars_with_pagination = {**keyset_query.variables, "first": batch_size, "cursor": cursor}
+        response_json = await _async_post_subgraph_query(
+            session,
+            rate_limiter,
+            keyset_query.api_url,
+            {"query": keyset_query.query, "variables": vars_with_pagination, "headers": SUBGRAPH_HEADERS},
+        )
+        if "errors" in response_json:
+            raise TokemakSubgraphError(f"{response_json['errors']=}" + "\n" + keyset_query.query)
+
+        batch = response_json["data"][keyset_query.data_col]
+        if batch:
+            batch_dfs.append(pd.DataFrame.from_records(batch))
+            cursor = batch[-1][keyset_query.cursor_field]
+
+        if len(batch) < batch_size:
+            break
+
+    if not batch_dfs:
+        return pd.DataFrame()
+    return pd.concat(batch_dfs, ignore_index=True)
+
+
+def run_queries_with_keyset_paginate(keyset_queries: list[KeysetQuery], batch_size: int = 1000) -> list[pd.DataFrame]:
+    """
+    Run every query concurrently, each paging on its own cursor, all sharing the process wide subgraph rate limiter.
+
+    Returns one DataFrame per query, in the same order as keyset_queries.
+    """
+
+    async def _run_all() -> list[pd.DataFrame]:
+        rate_limiter = get_rate_limiter(SUBGRAPH)
+        async with aiohttp.ClientSession() as session:
+            return await asyncio.gather(
+                *[_async_run_query_with_keyset_paginate(session, rate_limiter, q, batch_size) for q in keyset_queries]
+            )
+
+    if not keyset_queries:
+        return []
+    return _run_async_safely(_run_all())
+
+
+def run_query_with_keyset_paginate(
+    api_url: str, query: str, variables: dict, data_col: str, cursor_field: str = "id", batch_size: int = 1000
+) -> pd.DataFrame:
+    return run_queries_with_keyset_paginate(
+        [KeysetQuery(api_url, query, variables, data_col, cursor_field=cursor_field)], batch_size=batch_size
+    )[0]
+
+
+def _rebalance_events_cursor_name(autopool: AutopoolConstants) -> str:
+    return f"{RebalanceEvents.__tablename__}:{autopool.autopool_eth_addr}"
+
+
+def get_rebalance_events_subgraph_cursor(autopool: AutopoolConstants) -> int:
+    """The highest subgraph rebalance block already processed for this autopool, 0 if we have never run"""
+    cursor = get_last_processed_block_by_name(autopool.chain, _rebalance_events_cursor_name(autopool))
+    return 0 if cursor is None else cursor
+
+
+def write_rebalance_events_subgraph_cursor(autopool: AutopoolConstants, block: int) -> None:
+    """Only call this after every rebalance event at or below `block` is saved"""
+    write_last_processed_block_by_name(autopool.chain, block, _rebalance_events_cursor_name(autopool))
+
+
+REBALANCE_EVENTS_KEYSET_QUERY = """
+query(
+  $autoEthAddress: String!
+  $first: Int!
+  $cursor: ID!
+  $minBlock: BigInt!
+) {
+  autopoolRebalances(
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {
+      autopool: $autoEthAddress
+      blockNumber_gt: $minBlock
+      id_gt: $cursor
+    }
+  ) {
+    id
+    transactionHash
+    timestamp
+    blockNumber
+    tokenIn {
+      id
+      decimals
+    }
+    destinationInAddress
+    tokenInAmount
+    tokenOut {
+      id
+      decimals
+    }
+    destinationOutAddress
+    tokenOutAmount
+  }
+}
+"""
+
+
+def _build_rebalance_events_keyset_query(autopool: AutopoolConstants, min_block: int) -> KeysetQuery:
+    return KeysetQuery(
+        api_url=autopool.chain.tokemak_subgraph_url,
+        query=REBALANCE_EVENTS_KEYSET_QUERY,
         variables={
             "autoEthAddress": autopool.autopool_eth_addr.lower(),
-            "minBlock": highest_block_already_seen,
+            "minBlock": min_block,
         },
         data_col="autopoolRebalances",
     )
 
-    return df
-
 
 def _postprocess_rebalance_events_df(autopool: AutopoolConstants, df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
@@ -153,10 +273,24 @@ def _postprocess_rebalance_events_df(autopool: AutopoolConstants, df: pd.DataFra
     return df
 
 
+def fetch_new_rebalance_events_from_subgraph_for_autopools(
+    autopools: list[AutopoolConstants],
+) -> dict[AutopoolConstants, pd.DataFrame]:
+    """
+    Rebalance events after each autopool's subgraph cursor, see write_rebalance_events_subgraph_cursor
+
+    All autopools are paged concurrently
+    """
+    keyset_queries = [
+        _build_rebalance_events_keyset_query(autopool, get_rebalance_events_subgraph_cursor(autopool))
+        for autopool in autopools
+    ]
+    raw_dfs = run_queries_with_keyset_paginate(keyset_queries)
+    return {autopool: _postprocess_rebalance_events_df(autopool, df) for autopool, df in zip(autopools, raw_dfs)}
+
+
 def fetch_new_autopool_rebalance_events_from_subgraph(autopool: AutopoolConstants) -> pd.DataFrame:
-    df = _fetch_raw_rebalance_events_from_subgraph(autopool)
-    df = _postprocess_rebalance_events_df(autopool, df)
-    return df
+    return fetch_new_rebalance_events_from_subgraph_for_autopools([autopool])[autopool]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Benchmark the client side of the two bulk writers on token_values shaped rows
+
+insert_avoid_conflicts: DataFrame -> ORM objects -> to_tuple() -> set() -> CSV
+insert_df_avoid_conflicts: DataFrame -> primary key drop_duplicates -> binary COPY stream
+
+Both then run the same staging table COPY + INSERT ... ON CONFLICT DO NOTHING, so this times everything before
+the bytes go over the wire and does not need a database.
+
+poetry run python -m mainnet_launch.database.benchmark_insert_df_avoid_conflicts
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from mainnet_launch.database.schema.full import TokenValues
+from mainnet_launch.database.postgres_operations import (
+    _serialize_rows_to_csv,
+    _prepare_df_for_insert,
+    _encode_binary_copy_chunks,
+)
+
+TOKEN_VALUES_POSTGRES_TYPES = {
+    "block": "int4",
+    "chain_id": "int4",
+    "token_address": "varchar",
+    "denominated_in": "varchar",
+    "backing": "float8",
+    "safe_price": "float8",
+}
+
+
+def _make_synthetic_token_values_df(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    tokens = [f"0x{i:040x}" for i in range(200)]
+    num_blocks = max(1, num_rows // (len(tokens) * 2))
+
+    df = pd.DataFrame(
+        {
+            "block": 20_000_000 + rng.integers(0, num_blocks, size=num_rows),
+            "chain_id": 1,
+            "token_address": rng.choice(tokens, size=num_rows),
+            "denominated_in": rng.choice(tokens[:2], size=num_rows),
+            "backing": rng.random(num_rows),
+            "safe_price": rng.random(num_rows),
+        }
+    )
+    # failed calls
+    df.loc[rng.random(num_rows) < 0.05, "backing"] = np.nan
+    return df
+
+
+def _orm_path(df: pd.DataFrame) -> int:
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    new_rows = [TokenValues(**r) for r in records]
+    rows_as_tuples = list(set([r.to_tuple() for r in new_rows]))
+    return len(_serialize_rows_to_csv(rows_as_tuples).getvalue())
+
+
+def _df_path(df: pd.DataFrame) -> int:
+    df = _prepare_df_for_insert(df, TokenValues)
+    return sum(len(chunk) for chunk in _encode_binary_copy_chunks(df, TOKEN_VALUES_POSTGRES_TYPES))
+
+
+def benchmark_bulk_writers(row_counts: tuple[int] = (10_000, 100_000, 1_000_000)) -> pd.DataFrame:
+    records = []
+    for num_rows in row_counts:
+        df = _make_synthetic_token_values_df(num_rows)
+
+        start = time.perf_counter()
+        csv_bytes = _orm_path(df)
+        orm_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        binary_bytes = _df_path(df)
+        df_seconds = time.perf_counter() - start
+
+        records.append(
+            {
+                "num_rows": num_rows,
+                "orm_csv_seconds": round(orm_seconds, 3),
+                "df_binary_seconds": round(df_seconds, 3),
+                "speedup": round(orm_seconds / df_seconds, 1),
+                "csv_mb": round(csv_bytes / 1e6, 1),
+                "binary_mb": round(binary_bytes / 1e6, 1),
+            }
+        )
+
+    return pd.DataFrame.from_records(records)
+
+
+if __name__ == "__main__":
+    print(benchmark_bulk_writers().to_markdown(index=False))
@@ -0,0 +1,74 @@
+"""
+Benchmark read_sql_with_copy against pd.read_sql on the first 100k and 1M rows of the big tables
+
+pd.read_sql: psycopg2 builds a Python tuple per row, pandas converts those back into columns
+read_sql_with_copy: COPY (...) TO STDOUT as CSV, parsed by pandas' C parser straight into typed columns
+
+Both read the same SQL from the database in DATABASE_URL, and the two frames are checked to match.
+Peak memory is measured in a separate run with tracemalloc so it does not skew the timings.
+
+poetry run python -m mainnet_launch.database.benchmark_read_sql_with_copy
+"""
+
+import time
+import tracemalloc
+
+import pandas as pd
+from sqlalchemy import text
+
+from mainnet_launch.database.schema.full import ENGINE, Base
+from mainnet_launch.database.postgres_operations import read_sql_with_copy
+
+
+BENCHMARK_TABLES = ("swap_quotes", "destination_token_values", "transactions")
+
+
+def _read_with_read_sql(sql_plain_text: str) -> pd.DataFrame:
+    with ENGINE.connect() as conn:
+        return pd.read_sql(text(sql_plain_text), con=conn)
+
+
+def _time_and_peak_memory(read, sql_plain_text: str) -> tuple[pd.DataFrame, float, float]:
+    start = time.perf_counter()
+    df = read(sql_plain_text)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    read(sql_plain_text)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, seconds, peak_bytes
+
+
+def benchmark_readers(
+    tables: tuple[str] = BENCHMARK_TABLES, row_counts: tuple[int] = (100_000, 1_000_000)
+) -> pd.DataFrame:
+    records = []
+    for table_name in tables:
+        for num_rows in row_counts:
+            # ordered on the primary key so both readers get the same rows in the same order
+            primary_key = ", ".join(c.name for c in Base.metadata.tables[table_name].primary_key.columns)
+            sql_plain_text = f"SELECT * FROM {table_name} ORDER BY {primary_key} LIMIT {num_rows}"
+
+            read_sql_df, read_sql_seconds, read_sql_peak = _time_and_peak_memory(_read_with_read_sql, sql_plain_text)
+            copy_df, copy_seconds, copy_peak = _time_and_peak_memory(read_sql_with_copy, sql_plain_text)
+
+            pd.testing.assert_frame_equal(read_sql_df, copy_df, check_dtype=False)
+
+            records.append(
+                {
+                    "table": table_name,
+                    "num_rows": len(copy_df),
+                    "read_sql_seconds": round(read_sql_seconds, 3),
+                    "copy_seconds": round(copy_seconds, 3),
+                    "speedup": round(read_sql_seconds / copy_seconds, 1),
+                    "read_sql_peak_mb": round(read_sql_peak / 1e6, 1),
+                    "copy_peak_mb": round(copy_peak / 1e6, 1),
+                }
+            )
+
+    return pd.DataFrame.from_records(records)
+
+
+if __name__ == "__main__":
+    print(benchmark_readers().to_markdown(index=False))
@@ -2,9 +2,17 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterator
 from dataclasses import dataclass
+from itertools import chain, repeat
 import io
 import csv
+import os
+from os import environ
+import struct
+import threading
+import uuid
+import warnings
 from psycopg2 import sql
 
 from sqlalchemy.orm import DeclarativeBase, InstrumentedAttribute
@@ -17,6 +25,7 @@ import pandas as pd
 
 
 from mainnet_launch.database.schema.full import Session, Base, ENGINE
+from mainnet_launch.database.query_result_cache import QUERY_RESULT_CACHE
 
 # cchecksum faster if needed
 # https://github.com/BobTheBuidler/cchecksum
@@ -28,6 +37,15 @@ class CustomPostgresOperationException(Exception):
     pass
 
 
+class FullTableReadWarning(UserWarning):
+    """An unfiltered, unlimited read returned more than FULL_TABLE_READ_WARNING_ROWS rows"""
+
+    pass
+
+
+FULL_TABLE_READ_WARNING_ROWS = int(environ.get("FULL_TABLE_READ_WARNING_ROWS", 100_000))
+
+
 @dataclass
 class TableSelector:
     table: Base
@@ -41,6 +59,7 @@ def merge_tables_as_df(
     where_clause: BooleanClauseList | None = None,
     order_by: InstrumentedAttribute | None = None,
     order: str = "asc",
+    limit: int | None = None,
 ) -> pd.DataFrame:
     """
     Perform a multi-table JOIN based on the provided selectors.
@@ -48,74 +67,295 @@ def merge_tables_as_df(
     :param selectors: List of TableSelector, where the first entry becomes the FROM table,
                       and subsequent entries are JOINs.
     :param global_filter: An optional SQLA boolean expression applied as a global WHERE.
+    :param limit: Only the first `limit` rows, in `order_by` order when given.
     :returns: A pandas DataFrame containing the joined result.
     """
     if not selectors:
         raise CustomPostgresOperationException("At least one TableSelector is required")
     #
     with Session.begin() as session:
-        dialect = session.get_bind().dialect
+        select_parts, from_sql, has_filters = _merge_tables_select_and_from(selectors, where_clause, session)
 
-        select_parts: list[str] = []
-        for spec in selectors:
-            tbl_name = spec.table.__tablename__
-            if spec.select_fields is None:
-                select_parts.append(f"{tbl_name}.*")
-            else:
-                cols = spec.select_fields if isinstance(spec.select_fields, (list, tuple)) else [spec.select_fields]
-                for col in cols:
-                    select_parts.append(f"{tbl_name}.{col.key}")
-
-        sql = "SELECT\n" "    " + ",\n    ".join(select_parts) + "\n" f"FROM {selectors[0].table.__tablename__}\n"
-
-        # Add JOIN clauses
-        for spec in selectors[1:]:
-            on_sql = spec.join_on.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
-            sql += f"JOIN {spec.table.__tablename__}\n" f"  ON {on_sql}\n"
-        # Collect WHERE filters
-        filters = []
-        if where_clause is not None:
-            filters.append(where_clause)
-        for spec in selectors:
-            if spec.row_filter is not None:
-                filters.append(spec.row_filter)
-
-        if filters:
-            # Combine filters with AND
-            where_sql = " AND\n     ".join(
-                f"({flt.compile(dialect=dialect, compile_kwargs={'literal_binds': True})})" for flt in filters
-            )
-            sql += "WHERE\n"
-            sql += "    " + where_sql + "\n"
+        sql = "SELECT\n" "    " + ",\n    ".join(select_parts) + "\n" + from_sql
+        sql += _order_and_limit_to_string(order_by, order, limit, session)
 
-        if order_by is not None:
-            compiled_order = order_by.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
-            dir_upper = order.lower().upper()
-            if dir_upper not in ("ASC", "DESC"):
-                raise CustomPostgresOperationException("order must be 'asc' or 'desc'")
+    df = _exec_sql_and_cache(sql)
+    if not has_filters and limit is None:
+        _warn_on_large_full_table_read(selectors[0].table, df)
+    return df
 
-            sql += "ORDER BY\n"
-            sql += f"    {compiled_order} {dir_upper}\n"
 
-        return _exec_sql_and_cache(sql)
+TIME_BUCKET_RESOLUTIONS = ("hour", "day")
+# visible ranges up to this long are shown hourly, anything longer daily
+HOURLY_RESOLUTION_MAX_DAYS = 7
+
+
+def choose_time_bucket_resolution(
+    start_datetime: pd.Timestamp | str, end_datetime: pd.Timestamp | str | None = None
+) -> str:
+    """'hour' when the visible date range is short enough to plot hourly, otherwise 'day'"""
+    start_datetime = pd.Timestamp(start_datetime)
+    end_datetime = pd.Timestamp.now(tz="UTC") if end_datetime is None else pd.Timestamp(end_datetime)
+    if start_datetime.tzinfo is None:
+        start_datetime = start_datetime.tz_localize("UTC")
+    if end_datetime.tzinfo is None:
+        end_datetime = end_datetime.tz_localize("UTC")
+
+    if end_datetime - start_datetime <= pd.Timedelta(days=HOURLY_RESOLUTION_MAX_DAYS):
+        return "hour"
+    return "day"
+
+
+def get_last_row_per_time_bucket(
+    selectors: list[TableSelector],
+    datetime_column: InstrumentedAttribute,
+    resolution: str = "day",
+    partition_by: list[InstrumentedAttribute] | None = None,
+    where_clause: BooleanClauseList | None = None,
+) -> pd.DataFrame:
+    """
+    The same JOIN as merge_tables_as_df, but only the last row (by datetime_column) of every UTC hour or day
+    for each combination of partition_by, via DISTINCT ON (date_trunc(...)).
+
+    The rows are the database side version of .resample("1d").last(), so what comes back scales with the number of
+    buckets shown, not the number of blocks stored. Each row gets a `time_bucket` column, the start of its UTC hour or
+    day, and rows are in time_bucket order. Unlike resample().last() a NULL is not filled from earlier in the bucket,
+    and buckets with no rows are missing rather than NaN, use .set_index("time_bucket").asfreq() where that matters.
+    """
+    if not selectors:
+        raise CustomPostgresOperationException("At least one TableSelector is required")
+    if resolution not in TIME_BUCKET_RESOLUTIONS:
+        raise CustomPostgresOperationException(f"resolution must be one of {TIME_BUCKET_RESOLUTIONS}")
+
+    with Session.begin() as session:
+        select_parts, from_sql, _ = _merge_tables_select_and_from(selectors, where_clause, session)
+
+        datetime_sql = f"{datetime_column.class_.__tablename__}.{datetime_column.key}"
+        time_bucket_sql = f"date_trunc('{resolution}', {datetime_sql}, 'UTC')"
+        distinct_on = [time_bucket_sql] + [f"{col.class_.__tablename__}.{col.key}" for col in partition_by or []]
+
+        sql = (
+            f"SELECT DISTINCT ON ({', '.join(distinct_on)})\n"
+            "    " + ",\n    ".join(select_parts + [f"{time_bucket_sql} AS time_bucket"]) + "\n"
+        )
+        sql += from_sql
+        sql += "ORDER BY\n"
+        sql += "    " + ", ".join(distinct_on) + f", {datetime_sql} DESC\n"
+
+    return _exec_sql_and_cache(sql)
+
+
+def _merge_tables_select_and_from(
+    selectors: list[TableSelector], where_clause: BooleanClauseList | None, session
+) -> tuple[list[str], str, bool]:
+    """The select list, the FROM ... JOIN ... WHERE ... sql and if there was anything in the WHERE"""
+    dialect = session.get_bind().dialect
+
+    select_parts: list[str] = []
+    for spec in selectors:
+        tbl_name = spec.table.__tablename__
+        if spec.select_fields is None:
+            select_parts.append(f"{tbl_name}.*")
+        else:
+            cols = spec.select_fields if isinstance(spec.select_fields, (list, tuple)) else [spec.select_fields]
+            for col in cols:
+                select_parts.append(f"{tbl_name}.{col.key}")
+
+    sql = f"FROM {selectors[0].table.__tablename__}\n"
+
+    # Add JOIN clauses
+    for spec in selectors[1:]:
+        on_sql = spec.join_on.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        sql += f"JOIN {spec.table.__tablename__}\n" f"  ON {on_sql}\n"
+    # Collect WHERE filters
+    filters = []
+    if where_clause is not None:
+        filters.append(where_clause)
+    for spec in selectors:
+        if spec.row_filter is not None:
+            filters.append(spec.row_filter)
+
+    if filters:
+        # Combine filters with AND
+        where_sql = " AND\n     ".join(
+            f"({flt.compile(dialect=dialect, compile_kwargs={'literal_binds': True})})" for flt in filters
+        )
+        sql += "WHERE\n"
+        sql += "    " + where_sql + "\n"
+
+    return select_parts, sql, bool(filters)
 
 
-# @st.cache_data(ttl=60 * 60)
 def _exec_sql_and_cache(sql_plain_text: str) -> pd.DataFrame:
-    """cached on just the SQL text"""
+    """cached on just the SQL text in QUERY_RESULT_CACHE when it is enabled (the Streamlit apps)"""
     if not isinstance(sql_plain_text, str):
         raise TypeError("sql_plain_text must be a string")
 
-    with Session.begin() as session:
-        df = pd.read_sql(text(sql_plain_text), con=session.get_bind())
-        return df
+    return QUERY_RESULT_CACHE.get_or_run(sql_plain_text, _exec_sql)
+
+
+def _exec_sql(sql_plain_text: str) -> pd.DataFrame:
+    return read_sql_with_copy(sql_plain_text)
+
+
+COPY_TO_CHUNK_ROWS = 100_000
+
+# type oid (cursor.description type_code) -> how that column's COPY ... CSV text is parsed,
+# a query returning any other type (arrays, numeric, json, ...) is read with pd.read_sql instead
+_COPY_TO_COLUMN_KINDS = {
+    16: "bool",
+    20: "int",  # int8
+    21: "int",  # int2
+    23: "int",  # int4
+    700: "float",  # float4
+    701: "float",  # float8
+    25: "text",
+    1042: "text",  # bpchar
+    1043: "text",  # varchar
+    2950: "text",  # uuid, psycopg2 returns these as str as well
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+# ints are left to the parser so a column with NULLs becomes float64, the same as pd.read_sql
+_COPY_TO_CSV_DTYPES = {"float": "float64", "text": object, "timestamp": object, "timestamptz": object}
+_COPY_TO_NULL = "\\N"
+
+
+def read_sql_with_copy(sql_plain_text: str, chunksize: int | None = None) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """
+    Same result as pd.read_sql(text(sql_plain_text)) but streamed through COPY (sql_plain_text) TO STDOUT
+    and parsed by pandas' C CSV parser straight into typed columns, no Python tuple is built per row.
+
+    With chunksize, returns an iterator of DataFrames of at most chunksize rows instead.
+    The connection is held until the iterator is exhausted or closed.
+    """
+    chunks = _read_sql_with_copy_chunks(sql_plain_text, chunksize or COPY_TO_CHUNK_ROWS)
+    if chunksize is not None:
+        return chunks
+
+    chunks = list(chunks)
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def _strip_trailing_semicolons(sql_plain_text: str) -> str:
+    """pd.read_sql accepts `SELECT ...;` but postgres rejects a ; inside the parentheses of a subquery or COPY"""
+    return sql_plain_text.rstrip().rstrip(";").rstrip()
+
+
+def _read_sql_with_copy_chunks(sql_plain_text: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    sql_plain_text = _strip_trailing_semicolons(sql_plain_text)
+    raw_conn = ENGINE.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            cur.execute(f"SELECT * FROM ({sql_plain_text}) AS copy_to_query LIMIT 0")
+            column_names = [column.name for column in cur.description]
+            column_kinds = [_COPY_TO_COLUMN_KINDS.get(column.type_code) for column in cur.description]
+
+        if None in column_kinds:
+            raw_conn.close()
+            raw_conn = None
+            with ENGINE.connect() as conn:
+                yield from pd.read_sql(text(sql_plain_text), con=conn, chunksize=chunksize)
+            return
+
+        read_fd, write_fd = os.pipe()
+        reader = os.fdopen(read_fd, "rb", buffering=COPY_READ_SIZE)
+        writer = os.fdopen(write_fd, "wb", buffering=COPY_READ_SIZE)
+        copy_errors = []
+
+        def _copy_to_pipe() -> None:
+            try:
+                with raw_conn.cursor() as copy_cur:
+                    copy_cur.copy_expert(
+                        f"COPY ({sql_plain_text}) TO STDOUT WITH (FORMAT CSV, NULL '{_COPY_TO_NULL}')",
+                        writer,
+                        size=COPY_READ_SIZE,
+                    )
+            except Exception as e:
+                copy_errors.append(e)
+            finally:
+                try:
+                    writer.close()
+                except OSError:
+                    # the reader is already gone
+                    pass
+
+        copy_thread = threading.Thread(target=_copy_to_pipe, daemon=True)
+        copy_thread.start()
+        try:
+            yield from _parse_copy_to_csv(reader, column_names, column_kinds, chunksize)
+        finally:
+            # unblocks the COPY if the consumer stopped early
+            reader.close()
+            copy_thread.join()
+            if copy_errors:
+                # a COPY cut off half way leaves the connection unusable
+                raw_conn.invalidate()
+
+        if copy_errors:
+            raise copy_errors[0]
+    finally:
+        if raw_conn is not None:
+            raw_conn.close()
+
+
+def _parse_copy_to_csv(
+    stream, column_names: list[str], column_kinds: list[str], chunksize: int
+) -> Iterator[pd.DataFrame]:
+    # columns are read by position, joins can return the same name twice and read_csv refuses duplicate names
+    csv_chunks = pd.read_csv(
+        stream,
+        header=None,
+        names=list(range(len(column_names))),
+        dtype={i: _COPY_TO_CSV_DTYPES[kind] for i, kind in enumerate(column_kinds) if kind in _COPY_TO_CSV_DTYPES},
+        keep_default_na=False,
+        na_values={
+            i: [_COPY_TO_NULL, "NaN"] if kind == "float" else [_COPY_TO_NULL] for i, kind in enumerate(column_kinds)
+        },
+        true_values=["t"],
+        false_values=["f"],
+        chunksize=chunksize,
+    )
+    for chunk in csv_chunks:
+        for i, kind in enumerate(column_kinds):
+            if kind in ("timestamp", "timestamptz"):
+                chunk[i] = pd.to_datetime(chunk[i], utc=kind == "timestamptz", format="ISO8601")
+            elif chunk[i].dtype == object and chunk[i].hasnans:
+                # NULL is None not NaN in pd.read_sql results
+                chunk[i] = chunk[i].where(chunk[i].notna(), None)
+        chunk.columns = column_names
+        yield chunk
+
+
+# (database url, schema, table name) of tables already checked against their model in this process
+_VERIFIED_TABLE_SCHEMAS: set[tuple] = set()
+_POSTGRES_COLUMN_TYPES_CACHE: dict[str, dict[str, str]] = {}
+_SCHEMA_CACHE_LOCK = threading.Lock()
+
+
+def invalidate_table_schema_cache(table: type[DeclarativeBase] | None = None) -> None:
+    """Forget which tables were checked (all of them when table is None), call after a migration or rebuild"""
+    with _SCHEMA_CACHE_LOCK:
+        if table is None:
+            _VERIFIED_TABLE_SCHEMAS.clear()
+            _POSTGRES_COLUMN_TYPES_CACHE.clear()
+        else:
+            _VERIFIED_TABLE_SCHEMAS.difference_update(
+                [key for key in _VERIFIED_TABLE_SCHEMAS if key[2] == table.__table__.name]
+            )
+            _POSTGRES_COLUMN_TYPES_CACHE.pop(table.__tablename__, None)
 
 
 def assert_table_schema_matches_model(engine, table: type[DeclarativeBase]) -> None:
+    """Reflects the table once per process, later calls are a set lookup until invalidate_table_schema_cache()"""
     sa_table = table.__table__
     tn = sa_table.name
     schema = sa_table.schema  # None -> search_path/default
 
+    cache_key = (str(engine.url), schema, tn)
+    if cache_key in _VERIFIED_TABLE_SCHEMAS:
+        return
+
     model_cols = [c.name for c in sa_table.columns]
 
     insp = inspect(engine)
@@ -135,9 +375,16 @@ def assert_table_schema_matches_model(engine, table: type[DeclarativeBase]) -> N
             f"Resolve via migrations / rebuild."
         )
 
+    with _SCHEMA_CACHE_LOCK:
+        _VERIFIED_TABLE_SCHEMAS.add(cache_key)
+
 
 def insert_avoid_conflicts(
-    new_rows: list[Base], table: Base, index_elements: list[InstrumentedAttribute] = None, expecting_rows: bool = False
+    new_rows: list[Base],
+    table: Base,
+    index_elements: list[InstrumentedAttribute] = None,
+    expecting_rows: bool = False,
+    write_session: BulkWriteSession | None = None,
 ) -> None:
     assert_table_schema_matches_model(ENGINE, table)
     if not (isinstance(table, type) and issubclass(table, Base)):
@@ -150,28 +397,46 @@ def insert_avoid_conflicts(
             return
 
     rows_as_tuples = list(set([r.to_tuple() for r in new_rows]))
-    bulk_copy_skip_duplicates(rows_as_tuples, table)
+    bulk_copy_skip_duplicates(rows_as_tuples, table, write_session)
 
 
-def bulk_copy_skip_duplicates(rows: list[tuple], table: type[Base]) -> None:
+def bulk_copy_skip_duplicates(
+    rows: list[tuple], table: type[Base], write_session: BulkWriteSession | None = None
+) -> None:
     """
     Bulk-load `rows` into `table`, skipping any duplicates
     (based on the table's primary key or unique constraints).
     """
-    tn = table.__tablename__
     cols = [col.name for col in table.__table__.columns]
-    id_cols = [col.name for col in table.__table__.primary_key.columns]
+    buf = _serialize_rows_to_csv(rows)
+    if write_session is None:
+        _copy_into_staging_then_insert(table, cols, sql.SQL("CSV"), buf)
+    else:
+        write_session.copy_into_staging_then_insert(table, cols, sql.SQL("CSV"), buf)
 
-    # 1) Serialize rows to in‑memory CSV
+
+def _serialize_rows_to_csv(rows: list[tuple]) -> io.StringIO:
     buf = io.StringIO()
     writer = csv.writer(buf)
     writer.writerows(rows)
     buf.seek(0)
+    return buf
+
+
+def _staging_table_name(table: type[Base], suffix: str = "staging") -> str:
+    return f"{table.__tablename__}_{suffix}"
+
 
-    # 2) Prepare COPY & INSERT statements
-    copy_into_staging = sql.SQL("COPY {stg} ({fields}) FROM STDIN WITH CSV").format(
-        stg=sql.Identifier(f"{tn}_staging"),
+def _copy_into_existing_staging_then_insert(
+    cur, table: type[Base], staging: str, cols: list[str], copy_format: sql.SQL, buf
+) -> None:
+    tn = table.__tablename__
+    id_cols = [col.name for col in table.__table__.primary_key.columns]
+
+    copy_into_staging = sql.SQL("COPY {stg} ({fields}) FROM STDIN WITH (FORMAT {copy_format})").format(
+        stg=sql.Identifier(staging),
         fields=sql.SQL(", ").join(map(sql.Identifier, cols)),
+        copy_format=copy_format,
     )
     insert_main = sql.SQL(
         """
@@ -181,11 +446,35 @@ def bulk_copy_skip_duplicates(rows: list[tuple], table: type[Base]) -> None:
     """
     ).format(
         main=sql.Identifier(tn),
-        stg=sql.Identifier(f"{tn}_staging"),
+        stg=sql.Identifier(staging),
         fields=sql.SQL(", ").join(map(sql.Identifier, cols)),
         pkey=sql.SQL(", ").join(map(sql.Identifier, id_cols)),
     )
 
+    # Bulk‐COPY into staging, then move into main table
+    cur.copy_expert(copy_into_staging, buf, size=COPY_READ_SIZE)
+    cur.execute(insert_main)
+
+
+def _create_staging_table_sql(
+    table: type[Base], staging: str, on_commit: str, if_not_exists: bool = False
+) -> sql.Composed:
+    return sql.SQL(
+        "CREATE TEMP TABLE {if_not_exists}{stg} (LIKE {main} "
+        "INCLUDING ALL EXCLUDING CONSTRAINTS EXCLUDING INDEXES) "
+        "ON COMMIT {on_commit}"
+    ).format(
+        if_not_exists=sql.SQL("IF NOT EXISTS " if if_not_exists else ""),
+        stg=sql.Identifier(staging),
+        main=sql.Identifier(table.__tablename__),
+        on_commit=sql.SQL(on_commit),
+    )
+
+
+def _copy_into_staging_then_insert(table: type[Base], cols: list[str], copy_format: sql.SQL, buf) -> None:
+    """COPY buf into a temp copy of table, then INSERT ... ON CONFLICT DO NOTHING from it into table"""
+    staging = _staging_table_name(table)
+
     with ENGINE.connect() as conn:
         # this begin() opens a transaction and will commit on exit
         with conn.begin():
@@ -193,22 +482,246 @@ def bulk_copy_skip_duplicates(rows: list[tuple], table: type[Base]) -> None:
             raw_conn = conn.connection
             with raw_conn.cursor() as cur:
                 # a) Drop old staging
-                cur.execute(sql.SQL("DROP TABLE IF EXISTS {stg}").format(stg=sql.Identifier(f"{tn}_staging")))
+                cur.execute(sql.SQL("DROP TABLE IF EXISTS {stg}").format(stg=sql.Identifier(staging)))
                 # b) Create new temp staging
-                cur.execute(
-                    sql.SQL(
-                        "CREATE TEMP TABLE {stg} (LIKE {main} "
-                        "INCLUDING ALL EXCLUDING CONSTRAINTS EXCLUDING INDEXES) "
-                        "ON COMMIT DROP"
-                    ).format(
-                        stg=sql.Identifier(f"{tn}_staging"),
-                        main=sql.Identifier(tn),
-                    )
-                )
-                # c) Bulk‐COPY into staging
-                cur.copy_expert(copy_into_staging, buf)
-                # d) Move into main table
-                cur.execute(insert_main)
+                cur.execute(_create_staging_table_sql(table, staging, "DROP"))
+                # c) COPY and INSERT
+                _copy_into_existing_staging_then_insert(cur, table, staging, cols, copy_format, buf)
+    QUERY_RESULT_CACHE.expire_probe()
+
+
+class BulkWriteSession:
+    """
+    Many chunked inserts that reuse each table's temp staging table instead of creating and dropping one per insert.
+
+    No connection is held between writes, so the slow fetches between chunks don't tie up a pool slot. Each write
+    checks out a pooled connection, creates the staging table on it only if that connection doesn't have one yet
+    (CREATE TEMP TABLE IF NOT EXISTS) and leaves it there for the next write that gets the same connection.
+    Every insert is still its own transaction, the staging rows are cleared on commit (ON COMMIT DELETE ROWS).
+
+        with BulkWriteSession() as write_session:
+            for chunk in chunks:
+                insert_avoid_conflicts(chunk_rows, Transactions, write_session=write_session)
+    """
+
+    def __init__(self):
+        self._open = False
+
+    def __enter__(self) -> BulkWriteSession:
+        self._open = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._open = False
+
+    def copy_into_staging_then_insert(self, table: type[Base], cols: list[str], copy_format: sql.SQL, buf) -> None:
+        if not self._open:
+            raise CustomPostgresOperationException("BulkWriteSession must be used as a context manager")
+
+        staging = _staging_table_name(table, "session_staging")
+        raw_conn = ENGINE.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                # a no-op on a connection that already has it, temp tables live as long as the pooled connection
+                cur.execute(_create_staging_table_sql(table, staging, "DELETE ROWS", if_not_exists=True))
+                _copy_into_existing_staging_then_insert(cur, table, staging, cols, copy_format, buf)
+            raw_conn.commit()
+            QUERY_RESULT_CACHE.expire_probe()
+        except Exception:
+            # a staging table created in the failed transaction is rolled back with it
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+
+COPY_READ_SIZE = 1024 * 1024
+BINARY_COPY_ROWS_PER_CHUNK = 50_000
+
+_BINARY_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_BINARY_COPY_TRAILER = struct.pack(">h", -1)
+_NULL_FIELD = struct.pack(">i", -1)
+_FIELD_LENGTH = struct.Struct(">i")
+_POSTGRES_EPOCH = pd.Timestamp("2000-01-01", tz="UTC")
+
+
+def _fixed_width_encoder(value_format: str, to_python):
+    packer = struct.Struct(">i" + value_format)
+    width = packer.size - 4
+
+    def _encode(values: pd.Series) -> list[bytes]:
+        return [_NULL_FIELD if v is None else packer.pack(width, to_python(v)) for v in _to_list_with_none(values)]
+
+    return _encode
+
+
+def _encode_text(values: pd.Series) -> list[bytes]:
+    encoded = []
+    for v in _to_list_with_none(values):
+        if v is None:
+            encoded.append(_NULL_FIELD)
+        else:
+            b = str(v).encode("utf-8")
+            encoded.append(_FIELD_LENGTH.pack(len(b)) + b)
+    return encoded
+
+
+def _encode_timestamp(values: pd.Series) -> list[bytes]:
+    # microseconds since 2000-01-01 UTC
+    timestamps = pd.to_datetime(values, utc=True)
+    micros = ((timestamps - _POSTGRES_EPOCH) // pd.Timedelta(microseconds=1)).astype(object)
+    return _fixed_width_encoder("q", int)(micros.where(timestamps.notna(), None))
+
+
+def _encode_uuid(values: pd.Series) -> list[bytes]:
+    return [
+        (
+            _NULL_FIELD
+            if v is None
+            else _FIELD_LENGTH.pack(16) + (v if isinstance(v, uuid.UUID) else uuid.UUID(str(v))).bytes
+        )
+        for v in _to_list_with_none(values)
+    ]
+
+
+# postgres type name -> column encoder for binary COPY, anything else goes through the CSV path
+_BINARY_COPY_ENCODERS = {
+    "int2": _fixed_width_encoder("h", int),
+    "int4": _fixed_width_encoder("i", int),
+    "int8": _fixed_width_encoder("q", int),
+    "float4": _fixed_width_encoder("f", float),
+    "float8": _fixed_width_encoder("d", float),
+    "bool": _fixed_width_encoder("?", bool),
+    "varchar": _encode_text,
+    "text": _encode_text,
+    "bpchar": _encode_text,
+    "timestamptz": _encode_timestamp,
+    "timestamp": _encode_timestamp,
+    "uuid": _encode_uuid,
+}
+
+
+def _to_list_with_none(values: pd.Series) -> list:
+    if values.dtype != object and not values.hasnans:
+        return values.tolist()
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def _encode_binary_copy_chunks(df: pd.DataFrame, column_to_postgres_type: dict[str, str]):
+    """Yields the postgres binary COPY stream for df, BINARY_COPY_ROWS_PER_CHUNK rows at a time"""
+    encoders = [_BINARY_COPY_ENCODERS[column_to_postgres_type[col]] for col in df.columns]
+    row_header = struct.pack(">h", len(df.columns))
+
+    yield _BINARY_COPY_HEADER
+    for start in range(0, len(df), BINARY_COPY_ROWS_PER_CHUNK):
+        chunk = df.iloc[start : start + BINARY_COPY_ROWS_PER_CHUNK]
+        encoded_columns = [encode(chunk[col]) for encode, col in zip(encoders, df.columns)]
+        # row major: header, field, field, ... for each row
+        yield b"".join(chain.from_iterable(zip(repeat(row_header, len(chunk)), *encoded_columns)))
+    yield _BINARY_COPY_TRAILER
+
+
+class _ChunkedByteReader:
+    """Minimal file like wrapper so copy_expert can read a generator of bytes"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def read(self, size: int = -1) -> bytes:
+        while len(self._current) == 0:
+            try:
+                self._current = memoryview(next(self._chunks))
+            except StopIteration:
+                return b""
+        size = len(self._current) if size < 0 else size
+        out, self._current = self._current[:size], self._current[size:]
+        return out.tobytes()
+
+
+def _get_postgres_column_types(table: type[Base]) -> dict[str, str]:
+    """Cached per process alongside the schema check, see invalidate_table_schema_cache()"""
+    if table.__tablename__ in _POSTGRES_COLUMN_TYPES_CACHE:
+        return _POSTGRES_COLUMN_TYPES_CACHE[table.__tablename__]
+
+    with Session.begin() as session:
+        rows = session.execute(
+            text(
+                """
+                SELECT a.attname, t.typname
+                  FROM pg_attribute a
+                  JOIN pg_type t ON t.oid = a.atttypid
+                 WHERE a.attrelid = CAST(:table_name AS regclass)
+                   AND a.attnum > 0
+                   AND NOT a.attisdropped
+                """
+            ),
+            {"table_name": table.__tablename__},
+        ).all()
+
+    column_to_postgres_type = {column: type_name for column, type_name in rows}
+    with _SCHEMA_CACHE_LOCK:
+        _POSTGRES_COLUMN_TYPES_CACHE[table.__tablename__] = column_to_postgres_type
+    return column_to_postgres_type
+
+
+def _prepare_df_for_insert(df: pd.DataFrame, table: type[Base]) -> pd.DataFrame:
+    """Checks df against the model, puts the columns in model order and drops repeated primary keys"""
+    model_cols = [col.name for col in table.__table__.columns]
+    id_cols = [col.name for col in table.__table__.primary_key.columns]
+
+    unknown_cols = [c for c in df.columns if c not in model_cols]
+    if unknown_cols:
+        raise CustomPostgresOperationException(f"{unknown_cols=} are not columns of {table.__tablename__}")
+
+    missing_id_cols = [c for c in id_cols if c not in df.columns]
+    if missing_id_cols:
+        raise CustomPostgresOperationException(f"{missing_id_cols=} are needed to insert into {table.__tablename__}")
+
+    # nullable columns left out of df are inserted as NULL
+    df = df.reindex(columns=model_cols)
+    return df.drop_duplicates(subset=id_cols, keep="first").reset_index(drop=True)
+
+
+def insert_df_avoid_conflicts(
+    df: pd.DataFrame,
+    table: type[Base],
+    expecting_rows: bool = False,
+    write_session: BulkWriteSession | None = None,
+) -> None:
+    """
+    Like insert_avoid_conflicts but straight from a DataFrame, with one column per table column.
+
+    No ORM objects are built, the rows are de-duped on the primary key with pandas and streamed to postgres
+    as binary COPY into the same staging table + ON CONFLICT DO NOTHING.
+    NaN / None / NaT are inserted as NULL.
+    """
+    if not (isinstance(table, type) and issubclass(table, Base)):
+        raise TypeError("must be in order insert_df_avoid_conflicts(df, table), might have wrong order")
+
+    if df.empty:
+        if expecting_rows:
+            raise CustomPostgresOperationException("expecterd new rows here but found None")
+        else:
+            return
+
+    assert_table_schema_matches_model(ENGINE, table)
+    df = _prepare_df_for_insert(df, table)
+    column_to_postgres_type = _get_postgres_column_types(table)
+
+    if all(column_to_postgres_type[col] in _BINARY_COPY_ENCODERS for col in df.columns):
+        buf = _ChunkedByteReader(_encode_binary_copy_chunks(df, column_to_postgres_type))
+        if write_session is None:
+            _copy_into_staging_then_insert(table, list(df.columns), sql.SQL("BINARY"), buf)
+        else:
+            write_session.copy_into_staging_then_insert(table, list(df.columns), sql.SQL("BINARY"), buf)
+    else:
+        # eg array columns, same rows through the CSV path
+        bulk_copy_skip_duplicates(_to_list_with_none_rows(df), table, write_session)
+
+
+def _to_list_with_none_rows(df: pd.DataFrame) -> list[tuple]:
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
 
 
 def get_highest_value_in_field_where(table: Base, column: InstrumentedAttribute, where_clause: OperatorExpression):
@@ -225,6 +738,18 @@ def get_highest_value_in_field_where(table: Base, column: InstrumentedAttribute,
         return session.execute(sql).scalar_one_or_none()
 
 
+def delete_rows_where(table: Base, where_clause: OperatorExpression) -> int:
+    """DELETE the rows matching where_clause, returns how many were deleted"""
+    if where_clause is None:
+        raise CustomPostgresOperationException("delete_rows_where needs a where_clause, refusing to empty the table")
+
+    with Session.begin() as session:
+        where_sql = _where_clause_to_string(where_clause, session)
+        num_deleted = session.execute(text(f"DELETE FROM {table.__tablename__} {where_sql}")).rowcount
+    QUERY_RESULT_CACHE.expire_probe()
+    return num_deleted
+
+
 def _to_python_list(values) -> list:
     """Flatten to 1-D and convert numpy scalars -> native Python scalars."""
     try:
@@ -255,19 +780,22 @@ def get_subset_not_already_in_column_in_python(
     where_clause: OperatorExpression | None = None,
 ) -> list:
 
+    input_values = set(_to_python_list(values))
+    if not input_values:
+        return []
+
     with Session.begin() as session:
-        where_sql = _where_clause_to_string(where_clause, session)
+        # only the candidates that already exist come back, not the whole column
+        in_values = f"{column.key} = ANY(:vals)" + (f" OR {column.key} IS NULL" if None in input_values else "")
+        where_sql = _where_clause_to_string(where_clause, session, extra_predicates=[in_values])
 
-        query = f"""SELECT {column.key}
+        query = f"""SELECT DISTINCT {column.key}
                 FROM {table.__tablename__}
                 {where_sql}"""
 
-        df = pd.read_sql(text(query), con=session.get_bind())
-
-        rows = df[column.key].tolist()
+        rows = session.execute(text(query), {"vals": [v for v in input_values if v is not None]}).scalars().all()
 
     existing_values = set(rows)
-    input_values = set(_to_python_list(values))
     missing_values = input_values - existing_values
     return list(missing_values)
 
@@ -318,27 +846,44 @@ def get_subset_not_already_in_column_unnest(
         return rows
 
 
-def get_full_table_as_df(table: Base, where_clause: OperatorExpression | None = None) -> pd.DataFrame:
+def get_full_table_as_df(
+    table: Base,
+    where_clause: OperatorExpression | None = None,
+    columns: list[InstrumentedAttribute] | None = None,
+    order_by: InstrumentedAttribute | None = None,
+    order: str = "asc",
+    limit: int | None = None,
+) -> pd.DataFrame:
     with Session.begin() as session:
         where_sql = _where_clause_to_string(where_clause, session)
+        order_and_limit_sql = _order_and_limit_to_string(order_by, order, limit, session)
 
-        sql = text(
-            f"""
-            SELECT *
+        sql = f"""
+            SELECT {_select_list_to_string(table, columns)}
             FROM {table.__tablename__}
             {where_sql}
+            {order_and_limit_sql}
         """
-        )
 
-        df = pd.read_sql(sql, con=session.get_bind())
+        df = read_sql_with_copy(sql)
 
-        return df
+    if where_clause is None and limit is None:
+        _warn_on_large_full_table_read(table, df)
+    return df
 
 
-def get_full_table_as_df_with_block(table: Base, where_clause: OperatorExpression | None = None) -> pd.DataFrame:
+def get_full_table_as_df_with_block(
+    table: Base,
+    where_clause: OperatorExpression | None = None,
+    columns: list[InstrumentedAttribute] | None = None,
+    start_datetime: pd.Timestamp | str | None = None,
+    end_datetime: pd.Timestamp | str | None = None,
+    limit: int | None = None,
+) -> pd.DataFrame:
     """Fetch the full contents of a table (that has block and chain_id) along with the associated block datetime.
 
-    Optionally filter with a SQLAlchemy where_clause.
+    Optionally filter with a SQLAlchemy where_clause and to blocks in [start_datetime, end_datetime).
+    Rows are newest first, limit keeps the newest `limit` rows.
     """
     column_names = [a.name for a in table.__table__.columns]
     if not {"block", "chain_id"}.issubset(column_names):
@@ -347,12 +892,13 @@ def get_full_table_as_df_with_block(table: Base, where_clause: OperatorExpressio
         )
 
     with Session.begin() as session:
-        where_sql = _where_clause_to_string(where_clause, session)
+        where_sql = _where_clause_to_string(
+            where_clause, session, extra_predicates=_datetime_range_predicates(start_datetime, end_datetime)
+        )
 
-        sql = text(
-            f"""
+        sql = f"""
             SELECT
-                {table.__tablename__}.*,
+                {_select_list_to_string(table, columns)},
                 blocks.datetime
             FROM {table.__tablename__}
             JOIN blocks
@@ -360,30 +906,42 @@ def get_full_table_as_df_with_block(table: Base, where_clause: OperatorExpressio
              AND {table.__tablename__}.chain_id = blocks.chain_id
             {where_sql}
             ORDER BY blocks.datetime DESC
+            {_limit_to_string(limit)}
             """
-        )
 
-        df = pd.read_sql(sql, con=session.get_bind())
+        df = read_sql_with_copy(sql)
 
         df.set_index("datetime", inplace=True)
-        return df
+
+    if not where_sql and limit is None:
+        _warn_on_large_full_table_read(table, df)
+    return df
 
 
-def get_full_table_as_df_with_tx_hash(table: Base, where_clause: OperatorExpression | None = None) -> pd.DataFrame:
+def get_full_table_as_df_with_tx_hash(
+    table: Base,
+    where_clause: OperatorExpression | None = None,
+    columns: list[InstrumentedAttribute] | None = None,
+    start_datetime: pd.Timestamp | str | None = None,
+    end_datetime: pd.Timestamp | str | None = None,
+    limit: int | None = None,
+) -> pd.DataFrame:
     """Fetch the full contents of a table (that has transaction hashes) along with the associated transaction datetime.
 
-    Optionally filter with a SQLAlchemy where_clause.
+    Optionally filter with a SQLAlchemy where_clause and to blocks in [start_datetime, end_datetime).
+    Rows are newest first, limit keeps the newest `limit` rows.
     """
     if "tx_hash" not in [a.name for a in table.__table__.columns]:
         raise CustomPostgresOperationException(f"Table {table.__tablename__} must have a 'tx_hash' column")
 
     with Session.begin() as session:
-        where_sql = _where_clause_to_string(where_clause, session)
+        where_sql = _where_clause_to_string(
+            where_clause, session, extra_predicates=_datetime_range_predicates(start_datetime, end_datetime)
+        )
 
-        sql = text(
-            f"""
+        sql = f"""
             SELECT
-                {table.__tablename__}.*,
+                {_select_list_to_string(table, columns)},
                 blocks.datetime,
                 blocks.block
             FROM {table.__tablename__}
@@ -394,40 +952,44 @@ def get_full_table_as_df_with_tx_hash(table: Base, where_clause: OperatorExpress
              AND transactions.chain_id = blocks.chain_id
             {where_sql}
             ORDER BY blocks.datetime DESC
+            {_limit_to_string(limit)}
             """
-        )
 
-        df = pd.read_sql(sql, con=session.get_bind())
+        df = read_sql_with_copy(sql)
 
         df.set_index("datetime", inplace=True)
-        return df
+
+    if not where_sql and limit is None:
+        _warn_on_large_full_table_read(table, df)
+    return df
 
 
 def get_subset_of_table_as_df(
-    table: Base, columns: list[InstrumentedAttribute] | None = None, where_clause: OperatorExpression | None = None
+    table: Base,
+    columns: list[InstrumentedAttribute] | None = None,
+    where_clause: OperatorExpression | None = None,
+    order_by: InstrumentedAttribute | None = None,
+    order: str = "asc",
+    limit: int | None = None,
 ) -> pd.DataFrame:
     with Session.begin() as session:
         where_sql = _where_clause_to_string(where_clause, session)
+        order_and_limit_sql = _order_and_limit_to_string(order_by, order, limit, session)
 
-        if columns:
-            tbl = table.__tablename__
-            cols_sql = ", ".join(f"{tbl}.{col.key}" for col in columns)
-        else:
-            cols_sql = "*"
-
-        sql = text(
-            f"""
+        sql = f"""
             SELECT
-              {cols_sql}
+              {_select_list_to_string(table, columns)}
             FROM
               {table.__tablename__}
             {where_sql}
+            {order_and_limit_sql}
         """
-        )
 
-        df = pd.read_sql(sql, con=session.get_bind())
+        df = read_sql_with_copy(sql)
 
-        return df
+    if where_clause is None and limit is None:
+        _warn_on_large_full_table_read(table, df)
+    return df
 
 
 def get_full_table_as_orm(table: Base, where_clause: OperatorExpression | None = None) -> list[Base]:
@@ -457,31 +1019,89 @@ def natural_left_right_using_where(
         where_sql = _where_clause_to_string(where_clause, session)
         cols = ", ".join(col.key for col in using)
         using_sql = f"({cols})"
-        sql = text(
-            f"""
+        sql = f"""
             SELECT *
             FROM {left.__tablename__}
             JOIN {right.__tablename__}
             USING {using_sql}
             {where_sql}
         """
-        )
 
-        df = pd.read_sql(sql, con=session.get_bind())
+        df = read_sql_with_copy(sql)
 
         return df
 
 
-def _where_clause_to_string(where_clause: OperatorExpression | None, session) -> str:
+def _where_clause_to_string(
+    where_clause: OperatorExpression | None, session, extra_predicates: list[str] | None = None
+) -> str:
     """
-    where_clause like `Blocks.chain_id == ETH_CHAIN.chain_id`
+    where_clause like `Blocks.chain_id == ETH_CHAIN.chain_id`, ANDed with any plain SQL extra_predicates
     """
+    predicates = []
     if where_clause is not None:
         dialect = session.get_bind().dialect
         compiled_where = where_clause.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
-        return f"WHERE {str(compiled_where)}"
-    else:
+        predicates.append(str(compiled_where))
+    predicates.extend(extra_predicates or [])
+
+    if not predicates:
+        return ""
+    if len(predicates) == 1:
+        return f"WHERE {predicates[0]}"
+    return "WHERE " + " AND ".join(f"({predicate})" for predicate in predicates)
+
+
+def _select_list_to_string(table: Base, columns: list[InstrumentedAttribute] | None) -> str:
+    if not columns:
+        return f"{table.__tablename__}.*"
+    return ", ".join(f"{table.__tablename__}.{col.key}" for col in columns)
+
+
+def _datetime_range_predicates(
+    start_datetime: pd.Timestamp | str | None, end_datetime: pd.Timestamp | str | None
+) -> list[str]:
+    """blocks.datetime in [start_datetime, end_datetime), naive datetimes are taken as UTC"""
+    predicates = []
+    for bound, operator in ((start_datetime, ">="), (end_datetime, "<")):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        bound = bound.tz_localize("UTC") if bound.tzinfo is None else bound.tz_convert("UTC")
+        predicates.append(f"blocks.datetime {operator} '{bound.isoformat()}'")
+    return predicates
+
+
+def _limit_to_string(limit: int | None) -> str:
+    if limit is None:
         return ""
+    return f"LIMIT {int(limit)}"
+
+
+def _order_and_limit_to_string(order_by: InstrumentedAttribute | None, order: str, limit: int | None, session) -> str:
+    sql = ""
+    if order_by is not None:
+        dialect = session.get_bind().dialect
+        compiled_order = order_by.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        dir_upper = order.upper()
+        if dir_upper not in ("ASC", "DESC"):
+            raise CustomPostgresOperationException("order must be 'asc' or 'desc'")
+
+        sql += "ORDER BY\n"
+        sql += f"    {compiled_order} {dir_upper}\n"
+
+    return sql + _limit_to_string(limit)
+
+
+def _warn_on_large_full_table_read(table: Base, df: pd.DataFrame) -> None:
+    """Unfiltered reads only get slower as the table grows, point at the caller so it can be narrowed"""
+    if len(df) > FULL_TABLE_READ_WARNING_ROWS:
+        warnings.warn(
+            f"Read all {len(df):,} rows of {table.__tablename__}, more than {FULL_TABLE_READ_WARNING_ROWS:,}. "
+            "Pass a where_clause, a datetime range or a limit to read only the rows that are needed",
+            FullTableReadWarning,
+            stacklevel=3,
+        )
 
 
 # broken
@@ -525,6 +1145,7 @@ def bulk_overwrite(new_rows: list[Base], table: type[Base]) -> None:
             cur.execute(delete_sql, (tuple(pk_tuples),))
             execute_values(cur, insert_sql.as_string(cur), rows)
         conn.commit()
+    QUERY_RESULT_CACHE.expire_probe()
 
 
 def set_some_cells_to_null(
@@ -560,6 +1181,7 @@ def set_some_cells_to_null(
         # this begin() opens a transaction and will commit on exit
         with conn.begin():
             conn.exec_driver_sql(sql_stmt, (tuple(pk_tuples),))
+    QUERY_RESULT_CACHE.expire_probe()
 
 
 def simple_agg_by_one_table(
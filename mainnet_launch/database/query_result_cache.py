@@ -0,0 +1,158 @@
+"""
+Process wide cache of _exec_sql_and_cache results for the Streamlit apps, keyed on the SQL text.
+
+Every Streamlit session in the process shares it. An entry is only served while the tables its SQL reads
+have not been written to. Writes are detected with a cheap probe of postgres' own per table write counters
+(n_tup_ins + n_tup_upd + n_tup_del in pg_stat_user_tables), so the nightly update, which runs in another process,
+invalidates exactly the entries it touched. The probe runs at most once every QUERY_CACHE_PROBE_INTERVAL_SECONDS,
+writes made from this process through postgres_operations force the next lookup to probe again.
+
+Off unless enabled with QUERY_RESULT_CACHE.enable(), the update scripts read their own writes and stay uncached.
+Least recently used entries are dropped once the cached DataFrames use more than QUERY_CACHE_MAX_BYTES.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from os import environ
+import re
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from mainnet_launch.database.schema.full import Session, Base
+
+QUERY_CACHE_ENABLED = environ.get("QUERY_CACHE_ENABLED", "false").lower() == "true"
+QUERY_CACHE_MAX_BYTES = int(environ.get("QUERY_CACHE_MAX_BYTES", 1024**3))
+QUERY_CACHE_PROBE_INTERVAL_SECONDS = 30
+
+_TABLE_WRITE_COUNTERS_SQL = """
+    SELECT relname, n_tup_ins + n_tup_upd + n_tup_del AS write_count
+    FROM pg_stat_user_tables
+"""
+
+
+@dataclass
+class _CachedQuery:
+    table_versions: tuple[tuple[str, int], ...]
+    df: pd.DataFrame
+    nbytes: int
+
+
+class QueryResultCache:
+    def __init__(self, enabled: bool = QUERY_CACHE_ENABLED, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _CachedQuery] = OrderedDict()
+        self._tables_by_sql: dict[str, tuple[str, ...]] = {}
+        self._total_bytes = 0
+
+        self._table_write_counts: dict[str, int] | None = None
+        self._probed_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evicted = 0
+        self.probes = 0
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def _tables_read_by(self, sql_plain_text: str) -> tuple[str, ...]:
+        tables = self._tables_by_sql.get(sql_plain_text)
+        if tables is None:
+            tables = tuple(
+                sorted(
+                    table_name
+                    for table_name in Base.metadata.tables
+                    if re.search(rf"\b{re.escape(table_name)}\b", sql_plain_text)
+                )
+            )
+            self._tables_by_sql[sql_plain_text] = tables
+        return tables
+
+    def _current_write_counts(self) -> dict[str, int]:
+        with self._lock:
+            if (
+                self._table_write_counts is not None
+                and time.time() - self._probed_at < QUERY_CACHE_PROBE_INTERVAL_SECONDS
+            ):
+                return self._table_write_counts
+
+        with Session.begin() as session:
+            rows = session.execute(text(_TABLE_WRITE_COUNTERS_SQL)).fetchall()
+        write_counts = {relname: int(write_count) for relname, write_count in rows}
+
+        with self._lock:
+            self._table_write_counts = write_counts
+            self._probed_at = time.time()
+            self.probes += 1
+        return write_counts
+
+    def _table_versions(self, sql_plain_text: str) -> tuple[tuple[str, int], ...]:
+        write_counts = self._current_write_counts()
+        tables = self._tables_read_by(sql_plain_text)
+        if not tables:
+            # can't tell what it reads, any write anywhere invalidates it
+            return (("*", sum(write_counts.values())),)
+        return tuple((table_name, write_counts.get(table_name, -1)) for table_name in tables)
+
+    def expire_probe(self) -> None:
+        """Called after a write from this process so the next lookup sees it without waiting for the interval"""
+        with self._lock:
+            self._table_write_counts = None
+
+    def get_or_run(self, sql_plain_text: str, run_query) -> pd.DataFrame:
+        """A copy of the cached result of sql_plain_text, calling run_query(sql_plain_text) on a miss"""
+        if not self.enabled:
+            return run_query(sql_plain_text)
+
+        table_versions = self._table_versions(sql_plain_text)
+        with self._lock:
+            entry = self._entries.get(sql_plain_text)
+            if entry is not None and entry.table_versions == table_versions:
+                self._entries.move_to_end(sql_plain_text)
+                self.hits += 1
+                # callers are free to modify what they get back
+                return entry.df.copy()
+            if entry is not None:
+                self.stale += 1
+            self.misses += 1
+
+        df = run_query(sql_plain_text)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return df
+
+        with self._lock:
+            previous = self._entries.pop(sql_plain_text, None)
+            if previous is not None:
+                self._total_bytes -= previous.nbytes
+            self._entries[sql_plain_text] = _CachedQuery(table_versions, df.copy(), nbytes)
+            self._total_bytes += nbytes
+
+            while self._total_bytes > self.max_bytes:
+                _, evicted_entry = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_entry.nbytes
+                self.evicted += 1
+        return df
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "stale": self.stale,
+                "evicted": self.evicted,
+                "probes": self.probes,
+                "entries": len(self._entries),
+                "megabytes": round(self._total_bytes / 1e6, 1),
+            }
+
+
+QUERY_RESULT_CACHE = QueryResultCache()
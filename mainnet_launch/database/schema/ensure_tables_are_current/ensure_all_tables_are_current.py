@@ -11,11 +11,52 @@ open questions:
 
 """
 
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable
 import time
 
 
 from mainnet_launch.constants import ALL_CHAINS, profile_function, WORKING_DATA_DIR
-from mainnet_launch.database.schema.full import ENGINE
+from mainnet_launch.data_fetching.rate_limits import (
+    get_rate_limit_stats,
+    ALCHEMY,
+    DEFILLAMA,
+    SUBGRAPH,
+    ETHERSCAN,
+    TOKEMAK_API,
+)
+from mainnet_launch.data_fetching.eth_call_cache import ETH_CALL_CACHE
+from mainnet_launch.data_fetching.alchemy.raw_log_archive import RAW_LOG_ARCHIVE
+from mainnet_launch.data_fetching.get_state_by_block import get_failed_call_records
+from mainnet_launch.database.schema.full import (
+    ENGINE,
+    Blocks,
+    Autopools,
+    Destinations,
+    AutopoolDestinations,
+    DestinationTokens,
+    Tokens,
+    DestinationStates,
+    DestinationTokenValues,
+    AutopoolDestinationStates,
+    AutopoolStates,
+    TokenValues,
+    RebalancePlans,
+    DexSwapSteps,
+    RebalanceEvents,
+    IncentiveTokenSwapped,
+    IncentiveTokenBalanceUpdated,
+    IncentiveTokenPrices,
+    ChainlinkGasCosts,
+    AutopoolFees,
+    AutopoolDeposit,
+    AutopoolWithdrawal,
+    AutopoolTransfer,
+    DestinationUnderlyingDeposited,
+    DestinationUnderlyingWithdraw,
+    AutopoolDestinationDailyRollup,
+)
 
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_blocks import (
     ensure_blocks_is_current,
@@ -30,6 +71,7 @@ from mainnet_launch.database.schema.ensure_tables_are_current.using_rebalance_pl
 
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.order_dependent import (
     ensure_autopool_destination_states_are_current,
+    ensure_autopool_destination_daily_rollup_is_current,
     ensure_autopool_states_are_current,
     ensure_autopools_are_current,
     ensure_destination_token_values_are_current,
@@ -92,6 +134,7 @@ def ensure_database_is_current_slow_and_sequential(echo_sql_to_console: bool = F
         ensure_autopool_deposits_are_current,  # need to update to be faster use get_last_processed_block_for_table
         ensure_autopool_withdraws_are_current,  # need to update to be faster use get_last_processed_block_for_table
         ensure_an_autopool_state_exists_for_each_autopool_withdrawal_or_deposit,
+        ensure_autopool_destination_daily_rollup_is_current,
     ]
 
     overall_t0 = time.perf_counter()
@@ -115,6 +158,249 @@ def ensure_database_is_current_slow_and_sequential(echo_sql_to_console: bool = F
     print("finished update")
 
 
+# S3 has no token bucket in rate_limits, only a concurrency budget here
+S3 = "s3"
+
+# how many steps can be hitting each provider at once
+PROVIDER_CONCURRENCY_BUDGETS = {
+    ALCHEMY: 4,
+    DEFILLAMA: 1,
+    SUBGRAPH: 1,
+    ETHERSCAN: 1,
+    S3: 2,
+    TOKEMAK_API: 1,
+}
+
+# the budgets above allow 7 steps at once, but every running step can hold a pooled connection and ENGINE has
+# pool_size=5, max_overflow=0. One connection is left spare so a step that briefly needs a second one
+# does not sit on pool_timeout behind the other steps.
+MAX_CONCURRENT_STEPS = ENGINE.pool.size() - 1
+
+
+@dataclass(frozen=True)
+class UpdateStep:
+    func: Callable[[], None]
+    upstream_tables: tuple = ()  # tables this step reads that other steps fill
+    writes: tuple = ()  # tables this step owns, blocks / transactions / tokens added on the side don't count
+    providers: tuple = (ALCHEMY,)
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__
+
+
+# same order as the sequential steps, a step only waits on writers of its upstream tables that come before it
+UPDATE_STEPS = [
+    UpdateStep(ensure_blocks_is_current, writes=(Blocks,), providers=(DEFILLAMA, ALCHEMY)),
+    UpdateStep(ensure_autopools_are_current, writes=(Autopools,)),
+    UpdateStep(
+        ensure__destinations__tokens__and__destination_tokens_are_current,
+        upstream_tables=(Autopools,),
+        writes=(Destinations, AutopoolDestinations, DestinationTokens, Tokens),
+    ),
+    UpdateStep(ensure_tokemak_EOA_gas_costs_are_current, providers=(ETHERSCAN, ALCHEMY)),
+    UpdateStep(ensure_chainlink_gas_costs_table_are_current, upstream_tables=(Blocks,), writes=(ChainlinkGasCosts,)),
+    UpdateStep(ensure_autopool_fees_are_current, upstream_tables=(Autopools,), writes=(AutopoolFees,)),
+    UpdateStep(
+        ensure_incentive_token_swapped_events_are_current,
+        upstream_tables=(Destinations,),
+        writes=(IncentiveTokenSwapped,),
+    ),
+    UpdateStep(
+        ensure_incentive_token_balance_updated_is_current,
+        upstream_tables=(Destinations,),
+        writes=(IncentiveTokenBalanceUpdated,),
+    ),
+    UpdateStep(
+        ensure_incentive_token_prices_are_current,
+        upstream_tables=(IncentiveTokenSwapped, Destinations, Tokens, Blocks),
+        writes=(IncentiveTokenPrices,),
+        providers=(TOKEMAK_API,),
+    ),
+    UpdateStep(
+        ensure_destination_underlying_deposits_are_current,
+        upstream_tables=(Destinations,),
+        writes=(DestinationUnderlyingDeposited,),
+    ),
+    UpdateStep(
+        ensure_destination_underlying_withdraw_are_current,
+        upstream_tables=(Destinations,),
+        writes=(DestinationUnderlyingWithdraw,),
+    ),
+    UpdateStep(
+        ensure_destination_states_from_rebalance_plan_are_current,
+        upstream_tables=(AutopoolDestinations, Tokens),
+        writes=(DestinationStates, TokenValues, DestinationTokenValues),
+        providers=(S3, DEFILLAMA, ALCHEMY),
+    ),
+    UpdateStep(
+        ensure_destination_states_are_current,
+        upstream_tables=(Blocks, Autopools, Destinations, AutopoolDestinations, DestinationStates),
+        writes=(DestinationStates,),
+    ),
+    UpdateStep(
+        ensure_destination_token_values_are_current,
+        upstream_tables=(DestinationStates, DestinationTokens, Tokens),
+        writes=(DestinationTokenValues,),
+    ),
+    UpdateStep(
+        ensure_autopool_destination_states_are_current,
+        upstream_tables=(DestinationStates, AutopoolDestinations),
+        writes=(AutopoolDestinationStates,),
+    ),
+    UpdateStep(
+        ensure_autopool_states_are_current,
+        upstream_tables=(DestinationStates, AutopoolDestinations),
+        writes=(AutopoolStates,),
+    ),
+    UpdateStep(
+        ensure_token_values_are_current,
+        upstream_tables=(DestinationStates, AutopoolStates, Tokens),
+        writes=(TokenValues,),
+    ),
+    UpdateStep(
+        ensure_rebalance_plans_table_are_current,
+        upstream_tables=(Destinations, Tokens),
+        writes=(RebalancePlans, DexSwapSteps),
+        providers=(S3,),
+    ),
+    UpdateStep(
+        ensure_rebalance_events_are_current,
+        upstream_tables=(RebalancePlans, AutopoolStates, Destinations, DestinationTokens, Tokens),
+        writes=(RebalanceEvents, AutopoolStates),
+        providers=(SUBGRAPH, ALCHEMY),
+    ),
+    UpdateStep(ensure_autopool_transfers_are_current, upstream_tables=(Autopools,), writes=(AutopoolTransfer,)),
+    UpdateStep(ensure_autopool_deposits_are_current, upstream_tables=(Autopools,), writes=(AutopoolDeposit,)),
+    UpdateStep(ensure_autopool_withdraws_are_current, upstream_tables=(Autopools,), writes=(AutopoolWithdrawal,)),
+    UpdateStep(
+        ensure_an_autopool_state_exists_for_each_autopool_withdrawal_or_deposit,
+        upstream_tables=(AutopoolDeposit, AutopoolWithdrawal, AutopoolStates),
+        writes=(AutopoolStates,),
+    ),
+    # last, reads what the steps above wrote
+    UpdateStep(
+        ensure_autopool_destination_daily_rollup_is_current,
+        upstream_tables=(
+            Blocks,
+            Destinations,
+            Tokens,
+            DestinationStates,
+            DestinationTokenValues,
+            AutopoolDestinationStates,
+            TokenValues,
+        ),
+        writes=(AutopoolDestinationDailyRollup,),
+        providers=(),  # only reads postgres
+    ),
+]
+
+
+def _build_step_dependencies(steps: list[UpdateStep]) -> dict[str, set[str]]:
+    """step name -> names of the earlier steps that write one of its upstream tables"""
+    dependencies = {}
+    for i, step in enumerate(steps):
+        dependencies[step.name] = {
+            earlier.name for earlier in steps[:i] if any(table in earlier.writes for table in step.upstream_tables)
+        }
+    return dependencies
+
+
+def _find_critical_path(
+    steps: list[UpdateStep], dependencies: dict[str, set[str]], elapsed: dict[str, float]
+) -> tuple[list[str], float]:
+    """The longest chain of dependent steps by wall time, this is the floor on how fast the update can run"""
+    finish = {}
+    previous = {}
+    for step in steps:  # steps are already in a topological order
+        upstream = max(dependencies[step.name], key=lambda name: finish[name], default=None)
+        finish[step.name] = elapsed.get(step.name, 0.0) + (finish[upstream] if upstream else 0.0)
+        previous[step.name] = upstream
+
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
+
+
+def ensure_database_is_current_in_parallel(
+    echo_sql_to_console: bool = False,
+    steps: list[UpdateStep] = UPDATE_STEPS,
+    provider_budgets: dict[str, int] = PROVIDER_CONCURRENCY_BUDGETS,
+    max_concurrent_steps: int = MAX_CONCURRENT_STEPS,
+):
+    """
+    Runs each step as soon as its upstream steps are done and there is room in every provider it uses,
+    with at most max_concurrent_steps running at once.
+
+    Like the sequential version a failed step is logged and does not stop its downstream steps.
+    Writes the same per step timing file plus the critical path. Steps are not line profiled here,
+    line_profiler does not work across threads.
+    """
+    ENGINE.echo = echo_sql_to_console
+
+    run_path = "update-prod-db.txt"
+    dependencies = _build_step_dependencies(steps)
+    in_use = {provider: 0 for provider in provider_budgets}
+    elapsed = {}
+    finished = set()
+    pending = list(steps)
+    running = {}
+
+    def _has_room(step: UpdateStep) -> bool:
+        if len(running) >= max_concurrent_steps:
+            return False
+        return all(in_use[p] < provider_budgets[p] for p in step.providers)
+
+    def _run_step(step: UpdateStep) -> float:
+        t0 = time.perf_counter()
+        print(f"Starting step: {step.name}")
+        step.func()
+        return time.perf_counter() - t0
+
+    overall_t0 = time.perf_counter()
+    with open(run_path, "w", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=max_concurrent_steps) as executor:
+        while pending or running:
+            for step in list(pending):
+                if dependencies[step.name].issubset(finished) and _has_room(step):
+                    for p in step.providers:
+                        in_use[p] += 1
+                    running[executor.submit(_run_step, step)] = step
+                    pending.remove(step)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                for p in step.providers:
+                    in_use[p] -= 1
+                finished.add(step.name)
+                try:
+                    elapsed[step.name] = future.result()
+                    f.write(f"{step.name}, {elapsed[step.name]:.6f}\n")
+                except Exception as e:
+                    f.write(f"{step.name}, ERROR: {str(e)}\n")
+                    print(f"Error in step {step.name}: {str(e)}")
+                f.flush()
+
+        f.write(f"TOTAL, {time.perf_counter() - overall_t0:.6f}\n")
+        critical_path, critical_path_seconds = _find_critical_path(steps, dependencies, elapsed)
+        f.write(f"CRITICAL_PATH, {critical_path_seconds:.6f}, {' -> '.join(critical_path)}\n")
+        f.flush()
+
+    print(f"critical path {critical_path_seconds:.1f}s: {' -> '.join(critical_path)}")
+    print(get_rate_limit_stats().to_string(index=False))
+    print("eth_call cache:", ETH_CALL_CACHE.stats())
+    print("raw log archive:", RAW_LOG_ARCHIVE.stats())
+    failed_call_records = get_failed_call_records()
+    if len(failed_call_records) > 0:
+        print(f"{len(failed_call_records)} calls failed on their own and were saved as None")
+        print(failed_call_records.groupby(["chain", "signature", "reason"]).size().to_string())
+    print("finished update")
+
+
 def sequential_main():
     # ensure_database_is_current_slow_and_sequential()
     profile_function(ensure_database_is_current_slow_and_sequential, echo_sql_to_console=False)
@@ -122,7 +408,7 @@ def sequential_main():
 
 def main():
     # profile_function(ensure_database_is_current_slow_and_sequential, echo_sql_to_console=False)
-    ensure_database_is_current_slow_and_sequential()
+    ensure_database_is_current_in_parallel()
 
 
 if __name__ == "__main__":
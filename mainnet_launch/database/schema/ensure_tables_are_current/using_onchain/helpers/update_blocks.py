@@ -5,6 +5,7 @@ from mainnet_launch.database.postgres_operations import (
     insert_avoid_conflicts,
     get_subset_not_already_in_column,
     _exec_sql_and_cache,
+    BulkWriteSession,
 )
 from mainnet_launch.data_fetching.defi_llama.fetch_timestamp import (
     fetch_blocks_by_unix_timestamps_defillama,
@@ -105,7 +106,7 @@ def _determine_missing_timestamps(chain: ChainData) -> list[int]:
     return sorted(list(missing_ts))
 
 
-def ensure_all_blocks_are_in_table(blocks: list[int], chain: ChainData):
+def ensure_all_blocks_are_in_table(blocks: list[int], chain: ChainData, write_session: BulkWriteSession | None = None):
     """
     Inserts missing blocks for the chain. Returns count of blocks that were missing (attempted inserts).
     """
@@ -126,7 +127,7 @@ def ensure_all_blocks_are_in_table(blocks: list[int], chain: ChainData):
         print("blocks_fetched")
         print(df.head(12))
         new_rows = [Blocks.from_record(r) for r in df.to_dict(orient="records")]
-        insert_avoid_conflicts(new_rows, Blocks)
+        insert_avoid_conflicts(new_rows, Blocks, write_session=write_session)
 
 
 def ensure_blocks_is_current():
@@ -15,6 +15,7 @@ from tqdm import tqdm
 from mainnet_launch.database.postgres_operations import (
     insert_avoid_conflicts,
     get_subset_not_already_in_column,
+    BulkWriteSession,
 )
 
 
@@ -92,14 +93,16 @@ def ensure_all_transactions_are_saved_in_db(tx_hashes: list[str], chain: ChainDa
     print(f"Fetching {len(hashes_to_fetch)} new transactions for {chain.name}")
 
     chunk_size = 5_000
-    for i in range(0, len(hashes_to_fetch), chunk_size):
-        chunk = hashes_to_fetch[i : i + chunk_size]
-        print(f"Processing chunk {i//chunk_size + 1}/{(len(hashes_to_fetch) + chunk_size - 1)//chunk_size}")
+    # staging tables are reused across chunks, a connection is only checked out for each write
+    with BulkWriteSession() as write_session:
+        for i in range(0, len(hashes_to_fetch), chunk_size):
+            chunk = hashes_to_fetch[i : i + chunk_size]
+            print(f"Processing chunk {i//chunk_size + 1}/{(len(hashes_to_fetch) + chunk_size - 1)//chunk_size}")
 
-        new_transactions: list[Transactions] = fetch_transaction_rows_bulk_from_alchemy(chunk, chain)
+            new_transactions: list[Transactions] = fetch_transaction_rows_bulk_from_alchemy(chunk, chain)
 
-        ensure_all_blocks_are_in_table([t.block for t in new_transactions], chain)
-        insert_avoid_conflicts(new_transactions, Transactions)  # I think this writing is the slow part
-        print(f"Inserted {len(new_transactions)} transactions for {chain.name}")
+            ensure_all_blocks_are_in_table([t.block for t in new_transactions], chain, write_session)
+            insert_avoid_conflicts(new_transactions, Transactions, write_session=write_session)
+            print(f"Inserted {len(new_transactions)} transactions for {chain.name}")
 
     print(f"Completed inserting all {len(hashes_to_fetch)} new transactions for {chain.name}")
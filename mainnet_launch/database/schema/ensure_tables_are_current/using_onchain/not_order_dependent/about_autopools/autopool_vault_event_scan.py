@@ -0,0 +1,136 @@
+"""
+One shared getLogs scan per chain for the autopool vault events the deposit, withdraw, transfer and fee steps need.
+
+Each of those steps used to run its own scan for every (autopool, event) pair. Here every autopool address on a chain
+and every topic0 we want go into one eth_getLogs filter, the logs are split back apart by topic0 and decoded per event,
+and the result is kept in memory so the steps (which run in parallel threads) all read the same scan.
+
+A step asking for an earlier start block than what is held only fetches the missing blocks in front of it.
+A scan older than AUTOPOOL_VAULT_EVENT_SCAN_MAX_AGE_SECONDS is extended forward to the current top of the chain.
+"""
+
+from dataclasses import dataclass
+import threading
+import time
+
+import pandas as pd
+
+from mainnet_launch.abis import AUTOPOOL_VAULT_WITH_FEE_COLLECTED_EVENT_ABI
+from mainnet_launch.constants import ALL_AUTOPOOLS, ALL_CHAINS, AutopoolConstants, ChainData
+from mainnet_launch.data_fetching.alchemy.get_events import fetch_many_events
+
+AUTOPOOL_VAULT_SCANNED_EVENT_NAMES = ("Deposit", "Withdraw", "Transfer", "FeeCollected", "PeriodicFeeCollected")
+AUTOPOOL_VAULT_EVENT_SCAN_MAX_AGE_SECONDS = 10 * 60
+
+
+@dataclass
+class AutopoolVaultEventScan:
+    start_block: int
+    end_block: int  # inclusive
+    events: dict[str, pd.DataFrame]
+    fetched_at: float
+
+
+_SCANS: dict[ChainData, AutopoolVaultEventScan] = {}
+_SCANS_LOCK = threading.Lock()
+_CHAIN_LOCKS: dict[ChainData, threading.Lock] = {}
+
+
+def _chain_lock(chain: ChainData) -> threading.Lock:
+    with _SCANS_LOCK:
+        return _CHAIN_LOCKS.setdefault(chain, threading.Lock())
+
+
+def _scan(chain: ChainData, start_block: int, end_block: int) -> dict[str, pd.DataFrame]:
+    addresses = [a.autopool_eth_addr for a in ALL_AUTOPOOLS if a.chain == chain]
+    contract = chain.client.eth.contract(address=addresses[0], abi=AUTOPOOL_VAULT_WITH_FEE_COLLECTED_EVENT_ABI)
+    events = [contract.events[name] for name in AUTOPOOL_VAULT_SCANNED_EVENT_NAMES]
+    events_dict = fetch_many_events(
+        events, chain=chain, start_block=start_block, end_block=end_block, addresses=addresses
+    )
+    print(
+        f"Scanned {chain.name} blocks {start_block:,} to {end_block:,} for {len(addresses)} autopools: "
+        + ", ".join(f"{len(df):,} {name}" for name, df in events_dict.items())
+    )
+    return events_dict
+
+
+def _concat_events(first: dict[str, pd.DataFrame], second: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    merged = {}
+    for name in AUTOPOOL_VAULT_SCANNED_EVENT_NAMES:
+        dfs = [df for df in (first[name], second[name]) if not df.empty]
+        merged[name] = pd.concat(dfs, ignore_index=True) if dfs else first[name]
+    return merged
+
+
+def get_autopool_vault_events(chain: ChainData, start_block: int) -> AutopoolVaultEventScan:
+    """
+    Deposit, Withdraw, Transfer, FeeCollected and PeriodicFeeCollected events for every autopool on `chain`
+    from start_block through the end_block of the returned scan.
+
+    The DataFrames are filtered copies of the shared scan, callers can modify them.
+    """
+    start_block = int(start_block)
+    with _chain_lock(chain):
+        scan = _SCANS.get(chain)
+
+        if scan is None:
+            end_block = chain.get_block_near_top()
+            if start_block > end_block:
+                # nothing can have happened yet, don't hold on to an empty scan that later callers would extend
+                empty_events = {
+                    name: pd.DataFrame(columns=["address", "block"]) for name in AUTOPOOL_VAULT_SCANNED_EVENT_NAMES
+                }
+                return AutopoolVaultEventScan(start_block, end_block, empty_events, time.time())
+            scan = AutopoolVaultEventScan(start_block, end_block, _scan(chain, start_block, end_block), time.time())
+        else:
+            if start_block < scan.start_block:
+                events_before = _scan(chain, start_block, scan.start_block - 1)
+                scan = AutopoolVaultEventScan(
+                    start_block, scan.end_block, _concat_events(events_before, scan.events), scan.fetched_at
+                )
+
+            if time.time() - scan.fetched_at > AUTOPOOL_VAULT_EVENT_SCAN_MAX_AGE_SECONDS:
+                end_block = chain.get_block_near_top()
+                if end_block > scan.end_block:
+                    events_after = _scan(chain, scan.end_block + 1, end_block)
+                    scan = AutopoolVaultEventScan(
+                        scan.start_block, end_block, _concat_events(scan.events, events_after), time.time()
+                    )
+
+        _SCANS[chain] = scan
+
+    return AutopoolVaultEventScan(
+        start_block=start_block,
+        end_block=scan.end_block,
+        events={name: df[df["block"] >= start_block].copy() for name, df in scan.events.items()},
+        fetched_at=scan.fetched_at,
+    )
+
+
+def get_autopool_vault_events_by_autopool(
+    event_name: str, start_block_by_autopool_address: dict[str, int]
+) -> list[tuple[AutopoolConstants, pd.DataFrame]]:
+    """
+    `event_name` events for each autopool from its own start block, read out of one shared scan per chain.
+
+    Only autopools with new events are returned.
+    """
+    autopool_events = []
+    for chain in ALL_CHAINS:
+        autopools = [a for a in ALL_AUTOPOOLS if a.chain == chain]
+        if not autopools:
+            continue
+
+        chain_start_block = min(start_block_by_autopool_address[a.autopool_eth_addr] for a in autopools)
+        events_df = get_autopool_vault_events(chain, chain_start_block).events[event_name]
+
+        for autopool in autopools:
+            autopool_df = events_df[
+                (events_df["address"] == autopool.autopool_eth_addr)
+                & (events_df["block"] >= start_block_by_autopool_address[autopool.autopool_eth_addr])
+            ]
+            if not autopool_df.empty:
+                autopool_events.append((autopool, autopool_df.reset_index(drop=True)))
+
+    return autopool_events
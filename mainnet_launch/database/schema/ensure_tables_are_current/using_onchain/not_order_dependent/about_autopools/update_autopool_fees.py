@@ -6,11 +6,12 @@
 
 import pandas as pd
 
-from mainnet_launch.constants import ALL_AUTOPOOLS, ALL_CHAINS, profile_function
-from mainnet_launch.abis import AUTOPOOL_VAULT_WITH_FEE_COLLECTED_EVENT_ABI
+from mainnet_launch.constants import ALL_CHAINS, profile_function
 from mainnet_launch.database.schema.full import AutopoolFees
 
-from mainnet_launch.data_fetching.alchemy.get_events import fetch_events
+from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.not_order_dependent.about_autopools.autopool_vault_event_scan import (
+    get_autopool_vault_events,
+)
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_transactions import (
     ensure_all_transactions_are_saved_in_db,
     insert_avoid_conflicts,
@@ -26,26 +27,11 @@ def ensure_autopool_fees_are_current():
     chain_to_start_block = get_last_processed_block_for_table(AutopoolFees)
 
     for chain in ALL_CHAINS:
-        addresess = [a.autopool_eth_addr for a in ALL_AUTOPOOLS if a.chain == chain]
-        contract = chain.client.eth.contract(address=addresess[0], abi=AUTOPOOL_VAULT_WITH_FEE_COLLECTED_EVENT_ABI)
-        top_block = chain.get_block_near_top()
-        fee_collected_events_df = fetch_events(
-            contract.events.FeeCollected,
-            chain=chain,
-            start_block=chain_to_start_block[chain] + 1,
-            end_block=top_block,
-            addresses=addresess,
-        )
-
-        periodic_fee_collected_events_df = fetch_events(
-            contract.events.PeriodicFeeCollected,
-            chain=chain,
-            start_block=chain_to_start_block[chain] + 1,
-            end_block=top_block,
-            addresses=addresess,
-        )
-
-        fee_df = pd.concat([fee_collected_events_df, periodic_fee_collected_events_df], ignore_index=True)
+        # shared with the deposit, withdraw and transfer steps
+        scan = get_autopool_vault_events(chain, start_block=chain_to_start_block[chain] + 1)
+        top_block = scan.end_block
+        fee_dfs = [df for df in (scan.events["FeeCollected"], scan.events["PeriodicFeeCollected"]) if not df.empty]
+        fee_df = pd.concat(fee_dfs, ignore_index=True) if fee_dfs else pd.DataFrame()
         if fee_df.empty:
             print(
                 f"No new autopool fee events for autopools on {chain.name} after block {chain_to_start_block[chain]:,}"
@@ -1,11 +1,12 @@
 import pandas as pd
 from web3 import Web3
 
-from mainnet_launch.abis import AUTOPOOL_VAULT_ABI
 from mainnet_launch.constants import ALL_AUTOPOOLS, ALL_CHAINS, profile_function
 from mainnet_launch.database.schema.full import AutopoolDeposit
 from mainnet_launch.database.postgres_operations import _exec_sql_and_cache
-from mainnet_launch.data_fetching.alchemy.get_events import fetch_events
+from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.not_order_dependent.about_autopools.autopool_vault_event_scan import (
+    get_autopool_vault_events_by_autopool,
+)
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_transactions import (
     ensure_all_transactions_are_saved_in_db,
     insert_avoid_conflicts,
@@ -49,22 +50,8 @@ def _fetch_all_autopool_deposit_events() -> pd.DataFrame:
 
     deposit_dfs: list[pd.DataFrame] = []
 
-    for autopool in ALL_AUTOPOOLS:
-        contract = autopool.chain.client.eth.contract(
-            address=autopool.autopool_eth_addr,
-            abi=AUTOPOOL_VAULT_ABI,
-        )
-
-        # Important: use the Deposit event, not Transfer
-        deposit_df = fetch_events(
-            contract.events.Deposit,
-            chain=autopool.chain,
-            start_block=highest_block_by_pool[autopool.autopool_eth_addr],
-        )
-
-        if deposit_df.empty:
-            continue
-
+    # Important: use the Deposit event, not Transfer
+    for autopool, deposit_df in get_autopool_vault_events_by_autopool("Deposit", highest_block_by_pool):
         deposit_df["assets"] = deposit_df["assets"].apply(lambda x: int(x) / (10**autopool.base_asset_decimals))
         deposit_df["shares"] = deposit_df["shares"].apply(lambda x: int(x) / 1e18)
 
@@ -4,13 +4,13 @@ from web3 import Web3
 from mainnet_launch.constants import ALL_AUTOPOOLS, ALL_CHAINS, profile_function, AutopoolConstants
 from mainnet_launch.database.schema.full import AutopoolTransfer
 from mainnet_launch.database.postgres_operations import _exec_sql_and_cache
-from mainnet_launch.data_fetching.alchemy.get_events import fetch_events
+from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.not_order_dependent.about_autopools.autopool_vault_event_scan import (
+    get_autopool_vault_events_by_autopool,
+)
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_transactions import (
     ensure_all_transactions_are_saved_in_db,
     insert_avoid_conflicts,
 )
-
-from mainnet_launch.abis import AUTOPOOL_VAULT_ABI
 from mainnet_launch.constants import time_decorator
 
 
@@ -41,21 +41,7 @@ def _fetch_all_autopool_transfer_events() -> pd.DataFrame:
 
     transfer_dfs: list[pd.DataFrame] = []
 
-    for autopool in ALL_AUTOPOOLS:
-        contract = autopool.chain.client.eth.contract(
-            address=autopool.autopool_eth_addr,
-            abi=AUTOPOOL_VAULT_ABI,
-        )
-
-        transfer_df = fetch_events(
-            contract.events.Transfer,
-            chain=autopool.chain,
-            start_block=highest_block_by_pool[autopool.autopool_eth_addr],
-        )
-
-        if transfer_df.empty:
-            continue
-
+    for autopool, transfer_df in get_autopool_vault_events_by_autopool("Transfer", highest_block_by_pool):
         transfer_df["value"] = transfer_df["value"].apply(lambda x: int(x) / 1e18)  # always 1e18
         transfer_df["autopool_vault_address"] = autopool.autopool_eth_addr
         transfer_df["chain_id"] = autopool.chain.chain_id
@@ -1,11 +1,12 @@
 import pandas as pd
 from web3 import Web3
 
-from mainnet_launch.abis import AUTOPOOL_VAULT_ABI
 from mainnet_launch.constants import ALL_AUTOPOOLS, ALL_CHAINS, profile_function
 from mainnet_launch.database.schema.full import AutopoolWithdrawal
 from mainnet_launch.database.postgres_operations import _exec_sql_and_cache
-from mainnet_launch.data_fetching.alchemy.get_events import fetch_events
+from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.not_order_dependent.about_autopools.autopool_vault_event_scan import (
+    get_autopool_vault_events_by_autopool,
+)
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_transactions import (
     ensure_all_transactions_are_saved_in_db,
     insert_avoid_conflicts,
@@ -46,22 +47,7 @@ def _fetch_all_autopool_withdrawal_events() -> pd.DataFrame:
     highest_by_pool = get_highest_already_fetched_autopool_withdrawal_block()
     out: list[pd.DataFrame] = []
 
-    for ap in ALL_AUTOPOOLS:
-        contract = ap.chain.client.eth.contract(
-            address=ap.autopool_eth_addr,
-            abi=AUTOPOOL_VAULT_ABI,
-        )
-
-        # Use the Withdraw event
-        df = fetch_events(
-            contract.events.Withdraw,
-            chain=ap.chain,
-            start_block=highest_by_pool[ap.autopool_eth_addr],
-        )
-
-        if df.empty:
-            continue
-
+    for ap, df in get_autopool_vault_events_by_autopool("Withdraw", highest_by_pool):
         df["assets"] = df["assets"].apply(lambda x: int(x) / (10**ap.base_asset_decimals))
         df["shares"] = df["shares"].apply(lambda x: int(x) / 1e18)
 
@@ -1,4 +1,5 @@
 from .update_autopool_destination_states_table import ensure_autopool_destination_states_are_current
+from .update_autopool_destination_daily_rollup import ensure_autopool_destination_daily_rollup_is_current
 from .update_autopool_states import ensure_autopool_states_are_current
 from .update_autopools_table import ensure_autopools_are_current
 
@@ -11,6 +12,7 @@ from .update_token_values_table import ensure_token_values_are_current
 
 __all__ = [
     "ensure_autopool_destination_states_are_current",
+    "ensure_autopool_destination_daily_rollup_is_current",
     "ensure_autopool_states_are_current",
     "ensure_autopools_are_current",
     "ensure_destination_token_values_are_current",
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from mainnet_launch.constants import ALL_AUTOPOOLS, AutopoolConstants, profile_function
+from mainnet_launch.database.schema.full import AutopoolDestinationDailyRollup
+from mainnet_launch.database.postgres_operations import (
+    get_highest_value_in_field_where,
+    delete_rows_where,
+    insert_df_avoid_conflicts,
+)
+from mainnet_launch.database.views import fetch_autopool_destination_state_df_after
+
+ROLLUP_COLUMNS = [c.name for c in AutopoolDestinationDailyRollup.__table__.columns]
+
+
+def _build_daily_rollup_df(destination_state_df: pd.DataFrame, autopool: AutopoolConstants) -> pd.DataFrame:
+    """Keep only the last block of each UTC day, one row per (day, destination, token)"""
+    df = destination_state_df.copy()
+    df["datetime"] = pd.to_datetime(df["datetime"], utc=True)
+    df["day"] = df["datetime"].dt.floor("D")
+    # each (day, destination, token) keeps its own last row, a destination without a state at the
+    # autopool's last block of the day still shows up with the last value it had that day
+    group_columns = ["day", "destination_vault_address", "token_address"]
+    df = df[df["datetime"] == df.groupby(group_columns)["datetime"].transform("max")]
+
+    # token_values has one row per denominated_in, sum like the pages did
+    rollup_df = (
+        df.groupby(group_columns)
+        .agg(
+            block=("block", "max"),
+            datetime=("datetime", "max"),
+            readable_name=("readable_name", "first"),
+            symbol=("symbol", "first"),
+            autopool_implied_safe_value=("autopool_implied_safe_value", "sum"),
+            autopool_implied_backing_value=("autopool_implied_backing_value", "sum"),
+            autopool_implied_quantity=("autopool_implied_quantity", "sum"),
+            unweighted_expected_apr=("unweighted_expected_apr", "max"),
+            owned_shares=("owned_shares", "max"),
+            lp_token_safe_price=("lp_token_safe_price", "max"),
+            total_apr_out=("total_apr_out", "max"),
+            total_apr_in=("total_apr_in", "max"),
+        )
+        .reset_index()
+    )
+    rollup_df["autopool_vault_address"] = autopool.autopool_eth_addr
+    rollup_df["chain_id"] = autopool.chain.chain_id
+    return rollup_df[ROLLUP_COLUMNS]
+
+
+def _update_daily_rollup_for_autopool(autopool: AutopoolConstants) -> None:
+    last_day = get_highest_value_in_field_where(
+        AutopoolDestinationDailyRollup,
+        AutopoolDestinationDailyRollup.day,
+        AutopoolDestinationDailyRollup.autopool_vault_address == autopool.autopool_eth_addr,
+    )
+    # the last day we have was probably written before it was over, so rebuild it
+    start_day = pd.Timestamp("1970-01-01", tz="UTC") if last_day is None else pd.Timestamp(last_day).tz_convert("UTC")
+
+    destination_state_df = fetch_autopool_destination_state_df_after(
+        autopool, (start_day - pd.Timedelta(seconds=1)).isoformat()
+    )
+    if destination_state_df.empty:
+        print(f"No new destination states for {autopool.name} since {start_day.date()}")
+        return
+
+    rollup_df = _build_daily_rollup_df(destination_state_df, autopool)
+
+    delete_rows_where(
+        AutopoolDestinationDailyRollup,
+        (AutopoolDestinationDailyRollup.autopool_vault_address == autopool.autopool_eth_addr)
+        & (AutopoolDestinationDailyRollup.day >= start_day.to_pydatetime()),
+    )
+    insert_df_avoid_conflicts(rollup_df, AutopoolDestinationDailyRollup, expecting_rows=True)
+    print(f"Wrote {len(rollup_df):,} daily rollup rows for {autopool.name} from {start_day.date()}")
+
+
+def ensure_autopool_destination_daily_rollup_is_current():
+    for autopool in ALL_AUTOPOOLS:
+        _update_daily_rollup_for_autopool(autopool)
+
+
+if __name__ == "__main__":
+    profile_function(ensure_autopool_destination_daily_rollup_is_current)
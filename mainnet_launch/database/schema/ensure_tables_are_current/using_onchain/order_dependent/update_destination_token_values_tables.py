@@ -16,7 +16,7 @@ from mainnet_launch.database.schema.full import (
 
 
 from mainnet_launch.database.postgres_operations import (
-    insert_avoid_conflicts,
+    insert_df_avoid_conflicts,
     TableSelector,
     merge_tables_as_df,
     _exec_sql_and_cache,
@@ -227,19 +227,20 @@ def _fetch_and_insert_non_idle_destination_token_values(autopool: AutopoolConsta
         autopool.chain, destination_info_df, missing_blocks
     )
 
-    new_destination_token_values_rows = _convert_raw_token_spot_prices_and_reserves_df_to_new_rows(
+    new_destination_token_values_df = _convert_raw_token_spot_prices_and_reserves_df_to_new_rows_df(
         autopool, destination_info_df, token_spot_prices_and_reserves_df
     )
 
-    insert_avoid_conflicts(new_destination_token_values_rows, DestinationTokenValues)
-    print(f"wrote {len(new_destination_token_values_rows):,} non-idle destination token values for {autopool.name}")
+    insert_df_avoid_conflicts(new_destination_token_values_df, DestinationTokenValues)
+    print(f"wrote {len(new_destination_token_values_df):,} non-idle destination token values for {autopool.name}")
 
 
-def _convert_raw_token_spot_prices_and_reserves_df_to_new_rows(
+def _convert_raw_token_spot_prices_and_reserves_df_to_new_rows_df(
     autopool: AutopoolConstants, destination_info_df: pd.DataFrame, token_spot_prices_and_reserves_df: pd.DataFrame
-) -> list[DestinationTokenValues]:
+) -> pd.DataFrame:
+    """One row per (block, destination, token), columns match DestinationTokenValues"""
 
-    new_destination_token_values_rows = []
+    new_destination_token_values_dfs = []
 
     # this is really show, unsure why 90 seconds # double checked and this is not actaually slow
     def _extract_destination_token_values(row: dict) -> None:
@@ -275,12 +276,12 @@ def _convert_raw_token_spot_prices_and_reserves_df_to_new_rows(
         sub_df["token_address"] = row["token_address"]
         sub_df["destination_vault_address"] = row["destination_vault_address"]
 
-        new_destination_token_values_rows.extend(
-            [DestinationTokenValues.from_record(r) for r in sub_df.to_dict(orient="records")]
-        )
+        new_destination_token_values_dfs.append(sub_df)
 
     destination_info_df.apply(lambda row: _extract_destination_token_values(row), axis=1)
-    return new_destination_token_values_rows
+    if not new_destination_token_values_dfs:
+        return pd.DataFrame()
+    return pd.concat(new_destination_token_values_dfs, ignore_index=True)
 
 
 def _get_missing_idle_destination_token_values_needed_blocks(
@@ -327,29 +328,19 @@ def _fetch_and_insert_idle_destination_token_values(
     ]
     idle_df = get_raw_state_by_blocks(idle_calls, missing_blocks, autopool.chain, include_block_number=True)
 
-    idle_destination_token_values = []
-
-    def _extract_idle_destination_token_values(row: dict):
-        for autopool_vault_address, total_idle in row.items():
-            if autopool_vault_address != "block":
-                idle_destination_token_values.append(
-                    DestinationTokenValues(
-                        block=int(row["block"]),
-                        chain_id=autopool.chain.chain_id,
-                        destination_vault_address=autopool_vault_address,
-                        token_address=autopool.base_asset,
-                        spot_price=1.0,
-                        quantity=total_idle,
-                    )
-                )
-
-    idle_df.apply(_extract_idle_destination_token_values, axis=1)
-
-    insert_avoid_conflicts(
-        idle_destination_token_values,
-        DestinationTokenValues,
+    idle_destination_token_values_df = pd.DataFrame(
+        {
+            "block": idle_df["block"].astype(int).to_numpy(),
+            "chain_id": autopool.chain.chain_id,
+            "destination_vault_address": autopool.autopool_eth_addr,
+            "token_address": autopool.base_asset,
+            "spot_price": 1.0,
+            "quantity": idle_df[autopool.autopool_eth_addr].to_numpy(),
+        }
     )
-    print(f"wrote {len(idle_destination_token_values):,} idle destination token values for {autopool.name}")
+
+    insert_df_avoid_conflicts(idle_destination_token_values_df, DestinationTokenValues)
+    print(f"wrote {len(idle_destination_token_values_df):,} idle destination token values for {autopool.name}")
 
 
 def ensure_destination_token_values_are_current():
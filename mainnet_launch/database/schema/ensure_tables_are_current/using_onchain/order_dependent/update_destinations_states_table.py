@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from multicall import Call
 from sqlalchemy import text, bindparam
@@ -13,7 +14,7 @@ from mainnet_launch.database.postgres_operations import (
     TableSelector,
 )
 from mainnet_launch.data_fetching.get_state_by_block import (
-    get_raw_state_by_blocks,
+    MulticallPlan,
     safe_normalize_with_bool_success,
     build_blocks_to_use,
 )
@@ -36,7 +37,9 @@ def build_lp_token_spot_and_safe_price_calls(
     lp_token_addresses: list[str],
     pool_addresses: list[str],
     autopool: AutopoolConstants,
+    name_prefix: tuple = (),
 ) -> list[Call]:
+    # name_prefix lets the same destination be priced more than once in one multicall (eg for several rebalances)
 
     def _handle_getRangePricesLP(success, args):
         if success:
@@ -54,7 +57,7 @@ def build_lp_token_spot_and_safe_price_calls(
                 pool,
                 autopool.base_asset,
             ],
-            [((destination, "lp_token_spot_and_safe"), _handle_getRangePricesLP)],
+            [((*name_prefix, destination, "lp_token_spot_and_safe"), _handle_getRangePricesLP)],
         )
         for destination, lp_token, pool in zip(destination_addresses, lp_token_addresses, pool_addresses)
     ]
@@ -63,12 +66,10 @@ def build_lp_token_spot_and_safe_price_calls(
 # TODO add the price values here to the pie charts on the % ownership page
 
 
-def _fetch_lp_token_spot_prices(
+def _build_lp_token_spot_prices_calls(
     autopool_to_all_ever_active_destinations: dict[str, list[Destinations]],
-    missing_blocks: list[int],
     chain: ChainData,
-) -> pd.DataFrame:
-    autopool_orm: list[Autopools] = get_full_table_as_orm(Autopools, where_clause=Autopools.chain_id == chain.chain_id)
+) -> list[Call]:
     destination_orm: list[Destinations] = get_full_table_as_orm(
         Destinations, where_clause=Destinations.chain_id == chain.chain_id
     )
@@ -96,10 +97,7 @@ def _fetch_lp_token_spot_prices(
         )
         lp_token_spot_prices_calls.extend(calls)
 
-    lp_token_spot_price_df = get_raw_state_by_blocks(
-        lp_token_spot_prices_calls, missing_blocks, chain, include_block_number=True
-    )
-    return lp_token_spot_price_df
+    return lp_token_spot_prices_calls
 
 
 def build_destinations_underlyingTotalSupply_calls(destination_vault_addresses: list[str]) -> list[Call]:
@@ -113,9 +111,7 @@ def build_destinations_underlyingTotalSupply_calls(destination_vault_addresses:
     ]
 
 
-def _fetch_destination_total_supply_df(
-    autopool_to_all_ever_active_destinations: dict, missing_blocks: list[int], chain: ChainData
-) -> pd.DataFrame:
+def _build_destination_total_supply_calls(autopool_to_all_ever_active_destinations: dict) -> list[Call]:
     all_active_destinations = set()
 
     for autopool_vault_address in autopool_to_all_ever_active_destinations.keys():
@@ -124,9 +120,7 @@ def _fetch_destination_total_supply_df(
         ]
         all_active_destinations.update(this_autopool_active_destinations)
 
-    calls = build_destinations_underlyingTotalSupply_calls(list(all_active_destinations))
-    destination_total_supply_df = get_raw_state_by_blocks(calls, missing_blocks, chain, include_block_number=True)
-    return destination_total_supply_df
+    return build_destinations_underlyingTotalSupply_calls(list(all_active_destinations))
 
 
 def _build_destination_points_calls(this_autopool_active_destinations: list[str], chain: ChainData) -> list[Call]:
@@ -140,9 +134,9 @@ def _build_destination_points_calls(this_autopool_active_destinations: list[str]
     ]
 
 
-def _fetch_autopool_points_apr(
-    autopool_to_all_ever_active_destinations: dict[str, list[str]], missing_blocks: list[int], chain: ChainData
-) -> pd.DataFrame:
+def _build_autopool_points_calls(
+    autopool_to_all_ever_active_destinations: dict[str, list[str]], chain: ChainData
+) -> list[Call]:
     autopool_points_calls = []
 
     for autopool_vault_address in autopool_to_all_ever_active_destinations.keys():
@@ -152,10 +146,7 @@ def _fetch_autopool_points_apr(
 
         autopool_points_calls.extend(_build_destination_points_calls(this_autopool_active_destinations, chain))
 
-    autopool_points_df = get_raw_state_by_blocks(
-        autopool_points_calls, missing_blocks, chain, include_block_number=True
-    )
-    return autopool_points_df
+    return autopool_points_calls
 
 
 def _clean_summary_stats_info(success, summary_stats):
@@ -179,6 +170,10 @@ def _clean_summary_stats_info(success, summary_stats):
         return None
 
 
+# getDestinationSummaryStats prices every token in the destination, it is much heavier than a view getter
+SUMMARY_STATS_GAS_PER_CALL = 5_000_000
+
+
 def _build_summary_stats_call(
     autopool: Autopools,
     destination_vault_address: str,
@@ -211,13 +206,13 @@ def _build_summary_stats_call(
     )
 
 
-def _fetch_destination_summary_stats_df(
-    autopool_to_all_ever_active_destinations: dict, missing_blocks: list[int], chain: ChainData
-) -> pd.DataFrame:
-    full_autopool_summary_stats_df = None
+def _build_destination_summary_stats_calls_by_autopool(
+    autopool_to_all_ever_active_destinations: dict, chain: ChainData
+) -> dict[str, list[Call]]:
     # TODO switch to autopool Destinations
     autopools_orm: list[Autopools] = get_full_table_as_orm(Autopools, where_clause=Autopools.chain_id == chain.chain_id)
 
+    autopool_to_summary_stats_calls = {}
     for autopool_vault_address, this_autopool_active_destinations in autopool_to_all_ever_active_destinations.items():
 
         autopool = [a for a in autopools_orm if a.autopool_vault_address == autopool_vault_address][0]
@@ -226,85 +221,70 @@ def _fetch_destination_summary_stats_df(
             all_summary_stats_calls.append(_build_summary_stats_call(autopool, dest, "out"))
             all_summary_stats_calls.append(_build_summary_stats_call(autopool, dest, "in"))
 
-        autopool_summary_stats_df = get_raw_state_by_blocks(
-            all_summary_stats_calls, missing_blocks, chain, include_block_number=True
-        )
+        autopool_to_summary_stats_calls[autopool_vault_address] = all_summary_stats_calls
+
+    return autopool_to_summary_stats_calls
 
-        if full_autopool_summary_stats_df is None:
-            full_autopool_summary_stats_df = autopool_summary_stats_df.copy()
-        else:
-            full_autopool_summary_stats_df = pd.merge(
-                full_autopool_summary_stats_df, autopool_summary_stats_df, on="block"
-            )
 
-    return full_autopool_summary_stats_df
+def _column_or_nan(df: pd.DataFrame, column) -> np.ndarray:
+    # every call for this column failed at every block, so it was never split into fields
+    if column in df.columns and df[column].dtype != object:
+        return df[column].to_numpy(dtype=np.float64)
+    return np.full(len(df), np.nan)
 
 
 def _extract_new_destination_states(
-    autopool_summary_stats_df: pd.DataFrame,
-    destination_underlying_total_supply_df: pd.DataFrame,
-    autopool_points_df: pd.DataFrame,
-    lp_token_spot_price_df: pd.DataFrame,
+    raw_destination_states_df: pd.DataFrame,
     autopool_to_all_ever_active_destinations: dict[str | list[Destinations]],
     chain: ChainData,
-):
-    all_new_destination_states = []
-    # currently broken
-    # autopool_summary_stats_df, destination_underlying_total_supply_df, token_value_df, autopool_to_all_ever_active_destinations
-    raw_destination_states_df = pd.merge(autopool_summary_stats_df, destination_underlying_total_supply_df, on="block")
-    raw_destination_states_df = pd.merge(raw_destination_states_df, autopool_points_df, on="block")
-    raw_destination_states_df = pd.merge(raw_destination_states_df, lp_token_spot_price_df, on="block")
+) -> list[DestinationStates]:
+    """raw_destination_states_df is from MulticallPlan.execute_wide(typed_columns=True)"""
+    blocks = raw_destination_states_df["block"].to_numpy(dtype=np.int64)
+    destination_state_dfs = []
 
     for autopool_vault_address in autopool_to_all_ever_active_destinations.keys():
         for destination_vault_address in autopool_to_all_ever_active_destinations[autopool_vault_address]:
-            destination_vault_address: str
-
-            def _extract_destination_states(row: pd.DataFrame) -> None:
-                in_summary_stats = row.get((autopool_vault_address, destination_vault_address, "in"), {}) or {}
-                out_summary_stats = row.get((autopool_vault_address, destination_vault_address, "out"), {}) or {}
-
-                total_apr_in = in_summary_stats.get("compositeReturn")
-                total_apr_out = out_summary_stats.get("compositeReturn")
-
-                incentive_apr = in_summary_stats.get("incentiveApr")
-                fee_apr = in_summary_stats.get("feeApr")
-                base_apr = in_summary_stats.get("baseApr")
-
-                safe_total_supply = in_summary_stats.get("safeTotalSupply")
-
-                points_apr = row[(destination_vault_address, "points")]
-                underlying_total_supply = row[(destination_vault_address, "underlyingTotalSupply")]
-                possible_safe_and_spot_price = row[(destination_vault_address, "lp_token_spot_and_safe")]
-                if possible_safe_and_spot_price is None:
-                    lp_token_spot_price = None
-                    lp_token_safe_price = None
-                else:
-                    lp_token_spot_price, lp_token_safe_price = possible_safe_and_spot_price
-
-                new_destination_state = DestinationStates(
-                    destination_vault_address=destination_vault_address,
-                    block=int(row["block"]),
-                    chain_id=chain.chain_id,
-                    incentive_apr=incentive_apr,
-                    fee_apr=fee_apr,
-                    base_apr=base_apr,
-                    points_apr=points_apr,
-                    fee_plus_base_apr=None,
-                    total_apr_in=total_apr_in,
-                    total_apr_out=total_apr_out,
-                    underlying_token_total_supply=underlying_total_supply,
-                    safe_total_supply=safe_total_supply,
-                    lp_token_spot_price=lp_token_spot_price,
-                    lp_token_safe_price=lp_token_safe_price,
-                    from_rebalance_plan=False,
-                    rebalance_plan_timestamp=None,
-                    rebalance_plan_key=None,
+            in_key = (autopool_vault_address, destination_vault_address, "in")
+            out_key = (autopool_vault_address, destination_vault_address, "out")
+
+            destination_state_dfs.append(
+                pd.DataFrame(
+                    {
+                        "destination_vault_address": destination_vault_address,
+                        "block": blocks,
+                        "incentive_apr": _column_or_nan(raw_destination_states_df, (*in_key, "incentiveApr")),
+                        "fee_apr": _column_or_nan(raw_destination_states_df, (*in_key, "feeApr")),
+                        "base_apr": _column_or_nan(raw_destination_states_df, (*in_key, "baseApr")),
+                        "points_apr": _column_or_nan(raw_destination_states_df, (destination_vault_address, "points")),
+                        "total_apr_in": _column_or_nan(raw_destination_states_df, (*in_key, "compositeReturn")),
+                        "total_apr_out": _column_or_nan(raw_destination_states_df, (*out_key, "compositeReturn")),
+                        "underlying_token_total_supply": _column_or_nan(
+                            raw_destination_states_df, (destination_vault_address, "underlyingTotalSupply")
+                        ),
+                        "safe_total_supply": _column_or_nan(raw_destination_states_df, (*in_key, "safeTotalSupply")),
+                        "lp_token_spot_price": _column_or_nan(
+                            raw_destination_states_df, (destination_vault_address, "lp_token_spot_and_safe", 0)
+                        ),
+                        "lp_token_safe_price": _column_or_nan(
+                            raw_destination_states_df, (destination_vault_address, "lp_token_spot_and_safe", 1)
+                        ),
+                    }
                 )
-                all_new_destination_states.append(new_destination_state)
+            )
+
+    if not destination_state_dfs:
+        return []
 
-            raw_destination_states_df.apply(_extract_destination_states, axis=1)
+    new_destination_states_df = pd.concat(destination_state_dfs, ignore_index=True)
+    new_destination_states_df["chain_id"] = chain.chain_id
+    new_destination_states_df["fee_plus_base_apr"] = None
+    new_destination_states_df["from_rebalance_plan"] = False
+    new_destination_states_df["rebalance_plan_timestamp"] = None
+    new_destination_states_df["rebalance_plan_key"] = None
 
-    return all_new_destination_states
+    # failed calls are NaN in the frame and NULL in the db
+    new_destination_states_df = new_destination_states_df.astype(object).where(new_destination_states_df.notna(), None)
+    return [DestinationStates(**record) for record in new_destination_states_df.to_dict("records")]
 
 
 def get_needed_blocks_pure_sql(desired_blocks: list[int], chain: ChainData) -> list[int]:
@@ -401,25 +381,27 @@ def _add_new_destination_states_to_db(desired_blocks: list[int], chain: ChainDat
         .to_dict()
     )
 
-    destination_underlying_total_supply_df = _fetch_destination_total_supply_df(
-        autopool_to_all_ever_active_destinations, missing_blocks, chain
+    # one plan, so every block is a single (or a few, if over the gas budget) multicall instead of one per group
+    plan = MulticallPlan(chain, missing_blocks)
+    plan.add_group(
+        "underlying_total_supply", _build_destination_total_supply_calls(autopool_to_all_ever_active_destinations)
     )
     # points are depreacted, can remove
-    autopool_points_df = _fetch_autopool_points_apr(autopool_to_all_ever_active_destinations, missing_blocks, chain)
-
-    lp_token_spot_price_df = _fetch_lp_token_spot_prices(
-        autopool_to_all_ever_active_destinations, missing_blocks, chain
+    plan.add_group("points", _build_autopool_points_calls(autopool_to_all_ever_active_destinations, chain))
+    plan.add_group(
+        "lp_token_spot_and_safe", _build_lp_token_spot_prices_calls(autopool_to_all_ever_active_destinations, chain)
     )
+    for autopool_vault_address, summary_stats_calls in _build_destination_summary_stats_calls_by_autopool(
+        autopool_to_all_ever_active_destinations, chain
+    ).items():
+        plan.add_group(
+            f"summary_stats:{autopool_vault_address}", summary_stats_calls, gas_per_call=SUMMARY_STATS_GAS_PER_CALL
+        )
 
-    autopool_summary_stats_df = _fetch_destination_summary_stats_df(
-        autopool_to_all_ever_active_destinations, missing_blocks, chain
-    )
+    raw_destination_states_df = plan.execute_wide(typed_columns=True)
 
     all_new_destination_states = _extract_new_destination_states(
-        autopool_summary_stats_df,
-        destination_underlying_total_supply_df,
-        autopool_points_df,
-        lp_token_spot_price_df,
+        raw_destination_states_df,
         autopool_to_all_ever_active_destinations,
         chain,
     )
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from multicall import Call
 from web3 import Web3
@@ -18,7 +19,7 @@ from mainnet_launch.data_fetching.alchemy.get_events import fetch_events
 
 from mainnet_launch.database.postgres_operations import (
     get_full_table_as_orm,
-    insert_avoid_conflicts,
+    insert_df_avoid_conflicts,
     get_subset_not_already_in_column,
     merge_tables_as_df,
     TableSelector,
@@ -76,36 +77,38 @@ def _determine_what_blocks_are_needed(autopools: list[AutopoolConstants], chain:
     return blocks_to_fetch
 
 
-def _fetch_new_token_values_rows(blocks: list[int], tokens_orms: list[Tokens], chain: ChainData) -> list[TokenValues]:
+def _fetch_new_token_values_df(blocks: list[int], tokens_orms: list[Tokens], chain: ChainData) -> pd.DataFrame:
     """Returns the token safe price in USDC, and WETH for each to token in tokens_orms, and each block in blocks"""
 
     df = _fetch_safe_and_backing_values(blocks, tokens_orms, chain)
-
-    new_token_values_rows = []
-
-    def _extract_token_values_by_row(row: dict):
-        for token in tokens_orms:
-            for denominated_in in [WETH(chain), USDC(chain)]:
-
-                backing = row.get((token.token_address, "backing"))
-                backing = None if pd.isna(backing) else float(backing)
-
-                safe_price = row[(token.token_address, denominated_in, "safe_price")]
-                safe_price = None if pd.isna(safe_price) else float(safe_price)
-
-                new_token_values_row = TokenValues(
-                    block=int(row["block"]),
-                    chain_id=chain.chain_id,
-                    token_address=token.token_address,
-                    denominated_in=denominated_in,
-                    backing=backing,
-                    safe_price=safe_price,
+    block_values = df["block"].to_numpy(dtype=np.int64)
+
+    def _column_or_nan(column) -> np.ndarray:
+        if column in df.columns:
+            return df[column].to_numpy(dtype=np.float64)
+        return np.full(len(df), np.nan)
+
+    token_values_dfs = []
+    for token in tokens_orms:
+        for denominated_in in [WETH(chain), USDC(chain)]:
+            token_values_dfs.append(
+                pd.DataFrame(
+                    {
+                        "block": block_values,
+                        "token_address": token.token_address,
+                        "denominated_in": denominated_in,
+                        "backing": _column_or_nan((token.token_address, "backing")),
+                        "safe_price": _column_or_nan((token.token_address, denominated_in, "safe_price")),
+                    }
                 )
+            )
 
-                new_token_values_rows.append(new_token_values_row)
+    if not token_values_dfs:
+        return pd.DataFrame()
 
-    df.apply(_extract_token_values_by_row, axis=1)
-    return new_token_values_rows
+    token_values_df = pd.concat(token_values_dfs, ignore_index=True)
+    token_values_df["chain_id"] = chain.chain_id
+    return token_values_df
 
 
 def _fetch_and_insert_new_token_values(autopools: list[AutopoolConstants], chain: ChainData):
@@ -116,20 +119,11 @@ def _fetch_and_insert_new_token_values(autopools: list[AutopoolConstants], chain
         return
 
     tokens_orms: list[Tokens] = get_full_table_as_orm(Tokens, where_clause=Tokens.chain_id == chain.chain_id)
-    new_token_values_rows = _fetch_new_token_values_rows(needed_blocks, tokens_orms, chain)
+    new_token_values_df = _fetch_new_token_values_df(needed_blocks, tokens_orms, chain)
 
-    insert_avoid_conflicts(
-        new_token_values_rows,
-        TokenValues,
-        index_elements=[
-            TokenValues.block,
-            TokenValues.chain_id,
-            TokenValues.token_address,
-            TokenValues.denominated_in,
-        ],
-    )
+    insert_df_avoid_conflicts(new_token_values_df, TokenValues)
     print(
-        f"Inserted {len(new_token_values_rows):,} new token values for chain {chain.name}, autopools: {[a.name for a in autopools]}"
+        f"Inserted {len(new_token_values_df):,} new token values for chain {chain.name}, autopools: {[a.name for a in autopools]}"
     )
 
 
@@ -219,7 +213,7 @@ def _fetch_safe_and_backing_values(missing_blocks: list[int], tokens: list[Token
     calls = [*_build_safe_price_calls(tokens, chain), *_build_backing_calls(tokens, chain)]
 
     # state = get_state_by_one_block(calls, max(missing_blocks), chain)
-    df = get_raw_state_by_blocks(calls, missing_blocks, chain, include_block_number=True)
+    df = get_raw_state_by_blocks(calls, missing_blocks, chain, include_block_number=True, typed_columns=True)
     return df
 
 
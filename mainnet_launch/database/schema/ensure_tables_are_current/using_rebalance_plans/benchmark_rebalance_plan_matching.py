@@ -0,0 +1,117 @@
+"""
+Benchmark matching rebalance events to rebalance plans, the old per event loop vs the as-of join
+
+poetry run python -m mainnet_launch.database.schema.ensure_tables_are_current.using_rebalance_plans.benchmark_rebalance_plan_matching
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from mainnet_launch.database.schema.ensure_tables_are_current.using_rebalance_plans.update_rebalance_events import (
+    _connect_plans_to_rebalance_events,
+)
+
+
+def _connect_plans_to_rebalance_events_with_loop(
+    rebalance_event_df: pd.DataFrame,
+    rebalance_plan_df: pd.DataFrame,
+) -> dict:
+    """The original O(events * plans) matcher, kept as the reference implementation"""
+    rebalance_transaction_hash_to_rebalance_plan = {}
+
+    for index in range(len(rebalance_event_df)):
+        one_rebalance_event = rebalance_event_df.iloc[index]
+
+        tx_hash = one_rebalance_event["transactionHash"]
+        same_destinations = (rebalance_plan_df["token_out"] == one_rebalance_event["tokenOutAddress"]) & (
+            rebalance_plan_df["token_in"] == one_rebalance_event["tokenInAddress"]
+        )
+        same_amount_out = rebalance_plan_df["amount_out"] == one_rebalance_event["tokenOutAmount"]
+
+        window_start = one_rebalance_event["datetime_executed"] - pd.Timedelta(minutes=10)
+        generated_no_more_than_one_hour_before = rebalance_plan_df["datetime_generated"].between(
+            window_start, one_rebalance_event["datetime_executed"]
+        )
+
+        matches = rebalance_plan_df[same_destinations & same_amount_out & generated_no_more_than_one_hour_before]
+        matches = matches.sort_values("datetime_generated", ascending=False).head(1)
+
+        if matches.empty:
+            rebalance_transaction_hash_to_rebalance_plan[tx_hash] = None
+        else:
+            rebalance_transaction_hash_to_rebalance_plan[tx_hash] = matches["file_name"].values[0]
+
+    return rebalance_transaction_hash_to_rebalance_plan
+
+
+def _make_synthetic_plans_and_events(
+    num_plans: int, num_events: int, num_tokens: int = 20, seed: int = 0
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    tokens = [f"0x{i:040x}" for i in range(num_tokens)]
+
+    start = pd.Timestamp("2025-01-01", tz="UTC")
+    seconds_generated = np.sort(rng.choice(365 * 24 * 60 * 60, size=num_plans, replace=False))
+
+    rebalance_plan_df = pd.DataFrame(
+        {
+            "file_name": [f"plan_{i}.json" for i in range(num_plans)],
+            "token_in": rng.choice(tokens, size=num_plans),
+            "token_out": rng.choice(tokens, size=num_plans),
+            "amount_out": rng.integers(1, 50, size=num_plans).astype(float),
+            "datetime_generated": start + pd.to_timedelta(seconds_generated, unit="s"),
+        }
+    )
+
+    executed_plans = rebalance_plan_df.sample(n=num_events, random_state=seed)
+    # most events land a few minutes after their plan, some land outside the 10 minute window
+    seconds_after_plan = rng.integers(0, 15 * 60, size=num_events)
+
+    rebalance_event_df = pd.DataFrame(
+        {
+            "transactionHash": [f"0x{i:064x}" for i in range(num_events)],
+            "tokenInAddress": executed_plans["token_in"].to_numpy(),
+            "tokenOutAddress": executed_plans["token_out"].to_numpy(),
+            "tokenOutAmount": executed_plans["amount_out"].to_numpy(),
+            "datetime_executed": (
+                executed_plans["datetime_generated"] + pd.to_timedelta(seconds_after_plan, unit="s")
+            ).to_numpy(),
+        }
+    )
+    return rebalance_plan_df, rebalance_event_df
+
+
+def benchmark_rebalance_plan_matching(plan_counts: tuple[int] = (1_000, 10_000, 100_000), num_events: int = 1_000):
+    records = []
+    for num_plans in plan_counts:
+        rebalance_plan_df, rebalance_event_df = _make_synthetic_plans_and_events(num_plans, min(num_events, num_plans))
+
+        start = time.perf_counter()
+        loop_matches = _connect_plans_to_rebalance_events_with_loop(rebalance_event_df, rebalance_plan_df)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asof_matches = _connect_plans_to_rebalance_events(rebalance_event_df, rebalance_plan_df)
+        asof_seconds = time.perf_counter() - start
+
+        if loop_matches != asof_matches:
+            raise ValueError(f"matchers disagree at {num_plans=:,}")
+
+        records.append(
+            {
+                "num_plans": num_plans,
+                "num_events": len(rebalance_event_df),
+                "num_matched": sum(v is not None for v in asof_matches.values()),
+                "loop_seconds": round(loop_seconds, 4),
+                "asof_seconds": round(asof_seconds, 4),
+                "speedup": round(loop_seconds / asof_seconds, 1),
+            }
+        )
+
+    return pd.DataFrame.from_records(records)
+
+
+if __name__ == "__main__":
+    print(benchmark_rebalance_plan_matching().to_markdown(index=False))
@@ -1,6 +1,4 @@
 from web3 import Web3
-import time
-import random
 from tqdm.contrib.concurrent import thread_map
 
 from multicall.call import Call
@@ -12,7 +10,7 @@ from mainnet_launch.database.schema.full import (
     DestinationTokenValues,
     AutopoolDestinations,
 )
-from mainnet_launch.data_fetching.get_state_by_block import get_state_by_one_block
+from mainnet_launch.data_fetching.get_state_by_block import get_raw_state_by_blocks
 from mainnet_launch.database.postgres_operations import (
     get_full_table_as_orm,
     get_full_table_as_df,
@@ -29,15 +27,20 @@ from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.help
 from mainnet_launch.data_fetching.defi_llama.fetch_timestamp import fetch_blocks_by_unix_timestamps_defillama
 
 from mainnet_launch.data_fetching.internal.s3_helper import (
-    fetch_all_solver_rebalance_plan_file_names,
+    fetch_new_solver_rebalance_plan_file_names,
+    listing_high_water_marks,
     make_s3_client,
     fetch_rebalance_plan_json_from_s3_bucket,
+    write_rebalance_plan_listing_high_water_marks,
 )
 
 
-def _get_quantity_of_base_asset_in_idle(
-    autopool: AutopoolConstants, tokens_address_to_decimals, block_after_plan_timestamp
-) -> float:
+MAX_CONCURRENT_PLAN_DOWNLOADS = 16
+
+
+def _fetch_quantity_of_base_asset_in_idle_by_block(
+    autopool: AutopoolConstants, tokens_address_to_decimals: dict[str, int], blocks: list[int]
+) -> dict[int, float | None]:
     def _extract_idle_usdc(success, AssetBreakdown):
         if success:
             totalIdle, totalDebt, totalDebtMin, totalDebtMax = AssetBreakdown
@@ -49,31 +52,20 @@ def _get_quantity_of_base_asset_in_idle(
         [("idle", _extract_idle_usdc)],
     )
 
-    quantity_of_idle = get_state_by_one_block([amount_of_idle_usdc_call], block_after_plan_timestamp, autopool.chain)[
-        "idle"
-    ]
-    return quantity_of_idle
+    idle_df = get_raw_state_by_blocks([amount_of_idle_usdc_call], blocks, autopool.chain, include_block_number=True)
+    return dict(zip(idle_df["block"], idle_df["idle"]))
 
 
 def convert_rebalance_plan_to_rows(
     plan: dict,
     autopool: AutopoolConstants,
     tokens_address_to_decimals: dict[str, int],
+    block_after_plan_timestamp: int,
+    quantity_of_idle: float,
 ) -> list[DestinationStates]:
-    """Makes external calls to etherscan, and on http nodes"""
+    """Pure transform, the block and idle balance are fetched in batches before hand"""
 
     try:
-        timestamp = int(plan["sod"]["currentTimestamp"])
-        block_after_plan_timestamp = fetch_blocks_by_unix_timestamps_defillama(
-            [
-                timestamp,
-            ],
-            chain=autopool.chain,
-        )[0]
-        quantity_of_idle = _get_quantity_of_base_asset_in_idle(
-            autopool, tokens_address_to_decimals, block_after_plan_timestamp
-        )
-
         new_destination_states_rows = _extract_destination_states_rows(
             autopool, tokens_address_to_decimals, plan, block_after_plan_timestamp, quantity_of_idle
         )
@@ -243,6 +235,101 @@ def _extract_destination_states_rows(
     return new_destination_states_rows
 
 
+def _print_plan_error(plan_path: str, autopool: AutopoolConstants, error: str) -> None:
+    print(f"Error processing Rebalance Plan {plan_path} for {autopool.name}: {error}. Skipping this plan.")
+
+
+def _download_plans(
+    plan_paths_to_fetch: list[tuple[AutopoolConstants, str]], s3_client
+) -> list[tuple[AutopoolConstants, str, dict]]:
+    """Downloads every missing plan, for every autopool, at once"""
+
+    def _download_plan(autopool_and_plan_path: tuple[AutopoolConstants, str]) -> dict | None:
+        autopool, plan_path = autopool_and_plan_path
+        try:
+            return fetch_rebalance_plan_json_from_s3_bucket(plan_path, s3_client, autopool)
+        except Exception as e:
+            _print_plan_error(plan_path, autopool, str(e))
+            return None
+
+    plans = thread_map(
+        _download_plan,
+        plan_paths_to_fetch,
+        max_workers=MAX_CONCURRENT_PLAN_DOWNLOADS,
+        desc="Downloading Rebalance Plans",
+        unit="plan",
+    )
+
+    return [
+        (autopool, plan_path, plan)
+        for (autopool, plan_path), plan in zip(plan_paths_to_fetch, plans)
+        if plan is not None
+    ]
+
+
+def _resolve_plan_timestamps_to_blocks(
+    downloaded_plans: list[tuple[AutopoolConstants, str, dict]],
+) -> dict[tuple[int, int], int]:
+    """One DeFiLlama batch per chain, returns (chain_id, plan timestamp) -> block"""
+    chain_to_timestamps = {}
+    for autopool, plan_path, plan in downloaded_plans:
+        try:
+            timestamp = int(plan["sod"]["currentTimestamp"])
+        except Exception as e:
+            _print_plan_error(plan_path, autopool, f"unable to read plan timestamp {e}")
+            continue
+        chain_to_timestamps.setdefault(autopool.chain, set()).add(timestamp)
+
+    chain_id_and_timestamp_to_block = {}
+    for chain, timestamps in chain_to_timestamps.items():
+        try:
+            timestamp_to_block = fetch_blocks_by_unix_timestamps_defillama(
+                sorted(timestamps), chain=chain, return_timestamp_to_block=True
+            )
+        except Exception as e:
+            print(f"Failed to fetch blocks for {len(timestamps):,} rebalance plan timestamps on {chain.name}: {e}")
+            continue
+
+        for timestamp, block in timestamp_to_block.items():
+            chain_id_and_timestamp_to_block[(chain.chain_id, timestamp)] = block
+
+    return chain_id_and_timestamp_to_block
+
+
+def _fetch_idle_by_autopool_and_block(
+    plans_with_blocks: list[tuple[AutopoolConstants, str, dict, int]],
+    tokens_address_to_decimals: dict[str, int],
+) -> dict[tuple[str, int], float | None]:
+    """One get_raw_state_by_blocks call per autopool, returns (autopool address, block) -> quantity of idle"""
+    autopool_to_blocks = {}
+    for autopool, _, _, block in plans_with_blocks:
+        autopool_to_blocks.setdefault(autopool, set()).add(block)
+
+    autopool_and_block_to_idle = {}
+    for autopool, blocks in autopool_to_blocks.items():
+        try:
+            block_to_idle = _fetch_quantity_of_base_asset_in_idle_by_block(
+                autopool, tokens_address_to_decimals, sorted(blocks)
+            )
+        except Exception as e:
+            print(f"Failed to fetch idle for {len(blocks):,} blocks for {autopool.name}: {e}")
+            continue
+
+        for block, idle in block_to_idle.items():
+            autopool_and_block_to_idle[(autopool.autopool_eth_addr, int(block))] = idle
+
+    return autopool_and_block_to_idle
+
+
+def _write_listing_high_water_marks(
+    autopool_to_bucket_to_keys: dict[AutopoolConstants, dict[str, list[str]]], failed_plan_paths: set[str]
+) -> None:
+    for bucket_to_keys in autopool_to_bucket_to_keys.values():
+        write_rebalance_plan_listing_high_water_marks(
+            DestinationStates, listing_high_water_marks(bucket_to_keys, failed_plan_paths)
+        )
+
+
 # Broken as of jan 21, 2026 defi llama timestamp query breaks
 # need alternate way not certain if defi llama is broken, or if how I am querying it is broken
 # could also be a cache error through cloudflare
@@ -267,8 +354,13 @@ def ensure_destination_states_from_rebalance_plan_are_current():
 
     tokens_orm: list[Tokens] = get_full_table_as_orm(Tokens)
     tokens_address_to_decimals = {t.token_address: t.decimals for t in tokens_orm}
+
+    plan_paths_to_fetch: list[tuple[AutopoolConstants, str]] = []
+    autopool_to_bucket_to_keys: dict[AutopoolConstants, dict[str, list[str]]] = {}
     for autopool in ALL_AUTOPOOLS_DATA_FROM_REBALANCE_PLAN:
-        solver_plan_paths_on_remote = fetch_all_solver_rebalance_plan_file_names(autopool, s3_client)
+        solver_plan_paths_on_remote, autopool_to_bucket_to_keys[autopool] = fetch_new_solver_rebalance_plan_file_names(
+            autopool, s3_client, DestinationStates
+        )
 
         this_autopool_destinations = list(autopool_vault_address_to_destinations[autopool.autopool_eth_addr])
 
@@ -284,54 +376,84 @@ def ensure_destination_states_from_rebalance_plan_are_current():
             continue
 
         print(f"Processing {len(plans_to_fetch):,} new Rebalance Plans for {autopool.name}...")
+        plan_paths_to_fetch.extend((autopool, plan_path) for plan_path in plans_to_fetch)
 
-        def _process_plan(plan_path: str):
-            plan = fetch_rebalance_plan_json_from_s3_bucket(plan_path, s3_client, autopool)
-            new_destination_states_rows, new_token_values_rows, new_destination_token_values, error = (
-                convert_rebalance_plan_to_rows(plan, autopool, tokens_address_to_decimals)
-            )
-            if error["error"] is not None:
-                print(
-                    f"Error processing Rebalance Plan {plan_path} for {autopool.name}: {error['error']}. Skipping this plan."
-                )
-                return new_destination_states_rows, new_token_values_rows, new_destination_token_values
-            else:
-                return new_destination_states_rows, new_token_values_rows, new_destination_token_values
-
-        all_destination_states = []
-        all_new_token_values_rows = []
-        all_destination_token_rows = []
-
-        results = thread_map(
-            _process_plan,
-            plans_to_fetch,
-            max_workers=4,  # not certain here on the best number of threads, 4 works but might be able to go faster
-            desc=f"Extracting Destination States from Rebalance Plans for {autopool.name}",
-            unit="plan",
-        )
+    if not plan_paths_to_fetch:
+        _write_listing_high_water_marks(autopool_to_bucket_to_keys, set())
+        return
 
-        for new_destination_states_rows, new_token_values_rows, new_destination_token_values in results:
-            all_destination_states.extend(new_destination_states_rows)
-            all_new_token_values_rows.extend(new_token_values_rows)
-            all_destination_token_rows.extend(new_destination_token_values)
+    # 1. download every missing plan concurrently
+    downloaded_plans = _download_plans(plan_paths_to_fetch, s3_client)
 
-        all_blocks_to_add = list(set([d.block for d in all_destination_states]))
+    # 2. one timestamp -> block lookup per chain
+    chain_id_and_timestamp_to_block = _resolve_plan_timestamps_to_blocks(downloaded_plans)
 
-        ensure_all_blocks_are_in_table(all_blocks_to_add, autopool.chain)
-        insert_avoid_conflicts(
-            all_destination_states,
-            DestinationStates,
-        )
+    plans_with_blocks: list[tuple[AutopoolConstants, str, dict, int]] = []
+    for autopool, plan_path, plan in downloaded_plans:
+        try:
+            timestamp = int(plan["sod"]["currentTimestamp"])
+        except Exception:
+            continue  # already reported
 
-        insert_avoid_conflicts(
-            all_new_token_values_rows,
-            TokenValues,
-        )
+        block = chain_id_and_timestamp_to_block.get((autopool.chain.chain_id, timestamp))
+        if block is None:
+            _print_plan_error(plan_path, autopool, f"no block found for timestamp {timestamp}")
+            continue
+        plans_with_blocks.append((autopool, plan_path, plan, block))
+
+    # 3. idle for every block in one multicall batch per autopool
+    autopool_and_block_to_idle = _fetch_idle_by_autopool_and_block(plans_with_blocks, tokens_address_to_decimals)
 
-        insert_avoid_conflicts(
-            all_destination_token_rows,
-            DestinationTokenValues,
+    all_destination_states = []
+    all_new_token_values_rows = []
+    all_destination_token_rows = []
+    converted_plan_paths = set()
+
+    for autopool, plan_path, plan, block in plans_with_blocks:
+        if (autopool.autopool_eth_addr, block) not in autopool_and_block_to_idle:
+            _print_plan_error(plan_path, autopool, f"failed to fetch idle at block {block}")
+            continue
+
+        quantity_of_idle = autopool_and_block_to_idle[(autopool.autopool_eth_addr, block)]
+        new_destination_states_rows, new_token_values_rows, new_destination_token_values, error = (
+            convert_rebalance_plan_to_rows(plan, autopool, tokens_address_to_decimals, block, quantity_of_idle)
         )
+        if error["error"] is not None:
+            _print_plan_error(plan_path, autopool, error["error"])
+            continue
+
+        all_destination_states.extend(new_destination_states_rows)
+        all_new_token_values_rows.extend(new_token_values_rows)
+        all_destination_token_rows.extend(new_destination_token_values)
+        converted_plan_paths.add(plan_path)
+
+    # 4. bulk insert
+    chain_id_to_chain = {autopool.chain.chain_id: autopool.chain for autopool in ALL_AUTOPOOLS_DATA_FROM_REBALANCE_PLAN}
+    chain_id_to_blocks = {}
+    for state in all_destination_states:
+        chain_id_to_blocks.setdefault(state.chain_id, set()).add(state.block)
+
+    for chain_id, blocks in chain_id_to_blocks.items():
+        ensure_all_blocks_are_in_table(list(blocks), chain_id_to_chain[chain_id])
+
+    insert_avoid_conflicts(
+        all_destination_states,
+        DestinationStates,
+    )
+
+    insert_avoid_conflicts(
+        all_new_token_values_rows,
+        TokenValues,
+    )
+
+    insert_avoid_conflicts(
+        all_destination_token_rows,
+        DestinationTokenValues,
+    )
+
+    # plans that failed anywhere above are listed and retried next run
+    failed_plan_paths = {plan_path for _, plan_path in plan_paths_to_fetch} - converted_plan_paths
+    _write_listing_high_water_marks(autopool_to_bucket_to_keys, failed_plan_paths)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,5 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-
-
 from multicall import Call
+import numpy as np
 import pandas as pd
 
 
@@ -24,18 +21,21 @@ from mainnet_launch.database.schema.full import (
 )
 from mainnet_launch.database.postgres_operations import (
     get_full_table_as_df,
+    get_subset_of_table_as_df,
     insert_avoid_conflicts,
     get_subset_not_already_in_column,
     TableSelector,
     merge_tables_as_df,
 )
 from mainnet_launch.data_fetching.get_state_by_block import (
-    get_raw_state_by_blocks,
-    get_state_by_one_block,
+    get_raw_state_by_block_with_calls_per_block,
     safe_normalize_with_bool_success,
     safe_normalize_6_with_bool_success,
 )
-from mainnet_launch.data_fetching.tokemak_subgraph import fetch_new_autopool_rebalance_events_from_subgraph
+from mainnet_launch.data_fetching.tokemak_subgraph import (
+    fetch_new_rebalance_events_from_subgraph_for_autopools,
+    write_rebalance_events_subgraph_cursor,
+)
 from mainnet_launch.database.schema.ensure_tables_are_current.using_onchain.helpers.update_transactions import (
     ensure_all_transactions_are_saved_in_db,
 )
@@ -61,19 +61,23 @@ class UpdateRebalanceEventsTableError(Exception):
     pass
 
 
-def _build_get_spot_price_in_eth_calls(chain: ChainData, destination_address_info_df: pd.DataFrame) -> list[Call]:
+def _build_get_spot_price_in_eth_calls(
+    chain: ChainData, destination_address_info_df: pd.DataFrame, name_prefix: tuple = ()
+) -> list[Call]:
     pool_token_addresses = destination_address_info_df[["pool", "token_address"]].drop_duplicates()
     return [
         Call(
             ROOT_PRICE_ORACLE(chain),
             ["getSpotPriceInEth(address,address)(uint256)", token_address, pool_address],
-            [((pool_address, token_address, "spot_price"), safe_normalize_with_bool_success)],
+            [((*name_prefix, pool_address, token_address, "spot_price"), safe_normalize_with_bool_success)],
         )
         for (pool_address, token_address) in zip(pool_token_addresses["pool"], pool_token_addresses["token_address"])
     ]
 
 
-def _build_get_spot_price_in_quote_calls(chain: ChainData, destination_address_info_df: pd.DataFrame) -> list[Call]:
+def _build_get_spot_price_in_quote_calls(
+    chain: ChainData, destination_address_info_df: pd.DataFrame, name_prefix: tuple = ()
+) -> list[Call]:
     # pricer_contract.functions.getSpotPriceInQuote(underlyingTokens[i], pool, quote).call({}, blockNo)
     # note: this might need to be patched to include autopool.baseAsset -> 1.0
     pool_token_addresses = destination_address_info_df[
@@ -97,40 +101,65 @@ def _build_get_spot_price_in_quote_calls(chain: ChainData, destination_address_i
             Call(
                 SOLVER_ROOT_ORACLE(chain),
                 ["getSpotPriceInQuote(address,address,address)(uint256)", token_address, pool_address, base_asset],
-                [((pool_address, token_address, "spot_price"), cleaning_function)],
+                [((*name_prefix, pool_address, token_address, "spot_price"), cleaning_function)],
             )
         )
 
     return calls
 
 
+REBALANCE_PLAN_MATCH_WINDOW = pd.Timedelta(minutes=10)
+
+
 def _connect_plans_to_rebalance_events(
     rebalance_event_df: pd.DataFrame,
     rebalance_plan_df: pd.DataFrame,
 ) -> dict:
-    rebalance_transaction_hash_to_rebalance_plan = {}
-
-    for index in range(len(rebalance_event_df)):
-        one_rebalance_event = rebalance_event_df.iloc[index]
-
-        tx_hash = one_rebalance_event["transactionHash"]
-        same_destinations = (rebalance_plan_df["token_out"] == one_rebalance_event["tokenOutAddress"]) & (
-            rebalance_plan_df["token_in"] == one_rebalance_event["tokenInAddress"]
-        )
-        same_amount_out = rebalance_plan_df["amount_out"] == one_rebalance_event["tokenOutAmount"]
-
-        window_start = one_rebalance_event["datetime_executed"] - pd.Timedelta(minutes=10)
-        generated_no_more_than_one_hour_before = rebalance_plan_df["datetime_generated"].between(
-            window_start, one_rebalance_event["datetime_executed"]
-        )
-
-        matches = rebalance_plan_df[same_destinations & same_amount_out & generated_no_more_than_one_hour_before]
-        matches = matches.sort_values("datetime_generated", ascending=False).head(1)
+    """
+    Map each rebalance event transactionHash to the file_name of the most recent plan with the same
+    (token_in, token_out, amount_out) generated no more than REBALANCE_PLAN_MATCH_WINDOW before the event, or None.
+
+    Sorted as-of join, so it scales with (events + plans) instead of (events * plans)
+    """
+    rebalance_transaction_hash_to_rebalance_plan = {tx_hash: None for tx_hash in rebalance_event_df["transactionHash"]}
+    by_columns = ["token_in", "token_out", "amount_out"]
+
+    plans = rebalance_plan_df[["file_name", *by_columns, "datetime_generated"]].dropna()
+    if rebalance_event_df.empty or plans.empty:
+        return rebalance_transaction_hash_to_rebalance_plan
+
+    events = pd.DataFrame(
+        {
+            "tx_hash": rebalance_event_df["transactionHash"].to_numpy(),
+            "token_in": rebalance_event_df["tokenInAddress"].to_numpy(),
+            "token_out": rebalance_event_df["tokenOutAddress"].to_numpy(),
+            "amount_out": rebalance_event_df["tokenOutAmount"].astype(float).to_numpy(),
+            "datetime": pd.to_datetime(rebalance_event_df["datetime_executed"], utc=True).astype("datetime64[ns, UTC]"),
+        }
+    ).sort_values("datetime")
+
+    plans = pd.DataFrame(
+        {
+            "file_name": plans["file_name"].to_numpy(),
+            "token_in": plans["token_in"].to_numpy(),
+            "token_out": plans["token_out"].to_numpy(),
+            "amount_out": plans["amount_out"].astype(float).to_numpy(),
+            "datetime": pd.to_datetime(plans["datetime_generated"], utc=True).astype("datetime64[ns, UTC]"),
+        }
+    ).sort_values("datetime")
+
+    matched = pd.merge_asof(
+        events,
+        plans,
+        on="datetime",
+        by=by_columns,
+        direction="backward",
+        tolerance=REBALANCE_PLAN_MATCH_WINDOW,
+        allow_exact_matches=True,
+    )
 
-        if matches.empty:
-            rebalance_transaction_hash_to_rebalance_plan[tx_hash] = None
-        else:
-            rebalance_transaction_hash_to_rebalance_plan[tx_hash] = matches["file_name"].values[0]
+    for tx_hash, file_name in zip(matched["tx_hash"], matched["file_name"]):
+        rebalance_transaction_hash_to_rebalance_plan[tx_hash] = None if pd.isna(file_name) else file_name
 
     return rebalance_transaction_hash_to_rebalance_plan
 
@@ -168,22 +197,37 @@ def _load_destination_info_df(autopool: AutopoolConstants) -> pd.DataFrame:
     return destination_info_df
 
 
-def _load_raw_rebalance_event_df(autopool: AutopoolConstants):
-    """Gets the rebalance events from our subgraph and connect them to the plans"""
-    rebalance_event_df = fetch_new_autopool_rebalance_events_from_subgraph(autopool)
+def _load_rebalance_plans_in_window(
+    autopool: AutopoolConstants, start: pd.Timestamp, end: pd.Timestamp
+) -> pd.DataFrame:
+    """Only the plans (and columns) _connect_plans_to_rebalance_events can match to events executed in [start, end]"""
+    return get_subset_of_table_as_df(
+        RebalancePlans,
+        columns=[
+            RebalancePlans.file_name,
+            RebalancePlans.token_in,
+            RebalancePlans.token_out,
+            RebalancePlans.amount_out,
+            RebalancePlans.datetime_generated,
+        ],
+        where_clause=(RebalancePlans.autopool_vault_address == autopool.autopool_eth_addr)
+        & (RebalancePlans.datetime_generated.between(start - REBALANCE_PLAN_MATCH_WINDOW, end)),
+    )
 
+
+def _load_raw_rebalance_event_df(
+    autopool: AutopoolConstants, rebalance_event_df: pd.DataFrame
+) -> tuple[pd.DataFrame, int | None]:
+    """
+    Connects the new rebalance events from our subgraph to the plans
+
+    Also returns the highest block the subgraph returned (None if it returned nothing) to advance the cursor to
+    """
     if rebalance_event_df.empty:
         # early exit if there are no new rebalance events
-        return rebalance_event_df
-
-    # TODO slightl optimization here because we don't need to fetch all rebalance plans every time only the plans after,
-    # more than 1 day before the latest rebalance event
-    # 1 day is too large of a buffer but should be fine.
+        return rebalance_event_df, None
 
-    rebalance_plan_df = get_full_table_as_df(
-        RebalancePlans,
-        where_clause=(RebalancePlans.autopool_vault_address == autopool.autopool_eth_addr),
-    )
+    highest_subgraph_block = int(rebalance_event_df["blockNumber"].max())
 
     all_rebalance_event_hashes = rebalance_event_df["transactionHash"].to_list()
 
@@ -198,21 +242,25 @@ def _load_raw_rebalance_event_df(autopool: AutopoolConstants):
         rebalance_event_df["transactionHash"].isin(rebalance_event_hashes_to_fetch)
     ].copy()
 
+    if rebalance_event_df.empty:
+        return rebalance_event_df, highest_subgraph_block
+
+    rebalance_plan_df = _load_rebalance_plans_in_window(
+        autopool,
+        start=rebalance_event_df["datetime_executed"].min(),
+        end=rebalance_event_df["datetime_executed"].max(),
+    )
+
     hash_to_plan = _connect_plans_to_rebalance_events(rebalance_event_df, rebalance_plan_df)
     rebalance_event_df["rebalance_file_path"] = rebalance_event_df["transactionHash"].map(hash_to_plan)
     rebalance_event_df["autopool_vault_address"] = autopool.autopool_eth_addr
     rebalance_event_df["chain_id"] = autopool.chain.chain_id
-    return rebalance_event_df
+    return rebalance_event_df, highest_subgraph_block
 
 
-def _add_lp_token_safe_and_spot_prices(
-    rebalance_event_df: pd.DataFrame,
-    autopool: AutopoolConstants,
-    max_concurrent_fetches: int = 1,
-) -> list[RebalanceEvents]:
-
-    destination_info_df = _load_destination_info_df(autopool)
-
+def _add_pool_addresses(
+    rebalance_event_df: pd.DataFrame, autopool: AutopoolConstants, destination_info_df: pd.DataFrame
+) -> pd.DataFrame:
     destination_vault_address_to_pool = {
         d: p for d, p in zip(destination_info_df["destination_vault_address"], destination_info_df["pool"])
     }
@@ -225,48 +273,58 @@ def _add_lp_token_safe_and_spot_prices(
     rebalance_event_df["poolOutAddress"] = rebalance_event_df["destinationOutAddress"].map(
         destination_vault_address_to_pool
     )
+    return rebalance_event_df
 
-    fetch_semaphore = threading.Semaphore(max_concurrent_fetches)
 
-    def _fetch_prices_and_build_rebalance_event(rebalance_event_row: pd.Series) -> RebalanceEvents:
-        with fetch_semaphore:
-            safe_value_out, safe_value_in, spot_value_out, spot_value_in = _fetch_values_in_and_out(
-                autopool, rebalance_event_row
-            )
-            spot_value_in_solver_change = _get_spot_value_change_in_solver(
-                autopool, destination_info_df, rebalance_event_row
-            )
+def _get_destination_tokens_for_spot_prices(
+    autopool: AutopoolConstants, destination_info_df: pd.DataFrame, rebalance_event_row: dict
+) -> pd.DataFrame:
+    out_destination_sub_df = destination_info_df[
+        destination_info_df["destination_vault_address"] == rebalance_event_row["destinationOutAddress"]
+    ]
+    in_destination_sub_df = destination_info_df[
+        (destination_info_df["destination_vault_address"] == rebalance_event_row["destinationInAddress"])
+        & ~destination_info_df["token_address"].isin(out_destination_sub_df["token_address"])
+    ]
+    destination_token_in_for_spot_prices = pd.concat([out_destination_sub_df, in_destination_sub_df])
 
-            return RebalanceEvents(
-                tx_hash=rebalance_event_row["transactionHash"],
-                autopool_vault_address=rebalance_event_row["autopool_vault_address"],
-                chain_id=int(rebalance_event_row["chain_id"]),
-                rebalance_file_path=rebalance_event_row["rebalance_file_path"],  # TODO should not be nullable
-                destination_out=rebalance_event_row["destinationOutAddress"],
-                destination_in=rebalance_event_row["destinationInAddress"],
-                quantity_out=float(rebalance_event_row["tokenOutAmount"]),  # not certain this is correct
-                quantity_in=float(
-                    rebalance_event_row["tokenInAmount"]
-                ),  # not accurate, see issue with getting better than expected prices
-                safe_value_out=safe_value_out,
-                safe_value_in=safe_value_in,
-                spot_value_out=spot_value_out,
-                spot_value_in=spot_value_in,
-                spot_value_in_solver_change=spot_value_in_solver_change,
-            )
+    destination_token_in_for_spot_prices["base_asset"] = autopool.base_asset
+    destination_token_in_for_spot_prices["base_asset_decimals"] = autopool.base_asset_decimals
+    return destination_token_in_for_spot_prices
+
+
+def _build_solver_balance_of_calls(destination_info_df: pd.DataFrame, rebalance_event_row: dict) -> list[Call]:
+    tokens_and_decimals = destination_info_df[["token_address", "decimals"]].drop_duplicates()
+
+    decimal_normalizer_map = {
+        6: safe_normalize_6_with_bool_success,
+        18: safe_normalize_with_bool_success,
+    }
+    tx_hash = rebalance_event_row["transactionHash"]
+
+    return [
+        Call(
+            token,
+            ["balanceOf(address)(uint256)", rebalance_event_row["solver_address"]],
+            [((tx_hash, token, "solver_balance"), decimal_normalizer_map[decimals])],
+        )
+        for token, decimals in zip(tokens_and_decimals["token_address"], tokens_and_decimals["decimals"])
+    ]
 
-    new_rebalance_event_rows: list[RebalanceEvents] = []
-    rows = rebalance_event_df.to_dict("records")
-    with ThreadPoolExecutor(max_workers=max_concurrent_fetches) as executor:
-        futures = [executor.submit(_fetch_prices_and_build_rebalance_event, row) for row in rows]
-        for future in as_completed(futures):
-            new_rebalance_event_rows.append(future.result())
 
-    return new_rebalance_event_rows
+def _build_rebalance_event_calls(
+    autopool: AutopoolConstants, destination_info_df: pd.DataFrame, rebalance_event_row: dict
+) -> tuple[list[Call], list[Call]]:
+    """
+    Returns (price_calls, solver_balance_of_calls) for one rebalance event.
 
+    price_calls are only needed at the rebalance block, solver_balance_of_calls are needed at the rebalance
+    block and the block before it. Every call name starts with the tx_hash, so the calls for many rebalances
+    can share one multicall.
+    """
+    tx_hash = rebalance_event_row["transactionHash"]
 
-def _fetch_values_in_and_out(autopool: AutopoolConstants, rebalance_event_row: pd.Series):
-    calls = build_lp_token_spot_and_safe_price_calls(
+    lp_token_price_calls = build_lp_token_spot_and_safe_price_calls(
         destination_addresses=[
             rebalance_event_row["destinationInAddress"],
             rebalance_event_row["destinationOutAddress"],
@@ -274,127 +332,155 @@ def _fetch_values_in_and_out(autopool: AutopoolConstants, rebalance_event_row: p
         lp_token_addresses=[rebalance_event_row["tokenInAddress"], rebalance_event_row["tokenOutAddress"]],
         pool_addresses=[rebalance_event_row["poolInAddress"], rebalance_event_row["poolOutAddress"]],
         autopool=autopool,
+        name_prefix=(tx_hash,),
     )
-    state = get_state_by_one_block(calls, int(rebalance_event_row["blockNumber"]), chain=autopool.chain)
 
-    if (autopool.autopool_eth_addr, "lp_token_spot_and_safe") in state:
-        # the vault (idle) safe and spot prices are always 1.0
-        state[(autopool.autopool_eth_addr, "lp_token_spot_and_safe")] = (1.0, 1.0)
-
-    # if we can't get a price, it's because we removed the destination,
+    if autopool.base_asset in WETH:
+        spot_price_calls_function = _build_get_spot_price_in_eth_calls
+    else:
+        spot_price_calls_function = _build_get_spot_price_in_quote_calls
 
-    in_spot_values = state[(rebalance_event_row["destinationInAddress"], "lp_token_spot_and_safe")]
+    spot_price_calls = spot_price_calls_function(
+        autopool.chain,
+        _get_destination_tokens_for_spot_prices(autopool, destination_info_df, rebalance_event_row),
+        name_prefix=(tx_hash,),
+    )
 
-    if in_spot_values is not None:
-        token_in_spot_value, token_in_safe_value = in_spot_values
-    else:
-        post_slack_message(
-            SlackChannel.PRODUCTION,
-            f"Warning: could not fetch spot and safe price for destination {rebalance_event_row=} {autopool.name=} ",
-        )
-        token_in_spot_value, token_in_safe_value = (1, 1)
+    solver_balance_of_calls = _build_solver_balance_of_calls(destination_info_df, rebalance_event_row)
+    return [*lp_token_price_calls, *spot_price_calls], solver_balance_of_calls
 
-    out_spot_values = state[(rebalance_event_row["destinationOutAddress"], "lp_token_spot_and_safe")]
 
-    if out_spot_values is not None:
-        token_out_spot_value, token_out_safe_value = out_spot_values
-    else:
-        post_slack_message(
-            SlackChannel.PRODUCTION,
-            f"Warning: could not fetch spot and safe price for destination {rebalance_event_row=} {autopool.name=} ",
-        )
-        token_out_spot_value, token_out_safe_value = (1, 1)
+def _fetch_rebalance_event_states(
+    autopool_to_rebalance_event_df: dict[AutopoolConstants, pd.DataFrame],
+    autopool_to_destination_info_df: dict[AutopoolConstants, pd.DataFrame],
+) -> dict[int, pd.DataFrame]:
+    """
+    Fetch every onchain value needed to price all the new rebalance events, grouped into one multicall per block.
 
-    safe_value_out = float(token_out_safe_value * rebalance_event_row["tokenOutAmount"])
-    safe_value_in = float(token_in_safe_value * rebalance_event_row["tokenInAmount"])
+    Returns chain_id -> DataFrame indexed by block, with one column per call name
+    """
+    chain_to_calls_by_block: dict[ChainData, dict[int, list[Call]]] = {}
 
-    spot_value_in = float(token_in_spot_value * rebalance_event_row["tokenInAmount"])
-    spot_value_out = float(token_out_spot_value * rebalance_event_row["tokenOutAmount"])
+    for autopool, rebalance_event_df in autopool_to_rebalance_event_df.items():
+        calls_by_block = chain_to_calls_by_block.setdefault(autopool.chain, {})
+        destination_info_df = autopool_to_destination_info_df[autopool]
 
-    return safe_value_out, safe_value_in, spot_value_out, spot_value_in
+        for rebalance_event_row in rebalance_event_df.to_dict("records"):
+            block = int(rebalance_event_row["blockNumber"])
+            price_calls, solver_balance_of_calls = _build_rebalance_event_calls(
+                autopool, destination_info_df, rebalance_event_row
+            )
+            calls_by_block.setdefault(block, []).extend([*price_calls, *solver_balance_of_calls])
+            calls_by_block.setdefault(block - 1, []).extend(solver_balance_of_calls)
 
+    chain_id_to_state_df = {}
+    for chain, calls_by_block in chain_to_calls_by_block.items():
+        num_calls = sum(len(calls) for calls in calls_by_block.values())
+        print(f"Fetching {num_calls:,} calls across {len(calls_by_block):,} blocks on {chain.name}")
+        chain_id_to_state_df[chain.chain_id] = get_raw_state_by_block_with_calls_per_block(calls_by_block, chain)
 
-def _get_spot_value_change_in_solver(
-    autopool: AutopoolConstants, destination_info_df: pd.DataFrame, rebalance_event_row: dict
-) -> float:
+    return chain_id_to_state_df
 
-    def _fetch_non_zero_changes(rebalance_event_row: dict) -> dict:
-        tokens_and_decimals = destination_info_df[["token_address", "decimals"]].drop_duplicates()
-        balance_of_calls = []
 
-        decimal_normalizer_map = {
-            6: safe_normalize_6_with_bool_success,
-            18: safe_normalize_with_bool_success,
-        }
+def _to_float_or_nan(value) -> float:
+    return np.nan if value is None else float(value)
 
-        for _, token_row in tokens_and_decimals.iterrows():
-            token = token_row["token_address"]
-            normalizer = decimal_normalizer_map[token_row["decimals"]]
-            solver_address = rebalance_event_row["solver_address"]
-            call = Call(
-                token,
-                [
-                    "balanceOf(address)(uint256)",
-                    solver_address,
-                ],
-                [(token, normalizer)],
-            )
-            balance_of_calls.append(call)
 
-        balance_of_df = get_raw_state_by_blocks(
-            balance_of_calls,
-            [int(rebalance_event_row["blockNumber"]) - 1, int(rebalance_event_row["blockNumber"])],
-            chain=autopool.chain,
-        )
-        diffs = balance_of_df.diff()
-        second_row = diffs.iloc[1]
-        non_zero_changes = {col: val for col, val in second_row.items() if val != 0}
-        return non_zero_changes
+def _get_lp_token_spot_and_safe_price(
+    autopool: AutopoolConstants, state: dict, tx_hash: str, destination_vault_address: str, rebalance_event_row: dict
+) -> tuple[float, float]:
+    if destination_vault_address == autopool.autopool_eth_addr:
+        # the vault (idle) safe and spot prices are always 1.0
+        return (1.0, 1.0)
 
-    non_zero_changes = _fetch_non_zero_changes(rebalance_event_row)
+    spot_and_safe = state[(tx_hash, destination_vault_address, "lp_token_spot_and_safe")]
 
-    out_destination_sub_df = destination_info_df[
-        destination_info_df["destination_vault_address"] == rebalance_event_row["destinationOutAddress"]
-    ]
-    in_destination_sub_df = destination_info_df[
-        (destination_info_df["destination_vault_address"] == rebalance_event_row["destinationInAddress"])
-        & ~destination_info_df["token_address"].isin(out_destination_sub_df["token_address"])
-    ]
-    destination_token_in_for_spot_prices = pd.concat([out_destination_sub_df, in_destination_sub_df])
+    # if we can't get a price, it's because we removed the destination,
+    if isinstance(spot_and_safe, tuple):
+        return spot_and_safe
 
-    destination_token_in_for_spot_prices["base_asset"] = autopool.base_asset
-    destination_token_in_for_spot_prices["base_asset_decimals"] = autopool.base_asset_decimals
+    post_slack_message(
+        SlackChannel.PRODUCTION,
+        f"Warning: could not fetch spot and safe price for destination {rebalance_event_row=} {autopool.name=} ",
+    )
+    return (1, 1)
 
-    if autopool.base_asset in WETH:
-        spot_price_calls_function = _build_get_spot_price_in_eth_calls
-    else:
-        spot_price_calls_function = _build_get_spot_price_in_quote_calls
 
-    spot_price_dict = get_state_by_one_block(
-        spot_price_calls_function(autopool.chain, destination_token_in_for_spot_prices),
-        rebalance_event_row["blockNumber"],
-        chain=autopool.chain,
+def _build_rebalance_event_row(
+    autopool: AutopoolConstants,
+    rebalance_event_row: dict,
+    state_df: pd.DataFrame,
+) -> RebalanceEvents:
+    tx_hash = rebalance_event_row["transactionHash"]
+    block = int(rebalance_event_row["blockNumber"])
+    state = state_df.loc[block].to_dict()
+    prior_state = state_df.loc[block - 1].to_dict()
+
+    token_in_spot_value, token_in_safe_value = _get_lp_token_spot_and_safe_price(
+        autopool, state, tx_hash, rebalance_event_row["destinationInAddress"], rebalance_event_row
+    )
+    token_out_spot_value, token_out_safe_value = _get_lp_token_spot_and_safe_price(
+        autopool, state, tx_hash, rebalance_event_row["destinationOutAddress"], rebalance_event_row
     )
 
-    token_spot_price = {token: value for (pool, token, spot_price_string_id), value in spot_price_dict.items()}
-    token_spot_price[autopool.base_asset] = 1.0
-    spot_value_difference_in_solver = 0
+    token_spot_price = {}
+    solver_balance_changes = {}
+    for key, value in state.items():
+        if not (isinstance(key, tuple) and key[0] == tx_hash):
+            continue
+        if key[-1] == "spot_price":
+            _, pool, token, _ = key
+            token_spot_price[token] = value
+        elif key[-1] == "solver_balance":
+            _, token, _ = key
+            change = _to_float_or_nan(value) - _to_float_or_nan(prior_state[key])
+            if change != 0:
+                solver_balance_changes[token] = change
 
-    for k, token_quantity_change_before_and_after_rebalance in non_zero_changes.items():
-        spot_value_difference_in_solver += token_spot_price[k] * token_quantity_change_before_and_after_rebalance
+    token_spot_price[autopool.base_asset] = 1.0
 
     # positve value means there was extra value left in solver
     # negative value means there was value taken out of the solver
-    return spot_value_difference_in_solver
+    spot_value_in_solver_change = 0
+    for token, token_quantity_change_before_and_after_rebalance in solver_balance_changes.items():
+        spot_value_in_solver_change += token_spot_price[token] * token_quantity_change_before_and_after_rebalance
+
+    return RebalanceEvents(
+        tx_hash=tx_hash,
+        autopool_vault_address=rebalance_event_row["autopool_vault_address"],
+        chain_id=int(rebalance_event_row["chain_id"]),
+        rebalance_file_path=rebalance_event_row["rebalance_file_path"],  # TODO should not be nullable
+        destination_out=rebalance_event_row["destinationOutAddress"],
+        destination_in=rebalance_event_row["destinationInAddress"],
+        quantity_out=float(rebalance_event_row["tokenOutAmount"]),  # not certain this is correct
+        quantity_in=float(
+            rebalance_event_row["tokenInAmount"]
+        ),  # not accurate, see issue with getting better than expected prices
+        safe_value_out=float(token_out_safe_value * rebalance_event_row["tokenOutAmount"]),
+        safe_value_in=float(token_in_safe_value * rebalance_event_row["tokenInAmount"]),
+        spot_value_out=float(token_out_spot_value * rebalance_event_row["tokenOutAmount"]),
+        spot_value_in=float(token_in_spot_value * rebalance_event_row["tokenInAmount"]),
+        spot_value_in_solver_change=float(spot_value_in_solver_change),
+    )
 
 
 def ensure_rebalance_events_are_current():
-    # note too slow 3 minutes
+    autopool_to_rebalance_event_df: dict[AutopoolConstants, pd.DataFrame] = {}
+    autopool_to_rebalance_blocks: dict[AutopoolConstants, list[int]] = {}
+    autopool_to_highest_subgraph_block: dict[AutopoolConstants, int] = {}
+
+    # page every autopool's new subgraph rebalance events concurrently
+    autopool_to_subgraph_rebalance_event_df = fetch_new_rebalance_events_from_subgraph_for_autopools(ALL_AUTOPOOLS)
+
     for autopool in ALL_AUTOPOOLS:
-        rebalance_event_df = _load_raw_rebalance_event_df(autopool)
+        rebalance_event_df, highest_subgraph_block = _load_raw_rebalance_event_df(
+            autopool, autopool_to_subgraph_rebalance_event_df[autopool]
+        )
 
         if rebalance_event_df.empty:
             print(autopool.name, "no new rebalance events to fetch")
+            if highest_subgraph_block is not None:
+                write_rebalance_events_subgraph_cursor(autopool, highest_subgraph_block)
             continue
         print(f"Fetched {len(rebalance_event_df):,} new rebalance events for {autopool.name}")
 
@@ -409,10 +495,31 @@ def ensure_rebalance_events_are_current():
         }
         rebalance_event_df["solver_address"] = rebalance_event_df["transactionHash"].map(tx_hash_to_to_address)
 
-        new_rebalance_event_rows = _add_lp_token_safe_and_spot_prices(
-            rebalance_event_df, autopool, max_concurrent_fetches=5
-        )
-        new_autopool_state_rows = _fetch_new_autopool_state_rows(autopool, [int(b) for b in transaction_df["block"]])
+        autopool_to_rebalance_event_df[autopool] = rebalance_event_df
+        autopool_to_rebalance_blocks[autopool] = [int(b) for b in transaction_df["block"]]
+        autopool_to_highest_subgraph_block[autopool] = highest_subgraph_block
+
+    if not autopool_to_rebalance_event_df:
+        return
+
+    autopool_to_destination_info_df = {}
+    for autopool, rebalance_event_df in autopool_to_rebalance_event_df.items():
+        destination_info_df = _load_destination_info_df(autopool)
+        autopool_to_destination_info_df[autopool] = destination_info_df
+        _add_pool_addresses(rebalance_event_df, autopool, destination_info_df)
+
+    # one multicall per (chain, block) for every new rebalance event of every autopool
+    chain_id_to_state_df = _fetch_rebalance_event_states(
+        autopool_to_rebalance_event_df, autopool_to_destination_info_df
+    )
+
+    for autopool, rebalance_event_df in autopool_to_rebalance_event_df.items():
+        state_df = chain_id_to_state_df[autopool.chain.chain_id]
+        new_rebalance_event_rows = [
+            _build_rebalance_event_row(autopool, rebalance_event_row, state_df)
+            for rebalance_event_row in rebalance_event_df.to_dict("records")
+        ]
+        new_autopool_state_rows = _fetch_new_autopool_state_rows(autopool, autopool_to_rebalance_blocks[autopool])
 
         for rebalance_event in new_rebalance_event_rows:
             # note monkey patch when updating database switch to making the column not nullable
@@ -428,6 +535,7 @@ def ensure_rebalance_events_are_current():
         insert_avoid_conflicts(new_autopool_state_rows, AutopoolStates)
         insert_avoid_conflicts(new_rebalance_event_rows, RebalanceEvents)
         print(f"Inserted {len(new_rebalance_event_rows):,} new rebalance events for {autopool.name}")
+        write_rebalance_events_subgraph_cursor(autopool, autopool_to_highest_subgraph_block[autopool])
 
 
 if __name__ == "__main__":
@@ -17,6 +17,9 @@ from mainnet_launch.database.postgres_operations import (
 
 from mainnet_launch.data_fetching.internal.s3_helper import (
     fetch_all_solver_rebalance_plan_file_names,
+    fetch_new_solver_rebalance_plan_file_names,
+    listing_high_water_marks,
+    write_rebalance_plan_listing_high_water_marks,
     make_s3_client,
     fetch_rebalance_plan_json_from_s3_bucket,
 )
@@ -217,7 +220,9 @@ def ensure_rebalance_plans_table_are_current():
 
     s3_client = make_s3_client()
     for autopool in ALL_AUTOPOOLS:
-        solver_plan_paths_on_remote = fetch_all_solver_rebalance_plan_file_names(autopool, s3_client)
+        solver_plan_paths_on_remote, bucket_to_keys = fetch_new_solver_rebalance_plan_file_names(
+            autopool, s3_client, RebalancePlans
+        )
 
         plans_not_already_fetched = get_subset_not_already_in_column(
             RebalancePlans,
@@ -227,6 +232,9 @@ def ensure_rebalance_plans_table_are_current():
         )
 
         if not plans_not_already_fetched:
+            write_rebalance_plan_listing_high_water_marks(
+                RebalancePlans, listing_high_water_marks(bucket_to_keys, set())
+            )
             print(f"No new rebalance plans to fetch for {autopool.name}")
             continue
 
@@ -245,20 +253,29 @@ def ensure_rebalance_plans_table_are_current():
 
         all_rebalance_plan_rows = []
         all_dex_steps_rows = []
+        failed_plans = set()
 
         with ThreadPoolExecutor(max_workers=10) as executor:
             futures = list(executor.map(_process_plan, plans_not_already_fetched))
-            for response in tqdm(futures, desc=f"Processing {autopool.name} plans"):
+            for plan_on_remote, response in tqdm(
+                zip(plans_not_already_fetched, futures), total=len(futures), desc=f"Processing {autopool.name} plans"
+            ):
                 new_rebalance_plan_row, new_dex_steps_rows, failed = response
                 if not failed:
                     all_rebalance_plan_rows.append(new_rebalance_plan_row)
                     all_dex_steps_rows.extend(new_dex_steps_rows)
+                else:
+                    # listed and retried next run
+                    failed_plans.add(plan_on_remote)
                 # TODO add RebalanceCandidateDestinations here
 
         insert_avoid_conflicts(all_rebalance_plan_rows, RebalancePlans, index_elements=[RebalancePlans.file_name])
         insert_avoid_conflicts(
             all_dex_steps_rows, DexSwapSteps, index_elements=[DexSwapSteps.file_name, DexSwapSteps.step_index]
         )
+        write_rebalance_plan_listing_high_water_marks(
+            RebalancePlans, listing_high_water_marks(bucket_to_keys, failed_plans)
+        )
         print("Inserted ", len(all_rebalance_plan_rows), " new rebalance plans for ", autopool.name)
 
 
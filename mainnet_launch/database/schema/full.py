@@ -724,6 +724,49 @@ class DestinationUnderlyingWithdraw(Base):
     )
 
 
+class AutopoolDestinationDailyRollup(Base):
+    """
+    End of UTC day snapshot of how much of each destination token an autopool holds, and what it is worth.
+
+    Derived from DestinationTokenValues, TokenValues, AutopoolDestinationStates, DestinationStates and Destinations
+    at the last block of each day, so the Key Metrics, Exposure and CRM pages read one range of this table
+    instead of joining those on every page load. Rebuilt from the last day already present by
+    ensure_autopool_destination_daily_rollup_is_current, the last step of the nightly update.
+    """
+
+    __tablename__ = "autopool_destination_daily_rollup"
+
+    autopool_vault_address: Mapped[str] = mapped_column(primary_key=True)
+    day: Mapped[pd.Timestamp] = mapped_column(DateTime(timezone=True), primary_key=True)
+    destination_vault_address: Mapped[str] = mapped_column(primary_key=True)
+    token_address: Mapped[str] = mapped_column(primary_key=True)
+    chain_id: Mapped[int] = mapped_column(nullable=False)
+
+    # the last block of the day with destination token values
+    block: Mapped[int] = mapped_column(nullable=False)
+    datetime: Mapped[pd.Timestamp] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    readable_name: Mapped[str] = mapped_column(nullable=False)  # underlying_name (exchange_name)
+    symbol: Mapped[str] = mapped_column(nullable=False)
+
+    autopool_implied_safe_value: Mapped[float] = mapped_column(nullable=True)
+    autopool_implied_backing_value: Mapped[float] = mapped_column(nullable=True)
+    autopool_implied_quantity: Mapped[float] = mapped_column(nullable=True)
+    unweighted_expected_apr: Mapped[float] = mapped_column(nullable=True)  # percent
+
+    owned_shares: Mapped[float] = mapped_column(nullable=True)
+    lp_token_safe_price: Mapped[float] = mapped_column(nullable=True)
+    total_apr_out: Mapped[float] = mapped_column(nullable=True)
+    total_apr_in: Mapped[float] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["autopool_vault_address", "chain_id"], ["autopools.autopool_vault_address", "autopools.chain_id"]
+        ),
+        ForeignKeyConstraint(["block", "chain_id"], ["blocks.block", "blocks.chain_id"]),
+    )
+
+
 class TrackLastProcessedBlock(Base):
     """
     plasma fetch events takes minutes, instead of seconds, even if there are no events to process.
@@ -738,6 +781,34 @@ class TrackLastProcessedBlock(Base):
     last_processed_block: Mapped[int] = mapped_column(nullable=False)
 
 
+class S3ListingHighWaterMark(Base):
+    """
+    Rebalance plan keys are timestamp ordered, so once every key up to last_listed_key in bucket is saved in
+    table_name the next listing of that bucket can start after it instead of listing the whole bucket again.
+    """
+
+    __tablename__ = "s3_listing_high_water_mark"
+
+    table_name: Mapped[str] = mapped_column(primary_key=True)
+    bucket: Mapped[str] = mapped_column(primary_key=True)
+    last_listed_key: Mapped[str] = mapped_column(nullable=False)
+
+
+class GetLogsChunkSize(Base):
+    """
+    The eth_getLogs block range per (chain, topic0) that is known to work, so each nightly run starts at
+    the size the last run ended at instead of relearning it. See _ChunkSizeLearner in fetch_events_with_get_logs.
+    """
+
+    __tablename__ = "get_logs_chunk_size"
+
+    chain_id: Mapped[int] = mapped_column(primary_key=True)
+    topic0: Mapped[str] = mapped_column(primary_key=True)  # comma joined when one scan covers many events
+    size: Mapped[int] = mapped_column(nullable=False)
+    min_failed: Mapped[int] = mapped_column(nullable=True)  # smallest block range that had to be split
+    min_failed_at: Mapped[float] = mapped_column(nullable=True)  # unix seconds
+
+
 def drop_and_full_rebuild_db():
     confirmation = input("Type 'delete_and_rebuild' to confirm dropping and rebuilding the database: ")
     if confirmation != "delete_and_rebuild":
@@ -6,6 +6,11 @@ from mainnet_launch.constants import ChainData, ALL_CHAINS
 
 def write_last_processed_block(chain: ChainData, block: int, table: type):
     """After we update a (chain, table) combination to a given block, store is so that we don't do redundent queries later"""
+    write_last_processed_block_by_name(chain, block, table.__tablename__)
+
+
+def write_last_processed_block_by_name(chain: ChainData, block: int, table_name: str):
+    """Same as write_last_processed_block, but for cursors that are finer grained than a table, eg one per autopool"""
 
     query = """
             BEGIN;
@@ -20,10 +25,22 @@ def write_last_processed_block(chain: ChainData, block: int, table: type):
             COMMIT;
         """
     with Session() as session:
-        session.execute(text(query), {"chain_id": chain.chain_id, "table_name": table.__tablename__, "block": block})
+        session.execute(text(query), {"chain_id": chain.chain_id, "table_name": table_name, "block": block})
         session.commit()
 
-    print(f"Updated {TrackLastProcessedBlock.__tablename__} to ({table.__tablename__}, {chain.chain_id}, {block:,})")
+    print(f"Updated {TrackLastProcessedBlock.__tablename__} to ({table_name}, {chain.chain_id}, {block:,})")
+
+
+def get_last_processed_block_by_name(chain: ChainData, table_name: str) -> int | None:
+    """The last processed block stored under table_name on chain, or None if nothing has been written yet"""
+    df = get_full_table_as_df(
+        TrackLastProcessedBlock,
+        where_clause=(TrackLastProcessedBlock.table_name == table_name)
+        & (TrackLastProcessedBlock.chain_id == chain.chain_id),
+    )
+    if df.empty:
+        return None
+    return int(df["last_processed_block"].iloc[0])
 
 
 def get_last_processed_block_for_table(table: type[Base]) -> dict[ChainData | int, int]:
@@ -96,9 +96,14 @@ def get_all_autopool_basket_of_primary_assets(autopool: AutopoolConstants) -> pd
     return df.drop_duplicates()
 
 
-@st.cache_data(ttl=60 * 20, show_spinner=False)
+# not st.cache_data, merge_tables_as_df results are cached until the tables they read are written to
 def fetch_autopool_destination_state_df(autopool: AutopoolConstants) -> pd.DataFrame:
     """Gets TVL, prices, shares and APR data for each destintion for this autopool"""
+    return fetch_autopool_destination_state_df_after(autopool, autopool.get_display_date())
+
+
+def fetch_autopool_destination_state_df_after(autopool: AutopoolConstants, after_datetime: str) -> pd.DataFrame:
+    """fetch_autopool_destination_state_df for blocks after `after_datetime`, does not need a streamlit session"""
 
     destinations_df = merge_tables_as_df(
         [
@@ -171,11 +176,11 @@ def fetch_autopool_destination_state_df(autopool: AutopoolConstants) -> pd.DataF
         ],
         where_clause=(AutopoolDestinationStates.autopool_vault_address == autopool.autopool_eth_addr)
         & (Tokens.chain_id == autopool.chain.chain_id)
-        & (Blocks.datetime > autopool.get_display_date()),
+        & (Blocks.datetime > after_datetime),
     )
 
-    destinations_df["readable_name"] = destinations_df.apply(
-        lambda row: f"{row['underlying_name']} ({row['exchange_name']})", axis=1
+    destinations_df["readable_name"] = (
+        destinations_df["underlying_name"].astype(str) + " (" + destinations_df["exchange_name"].astype(str) + ")"
     )
 
     # for the idle destination, owned shares == underlying_token_total_supply
@@ -215,6 +220,37 @@ def fetch_autopool_destination_state_df(autopool: AutopoolConstants) -> pd.DataF
     return destinations_df
 
 
+def fetch_autopool_destination_daily_rollup_df(autopool: AutopoolConstants) -> pd.DataFrame:
+    """
+    End of day rows of AutopoolDestinationDailyRollup for this autopool since the display date,
+    one row per (day, destination, token). A single range scan on the primary key.
+    """
+    return merge_tables_as_df(
+        [TableSelector(AutopoolDestinationDailyRollup)],
+        where_clause=(AutopoolDestinationDailyRollup.autopool_vault_address == autopool.autopool_eth_addr)
+        & (AutopoolDestinationDailyRollup.day > autopool.get_display_date()),
+        order_by=AutopoolDestinationDailyRollup.day,
+    )
+
+
+def pivot_daily_rollup(
+    rollup_df: pd.DataFrame, values: str, columns: str, aggfunc: str, fill_value: float | None = None
+) -> pd.DataFrame:
+    """
+    day x `columns` frame of `values` aggregated with aggfunc, one row for every day even if it has no data,
+    the same shape as the old groupby(datetime).pivot().resample("1d").last() on the raw states.
+    fill_value fills the gaps on days with data, days with no data stay NaN.
+    """
+    pivot_df = rollup_df.pivot_table(index="day", columns=columns, values=values, aggfunc=aggfunc)
+    if fill_value is not None:
+        pivot_df = pivot_df.fillna(fill_value)
+    if not pivot_df.empty:
+        pivot_df = pivot_df.asfreq("1D")
+    pivot_df.index.name = "datetime"
+    pivot_df.columns.name = columns
+    return pivot_df
+
+
 def get_readable_rebalance_events_by_autopool(autopool: AutopoolConstants) -> pd.DataFrame:
     rebalance_df = merge_tables_as_df(
         selectors=[
@@ -277,7 +313,8 @@ def get_readable_rebalance_events_by_autopool(autopool: AutopoolConstants) -> pd
 
 
 def get_token_details_dict() -> tuple[dict, dict]:
-    tokens_df = get_full_table_as_df(Tokens)  # not totally certain that token address is distinct across chains
+    # not totally certain that token address is distinct across chains
+    tokens_df = get_full_table_as_df(Tokens, columns=[Tokens.token_address, Tokens.decimals, Tokens.symbol])
     token_to_decimals = tokens_df.set_index(["token_address"])["decimals"].to_dict()
     token_to_symbol = tokens_df.set_index(["token_address"])["symbol"].to_dict()
     return token_to_decimals, token_to_symbol
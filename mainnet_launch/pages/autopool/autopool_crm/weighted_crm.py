@@ -5,16 +5,7 @@ import numpy as np
 
 from mainnet_launch.constants import AutopoolConstants
 
-from mainnet_launch.database.schema.full import (
-    Blocks,
-    DestinationStates,
-    Destinations,
-    AutopoolDestinationStates,
-)
-from mainnet_launch.database.postgres_operations import (
-    merge_tables_as_df,
-    TableSelector,
-)
+from mainnet_launch.database.views import fetch_autopool_destination_daily_rollup_df, pivot_daily_rollup
 
 # if it shows >50% APR the signal is likely wrong, so we replace it with NaN on the dispaly,
 # can see them in the destination diagnositics if needed
@@ -55,93 +46,25 @@ def fetch_and_render_weighted_crm_data(autopool: AutopoolConstants):
         )
 
 
-@st.cache_data(ttl=60 * 20, show_spinner=False)
 def _fetch_weighted_crm_data(autopool: AutopoolConstants):
-    destination_state_df = merge_tables_as_df(
-        selectors=[
-            TableSelector(
-                DestinationStates,
-                select_fields=[
-                    DestinationStates.destination_vault_address,
-                    DestinationStates.lp_token_safe_price,
-                    DestinationStates.total_apr_out,
-                    DestinationStates.total_apr_in,
-                ],
-            ),
-            TableSelector(
-                Destinations,
-                select_fields=[
-                    Destinations.underlying_name,
-                    Destinations.exchange_name,
-                ],
-                join_on=(Destinations.destination_vault_address == DestinationStates.destination_vault_address)
-                & (Destinations.chain_id == DestinationStates.chain_id),
-            ),
-            TableSelector(
-                AutopoolDestinationStates,
-                [
-                    AutopoolDestinationStates.owned_shares,
-                ],
-                (DestinationStates.destination_vault_address == AutopoolDestinationStates.destination_vault_address)
-                & (DestinationStates.chain_id == AutopoolDestinationStates.chain_id)
-                & (DestinationStates.block == AutopoolDestinationStates.block),
-            ),
-            TableSelector(
-                Blocks,
-                [Blocks.datetime, Blocks.block],
-                (DestinationStates.block == Blocks.block) & (DestinationStates.chain_id == Blocks.chain_id),
-            ),
-        ],
-        where_clause=(AutopoolDestinationStates.autopool_vault_address == autopool.autopool_eth_addr)
-        & (Blocks.datetime > autopool.get_display_date()),
-        order_by=Blocks.datetime,
+    # the rollup has a row per destination token, the destination level columns repeat on each
+    destination_rollup_df = fetch_autopool_destination_daily_rollup_df(autopool).drop_duplicates(
+        ["day", "destination_vault_address"]
     )
 
-    destination_state_df["readable_destination_name"] = destination_state_df.apply(
-        lambda row: f"{row['underlying_name']} ({row['exchange_name']})", axis=1
-    )
-
-    sum_df = (
-        destination_state_df.groupby(["readable_destination_name", "datetime"])[["owned_shares"]].sum().reset_index()
-    )
-
-    owned_shares_df = (
-        sum_df.pivot(index="datetime", values="owned_shares", columns="readable_destination_name").resample("1D").last()
-    )
-
-    max_df = (
-        destination_state_df.groupby(["readable_destination_name", "datetime"])[
-            ["lp_token_safe_price", "total_apr_out", "total_apr_in"]
-        ]
-        .max()
-        .reset_index()
-    )
-
-    lp_token_safe_price_df = (
-        max_df.pivot(index="datetime", values="lp_token_safe_price", columns="readable_destination_name")
-        .resample("1D")
-        .last()
-    )
+    owned_shares_df = pivot_daily_rollup(destination_rollup_df, "owned_shares", "readable_name", "sum")
+    lp_token_safe_price_df = pivot_daily_rollup(destination_rollup_df, "lp_token_safe_price", "readable_name", "max")
 
     allocation_df = (lp_token_safe_price_df * owned_shares_df).fillna(0)
 
     portion_allocation_df = allocation_df.div(allocation_df.sum(axis=1), axis=0)
 
-    total_apr_out_df = 100 * (
-        max_df.pivot(index="datetime", values="total_apr_out", columns="readable_destination_name")
-        .resample("1D")
-        .last()
-    )
+    total_apr_out_df = 100 * pivot_daily_rollup(destination_rollup_df, "total_apr_out", "readable_name", "max")
 
     total_apr_out_df = total_apr_out_df.where(total_apr_out_df <= MAX_EXPECTED_APR_THESHOLD, np.nan)
     total_apr_out_df[f"{autopool.name} CR"] = (total_apr_out_df * portion_allocation_df).sum(axis=1)
 
-    total_apr_in_df = (
-        100
-        * max_df.pivot(index="datetime", values="total_apr_in", columns="readable_destination_name")
-        .resample("1D")
-        .last()
-    )
+    total_apr_in_df = 100 * pivot_daily_rollup(destination_rollup_df, "total_apr_in", "readable_name", "max")
     total_apr_in_df[f"{autopool.name} CR"] = (total_apr_in_df * portion_allocation_df).sum(axis=1)
     total_apr_in_df = total_apr_in_df.where(total_apr_in_df <= MAX_EXPECTED_APR_THESHOLD, np.nan)
 
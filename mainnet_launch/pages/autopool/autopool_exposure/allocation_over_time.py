@@ -3,33 +3,20 @@ import streamlit as st
 import plotly.express as px
 from mainnet_launch.constants import AutopoolConstants, ALL_AUTOPOOLS, WETH, USDC
 
-from mainnet_launch.database.views import get_all_autopool_destinations, fetch_autopool_destination_state_df
+from mainnet_launch.database.views import (
+    get_all_autopool_destinations,
+    fetch_autopool_destination_daily_rollup_df,
+    pivot_daily_rollup,
+)
 
 
 def fetch_and_render_asset_allocation_over_time(autopool: AutopoolConstants):
-    df = fetch_autopool_destination_state_df(autopool)
+    rollup_df = fetch_autopool_destination_daily_rollup_df(autopool)
 
-    end_of_day_safe_value_by_destination = (
-        (
-            df.groupby(["datetime", "readable_name"])["autopool_implied_safe_value"]
-            .sum()
-            .reset_index()
-            .pivot(columns=["readable_name"], index=["datetime"], values="autopool_implied_safe_value")
-        )
-        .resample("1D")
-        .last()
-    )
-
-    end_of_day_safe_value_by_asset = (
-        (
-            df.groupby(["datetime", "symbol"])["autopool_implied_safe_value"]
-            .sum()
-            .reset_index()
-            .pivot(columns=["symbol"], index=["datetime"], values="autopool_implied_safe_value")
-        )
-        .resample("1D")
-        .last()
+    end_of_day_safe_value_by_destination = pivot_daily_rollup(
+        rollup_df, "autopool_implied_safe_value", "readable_name", "sum"
     )
+    end_of_day_safe_value_by_asset = pivot_daily_rollup(rollup_df, "autopool_implied_safe_value", "symbol", "sum")
 
     percent_tvl_by_destination = 100 * end_of_day_safe_value_by_destination.div(
         end_of_day_safe_value_by_destination.sum(axis=1), axis=0
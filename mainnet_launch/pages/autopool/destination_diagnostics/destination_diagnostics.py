@@ -10,14 +10,18 @@ from mainnet_launch.database.schema.full import (
     AutopoolDestinations,
 )
 from mainnet_launch.database.postgres_operations import (
-    merge_tables_as_df,
+    get_last_row_per_time_bucket,
+    choose_time_bucket_resolution,
     TableSelector,
 )
 
+_RESAMPLE_FREQ_BY_RESOLUTION = {"hour": "1h", "day": "1D"}
+
 
 @st.cache_data(ttl=60 * 20, show_spinner=False)
-def _fetch_destination_apr_data(autopool: AutopoolConstants) -> pd.DataFrame:
-    destination_state_df = merge_tables_as_df(
+def _fetch_destination_apr_data(autopool: AutopoolConstants, resolution: str) -> pd.DataFrame:
+    # the last state of each destination in each hour or day, not every block we have a state for
+    destination_state_df = get_last_row_per_time_bucket(
         selectors=[
             TableSelector(
                 DestinationStates,
@@ -46,10 +50,13 @@ def _fetch_destination_apr_data(autopool: AutopoolConstants) -> pd.DataFrame:
                 (DestinationStates.block == Blocks.block) & (DestinationStates.chain_id == Blocks.chain_id),
             ),
         ],
+        datetime_column=Blocks.datetime,
+        resolution=resolution,
+        partition_by=[DestinationStates.destination_vault_address],
         where_clause=(AutopoolDestinations.autopool_vault_address == autopool.autopool_eth_addr)
         & (Blocks.datetime >= autopool.get_display_date()),
-        order_by=Blocks.datetime,
     )
+    destination_state_df["datetime"] = destination_state_df.pop("time_bucket")
 
     destination_state_df["readable_name"] = destination_state_df.apply(
         lambda row: f"{row['underlying_name']} ({row['exchange_name']})", axis=1
@@ -61,7 +68,9 @@ def _fetch_destination_apr_data(autopool: AutopoolConstants) -> pd.DataFrame:
 
 
 def fetch_and_render_destination_apr_data(autopool: AutopoolConstants) -> go.Figure:
-    destination_state_df = _fetch_destination_apr_data(autopool)
+    resolution = choose_time_bucket_resolution(autopool.get_display_date())
+    resample_freq = _RESAMPLE_FREQ_BY_RESOLUTION[resolution]
+    destination_state_df = _fetch_destination_apr_data(autopool, resolution)
 
     destination_state_df["base_apr"] = pd.to_numeric(destination_state_df["base_apr"])
     destination_state_df["fee_plus_base_apr"] = pd.to_numeric(destination_state_df["fee_plus_base_apr"])
@@ -87,7 +96,7 @@ def fetch_and_render_destination_apr_data(autopool: AutopoolConstants) -> go.Fig
         * destination_state_df[destination_state_df["readable_name"] == destination_choice][apr_columns]
         .set_index("datetime")
         .astype(float)
-        .resample("1D")
+        .resample(resample_freq)
         .last()
     )
 
@@ -108,7 +117,7 @@ def fetch_and_render_destination_apr_data(autopool: AutopoolConstants) -> go.Fig
     summary_stats_df = (
         100
         * pd.pivot(destination_state_df, columns="readable_name", values=apr_choice, index="datetime")
-        .resample("1D")
+        .resample(resample_freq)
         .last()
     )
 
@@ -11,7 +11,7 @@ from datetime import datetime, timezone
 from mainnet_launch.constants import AutopoolConstants
 from mainnet_launch.database.schema.full import AutopoolStates, Blocks, RebalancePlans
 from mainnet_launch.database.postgres_operations import (
-    merge_tables_as_df,
+    get_last_row_per_time_bucket,
     TableSelector,
     get_highest_value_in_field_where,
     get_subset_of_table_as_df,
@@ -20,7 +20,8 @@ from mainnet_launch.data_fetching.internal.s3_helper import fetch_rebalance_plan
 
 
 from mainnet_launch.database.views import (
-    fetch_autopool_destination_state_df,
+    fetch_autopool_destination_daily_rollup_df,
+    pivot_daily_rollup,
     get_latest_rebalance_event_datetime_for_autopool,
 )
 
@@ -31,7 +32,8 @@ MAX_DISPLAY_PRICE_RETURN_PERCENT = 10
 
 
 def fetch_nav_per_share_and_total_nav(autopool: AutopoolConstants) -> pd.DataFrame:
-    nav_per_share_df = merge_tables_as_df(
+    # always daily, the rolling returns below count rows as days
+    nav_per_share_df = get_last_row_per_time_bucket(
         [
             TableSelector(
                 table=AutopoolStates,
@@ -48,12 +50,15 @@ def fetch_nav_per_share_and_total_nav(autopool: AutopoolConstants) -> pd.DataFra
                 join_on=(AutopoolStates.chain_id == Blocks.chain_id) & (AutopoolStates.block == Blocks.block),
             ),
         ],
+        datetime_column=Blocks.datetime,
+        resolution="day",
         where_clause=(Blocks.datetime > autopool.get_display_date())
         & (AutopoolStates.autopool_vault_address == autopool.autopool_eth_addr),
-        order_by=Blocks.datetime,
     )
 
-    nav_per_share_df = nav_per_share_df.set_index("datetime").resample("1d").last()
+    nav_per_share_df = (
+        nav_per_share_df.drop(columns=["datetime"]).set_index("time_bucket").rename_axis("datetime").asfreq("1D")
+    )
     nav_per_share_df.columns = [autopool.name, "NAV", "autopool_vault_address"]
 
     nav_per_share_df["30_day_difference"] = nav_per_share_df[autopool.name].diff(periods=30)
@@ -74,30 +79,13 @@ def fetch_nav_per_share_and_total_nav(autopool: AutopoolConstants) -> pd.DataFra
 
 def fetch_key_metrics_data(autopool: AutopoolConstants):
     nav_per_share_df = fetch_nav_per_share_and_total_nav(autopool)
-    destination_state_df = fetch_autopool_destination_state_df(autopool)
-
-    safe_tvl_by_destination = (
-        (
-            destination_state_df.groupby(["datetime", "readable_name"])[["autopool_implied_safe_value"]]
-            .sum()
-            .reset_index()
-            .pivot(values="autopool_implied_safe_value", index="datetime", columns="readable_name")
-        )
-        .fillna(0)
-        .resample("1d")
-        .last()
-    )
+    rollup_df = fetch_autopool_destination_daily_rollup_df(autopool)
 
-    backing_tvl_by_destination = (
-        (
-            destination_state_df.groupby(["datetime", "readable_name"])[["autopool_implied_backing_value"]]
-            .sum()
-            .reset_index()
-            .pivot(values="autopool_implied_backing_value", index="datetime", columns="readable_name")
-        )
-        .fillna(0)
-        .resample("1d")
-        .last()
+    safe_tvl_by_destination = pivot_daily_rollup(
+        rollup_df, "autopool_implied_safe_value", "readable_name", "sum", fill_value=0
+    )
+    backing_tvl_by_destination = pivot_daily_rollup(
+        rollup_df, "autopool_implied_backing_value", "readable_name", "sum", fill_value=0
     )
 
     total_safe_tvl = safe_tvl_by_destination.sum(axis=1)
@@ -113,25 +101,14 @@ def fetch_key_metrics_data(autopool: AutopoolConstants):
 
     portion_allocation_by_destination_df = safe_tvl_by_destination.div(total_safe_tvl, axis=0)
 
-    max_apr_by_destination = (
-        (
-            destination_state_df.groupby(["datetime", "readable_name"])[["unweighted_expected_apr"]]
-            .max()
-            .reset_index()
-            .pivot(values="unweighted_expected_apr", index="datetime", columns="readable_name")
-        )
-        .resample("1d")
-        .last()
-    )  # looks right
+    max_apr_by_destination = pivot_daily_rollup(rollup_df, "unweighted_expected_apr", "readable_name", "max")
 
     expected_return_series = (max_apr_by_destination * portion_allocation_by_destination_df).sum(axis=1)
 
     expected_return_series = expected_return_series.replace(0, np.nan)
 
     total_nav_series = nav_per_share_df["NAV"]
-    highest_block_and_datetime = (
-        destination_state_df[["block", "datetime"]].sort_values("block", ascending=True).iloc[-1]
-    )
+    highest_block_and_datetime = rollup_df[["block", "datetime"]].sort_values("block", ascending=True).iloc[-1]
 
     return (
         nav_per_share_df,
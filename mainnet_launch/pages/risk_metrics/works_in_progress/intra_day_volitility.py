@@ -20,13 +20,30 @@ import plotly.io as pio
 
 
 @st.cache_data(ttl=60 * 5, show_spinner=False)
-def _load_full_swap_quote_df():
+def _load_swap_quote_df(selected_date: datetime.date, percent_exclude_threshold: int):
     """
-    Load the full swap quote DataFrame from the database.
+    Load the swap quotes received on selected_date (UTC) with this percent_exclude_threshold from the database.
     """
-    df = get_full_table_as_df(SwapQuote)
+    day_start = pd.Timestamp(selected_date, tz="UTC")
+    df = get_full_table_as_df(
+        SwapQuote,
+        where_clause=(SwapQuote.datetime_received >= day_start)
+        & (SwapQuote.datetime_received < day_start + pd.Timedelta(days=1))
+        & (SwapQuote.percent_exclude_threshold == percent_exclude_threshold),
+        columns=[
+            SwapQuote.chain_id,
+            SwapQuote.api_name,
+            SwapQuote.sell_token_address,
+            SwapQuote.buy_token_address,
+            SwapQuote.scaled_amount_in,
+            SwapQuote.scaled_amount_out,
+            SwapQuote.percent_exclude_threshold,
+            SwapQuote.datetime_received,
+            SwapQuote.quote_batch,
+        ],
+    )
     df["effective_price"] = df["scaled_amount_out"] / df["scaled_amount_in"]
-    tokens_df = get_full_table_as_df(Tokens)
+    tokens_df = get_full_table_as_df(Tokens, columns=[Tokens.token_address, Tokens.symbol])
     token_address_to_symbol = dict(zip(tokens_df["token_address"], tokens_df["symbol"]))
     df["buy_token_symbol"] = df["buy_token_address"].map(token_address_to_symbol)
     df["sell_token_symbol"] = df["sell_token_address"].map(token_address_to_symbol)
@@ -265,15 +282,11 @@ def _render_intra_day_effective_price(df: pd.DataFrame, n_exclude: int) -> None:
 
 def fetch_and_render_intra_day_volitlity():
     """"""
-    df = _load_full_swap_quote_df()
     selected_date = pick_day()
     percent_exclude_threshold = pick_a_percent_exclude_threshold()
     n_exclude = pick_a_exclude_value()
 
-    df = df[
-        (df["datetime_received"].dt.date == selected_date)
-        & (df["percent_exclude_threshold"] == percent_exclude_threshold)
-    ].reset_index(drop=True)
+    df = _load_swap_quote_df(selected_date, percent_exclude_threshold)
 
     if df.empty:
         st.warning(f"No data available for {selected_date} with percent exclude threshold {percent_exclude_threshold}.")
@@ -0,0 +1,62 @@
+"""Checks the SQL read_sql_with_copy sends to postgres, without a database."""
+
+from collections import namedtuple
+
+from mainnet_launch.database import postgres_operations
+
+_Column = namedtuple("_Column", "name type_code")
+
+
+class _FakeCursor:
+    def __init__(self, executed: list[str]):
+        self.executed = executed
+        self.description = [_Column("block", 23), _Column("symbol", 1043)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql_plain_text: str):
+        self.executed.append(sql_plain_text)
+
+    def copy_expert(self, sql_plain_text: str, file, size: int):
+        self.executed.append(sql_plain_text)
+        file.write(b"1,WETH\n2,USDC\n")
+
+
+class _FakeConnection:
+    def __init__(self, executed: list[str]):
+        self.executed = executed
+
+    def cursor(self):
+        return _FakeCursor(self.executed)
+
+    def close(self):
+        pass
+
+    def invalidate(self):
+        pass
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.executed: list[str] = []
+
+    def raw_connection(self):
+        return _FakeConnection(self.executed)
+
+
+def test_read_sql_with_copy_strips_trailing_semicolon(monkeypatch):
+    engine = _FakeEngine()
+    monkeypatch.setattr(postgres_operations, "ENGINE", engine)
+
+    df = postgres_operations.read_sql_with_copy("SELECT block, symbol FROM tokens ORDER BY block; \n")
+
+    assert df["block"].tolist() == [1, 2]
+    assert df["symbol"].tolist() == ["WETH", "USDC"]
+    assert len(engine.executed) == 2
+    for sql_plain_text in engine.executed:
+        assert ";" not in sql_plain_text
+        assert "(SELECT block, symbol FROM tokens ORDER BY block)" in sql_plain_text